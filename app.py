@@ -3,40 +3,50 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
+import base64
+import click
+from flask import Flask, request, current_app
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from sqlalchemy import func
-
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-
-import sys
+from sqlalchemy import func, or_, exists, table, column, tuple_, select, union_all
+
+from logs import RequestLogging
+from instrumentation import QueryInstrumentation
+from formatting import format_datetime
+from cache import PageCache, page_flashes
+from autocomplete import Autocomplete
+from assets import Assets
+from pooling import PoolMetrics, engine_options
+from replicas import ReplicaRouter, RoutingSession, replica_binds
+
+import re
 import datetime
+from itertools import groupby
 #----------------------------------------------------------------------------#
-# App Config.
+# Extensions.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-
-
-# TODO: connect to a local postgresql database
-
-migrate = Migrate(app, db)
+# Created unbound and attached to the app by create_app(), so importing this
+# module (models, queries) does not build an app or connect anywhere.
+moment = Moment()
+request_logging = RequestLogging()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+instrumentation = QueryInstrumentation()
+page_cache = PageCache()
+autocomplete = Autocomplete()
+pool_metrics = PoolMetrics()
+replicas = ReplicaRouter()
+assets = Assets()
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
 
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
 class Venue(db.Model):
     __tablename__ = 'venues'
 
@@ -51,25 +61,70 @@ class Venue(db.Model):
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean(), default=False)
     seeking_description = db.Column(db.String(500))
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow, index=True)
+    # Maintained by counters.py.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    show_counts_as_of = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    # Set from the city by geo.py; geohash is the index of the SQLite search.
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12), index=True)
+
+    __table_args__ = (
+        db.Index('ix_venues_state_city', 'state', 'city'),
+        db.Index('ix_venues_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venues_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_venues_state_trgm', 'state', postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'}),
+        # Needs the earthdistance extension; see geo.venues_near().
+        db.Index('ix_venues_earth', func.ll_to_earth(latitude, longitude),
+                 postgresql_using='gist').ddl_if(dialect='postgresql'),
+    )
 
     artist = db.relationship('Artist', secondary='shows')
-    genres = db.relationship('VenueGenreList', backref='genres', lazy=True)
+    genres = db.relationship('Genre', secondary='venue_genres', lazy=True, order_by='Genre.name')
 
     def __repr__(self):
         return f'<Venue name: {self.name}'
 
 
-class VenueGenreList(db.Model):
+class Genre(db.Model):
+    __tablename__ = 'genres'
+    __table_args__ = (
+        db.Index('ix_genres_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120))
-    venue_id = db.Column(db.Integer, db.ForeignKey(Venue.id))
+    name = db.Column(db.String(120), nullable=False, unique=True)
 
     def __repr__(self):
         return self.name
 
 
+# The primary keys serve lookups by venue/artist, the genre_id indexes the
+# reverse lookups behind ?genre= filters.
+venue_genres = db.Table(
+    'venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id', 'genre_id'),
+)
+
+artist_genres = db.Table(
+    'artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id', 'genre_id'),
+)
+
+
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artists_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_artists_state_trgm', 'state', postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -81,22 +136,24 @@ class Artist(db.Model):
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean(), default=False)
     seeking_description = db.Column(db.String(500))
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow, index=True)
+    # Maintained by counters.py.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    show_counts_as_of = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
 
     venue = db.relationship('Venue', secondary='shows')
 
-    genres = db.relationship('ArtistGenreList', backref='genres', lazy=True)
+    genres = db.relationship('Genre', secondary='artist_genres', lazy=True, order_by='Genre.name')
 
     def __repr__(self):
         return f'<Artist id: {self.id}, name: {self.name}'
 
 
-class ArtistGenreList(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120))
-    artist_id = db.Column(db.Integer, db.ForeignKey(Artist.id))
-
-    def __repr__(self):
-        return self.name
+def default_end_time(context):
+    # Shows inserted without an end time last SHOW_DEFAULT_DURATION_MINUTES.
+    start_time = context.get_current_parameters()['start_time']
+    return start_time + datetime.timedelta(minutes=current_app.config['SHOW_DEFAULT_DURATION_MINUTES'])
 
 
 class Show(db.Model):
@@ -105,6 +162,19 @@ class Show(db.Model):
     venue_id = db.Column(db.Integer, db.ForeignKey(Venue.id))
     artist_id = db.Column(db.Integer, db.ForeignKey(Artist.id))
     start_time = db.Column(db.DateTime)
+    end_time = db.Column(db.DateTime, nullable=False, default=default_end_time)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow, index=True)
+
+    # On PostgreSQL the table is partitioned by month of start_time, and each
+    # partition carries the exclusion constraints that stop a venue or an
+    # artist from playing two overlapping shows (see partitions.py and
+    # bookings.py). Ids are never reused, as archived shows keep theirs.
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time', 'start_time'),
+        {'sqlite_autoincrement': True},
+    )
 
     venue = db.relationship('Venue', backref='venues', lazy=True)
 
@@ -113,552 +183,407 @@ class Show(db.Model):
     def __repr__(self):
         return f'<Show id: {self.id}, venue_id: {self.venue_id}, artist_id: {self.artist_id}, start_time: {self.start_time}'
 
-#----------------------------------------------------------------------------#
-# Filters.
-#----------------------------------------------------------------------------#
-
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
+class ArchivedShow(db.Model):
+    # Shows that started more than SHOW_RETENTION_DAYS ago, moved out of
+    # `shows` by `flask archive-shows`. Read through all_shows() by the past
+    # show listings, the API and the export.
+    __tablename__ = 'shows_archive'
+    __table_args__ = (
+        db.Index('ix_shows_archive_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_archive_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_archive_start_time', 'start_time'),
+    )
 
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey(Venue.id))
+    artist_id = db.Column(db.Integer, db.ForeignKey(Artist.id))
+    start_time = db.Column(db.DateTime)
+    end_time = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False)
 
-app.jinja_env.filters['datetime'] = format_datetime
 
+class ImportCheckpoint(db.Model):
+    # Last line of an import file written by `flask import-catalog`, saved in
+    # the transaction of the chunk it ends, so a resumed import starts after
+    # exactly the rows that were committed.
+    __tablename__ = 'import_checkpoints'
 
-def is_upcoming(date):
-    curr_date = datetime.datetime.now().date()
-    if date.year >= curr_date.year and date.month > curr_date.month:
-        return True
-    else:
-        return False
+    source = db.Column(db.String(500), primary_key=True)
+    line = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)
 
 #----------------------------------------------------------------------------#
-# Controllers.
+# Queries.
 #----------------------------------------------------------------------------#
 
 
-@app.route('/')
-def index():
-    return render_template('pages/home.html')
-
-
-#  Venues
-#  ----------------------------------------------------------------
-
-@app.route('/venues')
-def venues():
-    error = False
-    body = []
-    try:
-        cities = db.session.query(Venue.city, Venue.state).group_by(Venue.city, Venue.state).all()
-        for c in cities:
-            venue_list = []
-            for venue in Venue.query.filter_by(city=c.city).all():
-                dect = {
-                    "id": venue.id,
-                    "name": venue.name,
-                    "num_upcoming_shows": Show.query.filter_by(venue_id=venue.id).count(),
-                }
-                venue_list.append(dect)
-            obj = {
-                "city": c.city,
-                "state": c.state,
-                "venues": venue_list,
-            }
-            body.append(obj)
-    except:
-        db.session.rollback()
-        error = False
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-    if error:
-        abort(500)
-    else:
-        return render_template('pages/venues.html', areas=body)
-
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-    error = False
-    body = {}
-    try:
-        search_term = request.form.get('search_term')
-        search = f"%{search_term}%"
-        venues = Venue.query.filter(Venue.name.ilike(search)).all()
-
-        body['count'] = len(venues)
-        data = []
-        for venue in venues:
-            data.append({
-                'id': venue.id,
-                'name': venue.name,
-                "num_upcoming_shows": 0,
-            })
-        body['data'] = data
-    except:
-        db.session.rollback()
-        error = False
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-    if error:
-        abort(500)
-    else:
-        return render_template('pages/search_venues.html', results=body, search_term=request.form.get('search_term', ''))
-
+def encode_cursor(values):
+    data = json.dumps(values, default=lambda value: value.isoformat())
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
 
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    error = False
-    body = {}
-    try:
-        venue = Venue.query.get(venue_id)
-        body['id'] = venue.id
-        body['name'] = venue.name
-        body['genres'] = venue.genres
-        body['address'] = venue.address
-        body['city'] = venue.city
-        body['state'] = venue.state
-        body['phone'] = venue.phone
-        body['website'] = venue.website
-        body['facebook_link'] = venue.facebook_link
-        body['seeking_talent'] = venue.seeking_talent
-        body['image_link'] = venue.image_link
-
-        past_shows = []
-        upcoming_shows = []
-        shows = Show.query.join(Venue, Venue.id == venue_id).all()
-        for show in shows:
-            if is_upcoming(show.start_time):
-                upcoming_shows.append({
-                    "artist_id": show.artist.id,
-                    "artist_name": show.artist.name,
-                    "artist_image_link": show.artist.image_link,
-                    "start_time": str(show.start_time)
-                })
-            else:
-                past_shows.append({
-                    "artist_id": show.artist.id,
-                    "artist_name": show.artist.name,
-                    "artist_image_link": show.artist.image_link,
-                    "start_time": str(show.start_time)
-                })
-        body['past_shows'] = past_shows
-        body['upcoming_shows'] = upcoming_shows
-        body['past_shows_count'] = len(past_shows)
-        body['upcoming_shows_count'] = len(upcoming_shows)
-
-    except:
-        db.session.rollback()
-        error = False
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-    if error:
-        abort(500)
-    else:
-        return render_template('pages/show_venue.html', venue=body)
-#  Create Venue
-#  ----------------------------------------------------------------
-
-
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-    form = VenueForm()
-    return render_template('forms/new_venue.html', form=form)
-
-
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-    error = False
-    body = {}
-    try:
-        req = request.form
-        name = req['name']
-        city = req['city']
-        state = req['state']
-        address = req['address']
-        phone = req['phone']
-        genres = req.getlist('genres')
-        facebook_link = req['facebook_link']
-        genre_list = []
-
-        venue = Venue(name=name, city=city, state=state, address=address, phone=phone, facebook_link=facebook_link)
-        for g in genres:
-            genre_list.append(VenueGenreList(name=g))
-
-        venue.genres = genre_list
-        db.session.add(venue)
-        db.session.commit()
-    except:
-        db.session.rollback()
-        error = False
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-    if error:
-        abort(500)
-    else:
-        flash('Venue ' + request.form['name'] + ' was successfully listed!')
-        return render_template('pages/home.html')
-
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-    error = False
-    try:
-        venue = Venue.query.get(venue_id)
-        db.session.delete(venue)
-        db.session.commit()
-    except():
-        db.session.rollback()
-        error = True
-    finally:
-        db.session.close()
-    if error:
-        abort(500)
-    else:
-        return redirect(url_for('venues'))
 
-#  Artists
-#  ----------------------------------------------------------------
+def cursor_value(column, value):
+    # A cursor value as the Python type of its key column, or NULL; anything
+    # else (nested lists, objects, a string for an integer key) is a
+    # ValueError.
+    python_type = column.type.python_type
+    if value is None:
+        return value
+    if python_type is datetime.datetime and isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    if type(value) is not python_type:
+        raise ValueError(f'{value!r} is not a {python_type.__name__}')
+    return value
 
 
-@app.route('/artists')
-def artists():
-    error = False
-    body = []
+def decode_cursor(cursor, key_columns):
+    # Malformed or tampered cursors are ignored, which restarts the listing
+    # at its first page.
     try:
-        artists = Artist.query.all()
-        for artist in artists:
-            body.append({
-                "id": artist.id,
-                "name": artist.name,
-            })
-    except:
-        db.session.rollback()
-        error = False
-        print(sys.exc_info())
-    finally:
-        pass
-    if error:
-        abort(500)
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(key_columns):
+            return None
+        return tuple(cursor_value(col, value) for col, value in zip(key_columns, values))
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+
+def page_size():
+    size = request.args.get('limit', current_app.config['PAGE_SIZE'], type=int)
+    return min(max(size, 1), current_app.config['MAX_PAGE_SIZE'])
+
+
+def keyset_page(query, key_columns, descending=False):
+    # Seek past the ?after= (or before the ?before=) cursor on an index-ordered
+    # key instead of using OFFSET, so every page costs the same to fetch.
+    # Descending listings start from the highest key.
+    after = decode_cursor(request.args.get('after', ''), key_columns)
+    before = decode_cursor(request.args.get('before', ''), key_columns)
+    limit = page_size()
+    key = tuple_(*key_columns)
+    forward = [col.desc() if descending else col for col in key_columns]
+    backward = [col if descending else col.desc() for col in key_columns]
+
+    if before:
+        query = query.filter(key > before if descending else key < before) \
+            .order_by(*backward)
     else:
-        return render_template('pages/artists.html', artists=body)
-
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-    error = False
-    body = {}
-    try:
-        search_term = request.form.get('search_term')
-        search = f"%{search_term}%"
-        artists = Artist.query.filter(Artist.name.ilike(search)).all()
-
-        body['count'] = len(artists)
-        data = []
-        for artist in artists:
-            data.append({
-                'id': artist.id,
-                'name': artist.name,
-                "num_upcoming_shows": 0,
-            })
-        body['data'] = data
-    except:
-        db.session.rollback()
-        error = False
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-    if error:
-        abort(500)
-    else:
-        return render_template('pages/search_artists.html', results=body, search_term=request.form.get('search_term', ''))
-
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-    error = False
-    body = {}
-    try:
-        artist = Artist.query.get(artist_id)
-        body['id'] = artist.id
-        body['name'] = artist.name
-        body['genres'] = artist.genres
-        body['city'] = artist.city
-        body['state'] = artist.state
-        body['phone'] = artist.phone
-        body['seeking_venue'] = artist.seeking_venue
-        body['image_link'] = artist.image_link
-
-        past_shows = []
-        upcoming_shows = []
-        shows = Show.query.join(Artist, Artist.id == artist_id).all()
-        for show in shows:
-            if is_upcoming(show.start_time):
-                upcoming_shows.append({
-                    "venue_id": show.venue.id,
-                    "venue_name": show.venue.name,
-                    "venue_image_link": show.venue.image_link,
-                    "start_time": str(show.start_time)
-                })
-            else:
-                past_shows.append({
-                    "venue_id": show.venue.id,
-                    "venue_name": show.venue.name,
-                    "venue_image_link": show.venue.image_link,
-                    "start_time": str(show.start_time)
-                })
-        body['past_shows'] = past_shows
-        body['upcoming_shows'] = upcoming_shows
-        body['past_shows_count'] = len(past_shows)
-        body['upcoming_shows_count'] = len(upcoming_shows)
-
-    except:
-        db.session.rollback()
-        error = False
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-    if error:
-        abort(500)
-    else:
-        return render_template('pages/show_artist.html', artist=body)
-
-#  Update
-#  ----------------------------------------------------------------
-
-
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-    artist = Artist.query.get(artist_id)
-    form = ArtistForm(obj=artist)
-
-    return render_template('forms/edit_artist.html', form=form, artist=artist)
-
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id):
-    error = False
-
-    try:
-        req = request.form
-        artist = Artist.query.get(artist_id)
-
-        artist.name = req['name']
-        artist.city = req['city']
-        artist.state = req['state']
-        artist.phone = req['phone']
-        artist.facebook_link = req['facebook_link']
-        genres = req.getlist('genres')
-        genre_list = []
-        for genre in genres:
-            genre_list.append(ArtistGenreList(name=genre))
-
-        artist.genres = genre_list
-
-        db.session.commit()
-    except:
-        db.session.rollback()
-
-        error = True
-    finally:
-        db.session.close()
-
-    if error:
-        abort(500)
-    else:
-        return redirect(url_for('show_artist', artist_id=artist_id))
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-    venue = Venue.query.get(venue_id)
-
-    form = VenueForm(obj=venue)
-
-    return render_template('forms/edit_venue.html', form=form, venue=venue)
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-    error = False
-
-    try:
-        req = request.form
-        venue = Venue.query.get(venue_id)
-
-        venue.name = req['name']
-        venue.city = req['city']
-        venue.state = req['state']
-        venue.phone = req['phone']
-        venue.address = req['address']
-        venue.facebook_link = req['facebook_link']
-        genres = req.getlist('genres')
-        genre_list = []
-        for genre in genres:
-            genre_list.append(VenueGenreList(name=genre))
-
-        venue.genres = genre_list
-
-        db.session.commit()
-    except:
-        db.session.rollback()
-
-        error = True
-    finally:
-        db.session.close()
-
-    if error:
-        abort(500)
-    else:
-        return redirect(url_for('show_venue', venue_id=venue_id))
-
-#  Create Artist
-#  ----------------------------------------------------------------
-
-
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-    form = ArtistForm()
-    return render_template('forms/new_artist.html', form=form)
-
-
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():
-    error = False
-    body = {}
-    try:
-        req = request.form
-        name = req['name']
-        city = req['city']
-        state = req['state']
-        phone = req['phone']
-        genres = req.getlist('genres')
-        facebook_link = req['facebook_link']
-        genre_list = []
-
-        artist = Artist(name=name, city=city, state=state, phone=phone, facebook_link=facebook_link)
-
-        for g in genres:
-            genre_list.append(ArtistGenreList(name=g))
-
-        artist.genres = genre_list
-        db.session.add(artist)
-        db.session.commit()
-    except:
-        db.session.rollback()
-        error = False
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-    if error:
-        abort(500)
-    else:
-        flash('Artist ' + request.form['name'] + ' was successfully listed!')
-        return render_template('pages/home.html')
-
-
-#  Shows
-#  ----------------------------------------------------------------
-
-@app.route('/shows')
-def shows():
-    error = False
-    body = []
-    try:
-        shows = Show.query.all()
-        for show in shows:
-            body.append({
-                'venue_id': show.venue_id,
-                'venue_name': show.venue.name,
-                'artist_id': show.artist.id,
-                'artist_name': show.artist.name,
-                'artist_image_link': show.artist.image_link,
-                'start_time': format_datetime(str(show.start_time)),
-            })
-    except:
-        db.session.rollback()
-        error = False
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-    if error:
-        abort(500)
-    else:
-        return render_template('pages/shows.html', shows=body)
-
-
-@app.route('/shows/create')
-def create_shows():
-    # renders form. do not touch.
-    form = ShowForm()
-    return render_template('forms/new_show.html', form=form)
-
+        if after:
+            query = query.filter(key < after if descending else key > after)
+        query = query.order_by(*forward)
+
+    rows = query.limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if before:
+        rows.reverse()
+
+    def cursor(row):
+        return encode_cursor([getattr(row, col.key) for col in key_columns])
+
+    has_next = bool(before) or more
+    has_prev = more if before else bool(after)
+    pager = {
+        'next': cursor(rows[-1]) if rows and has_next else None,
+        'prev': cursor(rows[0]) if rows and has_prev else None,
+    }
+    return rows, pager
+
+
+def genres_named(names):
+    # Canonical Genre rows for the submitted names, creating missing ones.
+    # Assigning them to a relationship lets SQLAlchemy diff the collection,
+    # so only added or removed associations are written.
+    names = {name.strip() for name in names if name and name.strip()}
+    if not names:
+        return []
+    genres = Genre.query.filter(Genre.name.in_(names)).all()
+    missing = names - {genre.name for genre in genres}
+    genres.extend(Genre(name=name) for name in sorted(missing))
+    return genres
+
+
+def genre_ids(names):
+    # Name to id map for bulk inserts into the association tables.
+    genres = genres_named(names)
+    db.session.add_all(genres)
+    db.session.flush()
+    return {genre.name: genre.id for genre in genres}
+
+
+def with_genre(query, model, genre_owner, name):
+    # Narrows a listing to ?genre=, through the unique genre name and the
+    # association table's genre_id index.
+    if not name:
+        return query
+    association = genre_owner.table
+    return query.join(association, genre_owner == model.id) \
+        .join(Genre, Genre.id == association.c.genre_id) \
+        .filter(Genre.name == name)
+
+
+def venue_areas():
+    # A page of the directory with each venue's upcoming show counter,
+    # ordered so areas can be grouped on (city, state); shows is not read.
+    query = db.session.query(
+        Venue.city, Venue.state, Venue.id, Venue.name,
+        Venue.upcoming_shows_count.label('num_upcoming_shows'),
+    )
+    query = with_genre(query, Venue, venue_genres.c.venue_id, request.args.get('genre'))
+    rows, pager = keyset_page(query, (Venue.state, Venue.city, Venue.name, Venue.id))
+
+    areas = []
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+        areas.append({
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows,
+            } for venue in venues],
+        })
+    return areas, pager
+
+
+def upcoming_shows(owner_column, owner_id, other, other_column, prefix):
+    # Upcoming shows of one venue/artist, ordered and limited on start_time
+    # by the database, with the other side's columns joined in. Only the
+    # current and future partitions of shows are read.
+    now = datetime.datetime.now()
+    upcoming = db.session.query(Show.id).filter(owner_column == owner_id, Show.start_time > now)
+    shows = db.session.query(
+        other.id.label(f'{prefix}_id'),
+        other.name.label(f'{prefix}_name'),
+        other.image_link.label(f'{prefix}_image_link'),
+        Show.start_time,
+    ).join(other, other.id == other_column) \
+        .filter(owner_column == owner_id, Show.start_time > now) \
+        .order_by(Show.start_time, Show.id) \
+        .limit(current_app.config['DETAIL_SHOWS_LIMIT'])
+
+    return {
+        'upcoming_shows': [row._asdict() for row in shows],
+        'upcoming_shows_count': upcoming.count(),
+    }
+
+
+SHOW_COLUMNS = ('id', 'venue_id', 'artist_id', 'start_time', 'end_time', 'updated_at')
+
+
+def all_shows(owner_key=None, owner_ids=None, started=False):
+    # Shows and archived shows as one subquery with the columns of shows;
+    # optionally only those of some venues or artists (owner_key 'venue_id'
+    # or 'artist_id') and only those that have started, which every
+    # archived show has.
+    now = datetime.datetime.now()
+    parts = []
+    for model in (Show, ArchivedShow):
+        criteria = []
+        if started and model is Show:
+            criteria.append(Show.start_time <= now)
+        if owner_key:
+            criteria.append(getattr(model, owner_key).in_(owner_ids))
+        parts.append(select(*(getattr(model, name) for name in SHOW_COLUMNS)).where(*criteria))
+    return union_all(*parts).subquery('history' if started else 'all_shows')
+
+
+def show_history(owner_key=None, owner_ids=None):
+    # Every show that has started, from shows and from the archive.
+    return all_shows(owner_key, owner_ids, started=True)
+
+
+def past_shows(owner_key, owner_id, other, other_key, prefix):
+    # A page of one venue's/artist's past shows, newest first, for the lazily
+    # loaded section of the detail pages.
+    history = show_history(owner_key, [owner_id])
+    query = db.session.query(
+        history.c.id,
+        history.c.start_time,
+        other.id.label(f'{prefix}_id'),
+        other.name.label(f'{prefix}_name'),
+        other.image_link.label(f'{prefix}_image_link'),
+    ).join(other, other.id == history.c[other_key])
+    rows, pager = keyset_page(query, (history.c.start_time, history.c.id), descending=True)
+    return [row._asdict() for row in rows], pager
+
+
+def search_catalog(model, genre_owner, search_table, search_term, page):
+    # Ranked, paginated search over name, city, state and genres. PostgreSQL
+    # matches through the pg_trgm GIN indexes, SQLite through the FTS5 table
+    # kept in sync by triggers (see the search migration).
+    page_size = current_app.config['SEARCH_PAGE_SIZE']
+    search_term = (search_term or '').strip()
+
+    query = db.session.query(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows'),
+        func.count().over().label('total'),
+    )
 
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():
-    error = False
-    body = {}
-    try:
-        req = request.form
-        venue_id = req['venue_id']
-        artist_id = req['artist_id']
-        start_time = req['start_time']
-        show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time)
-        db.session.add(show)
-        db.session.commit()
-    except:
-        db.session.rollback()
-        error = False
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-    if error:
-        abort(500)
+    if db.engine.dialect.name == 'sqlite':
+        tokens = re.findall(r'\w+', search_term)
+        if tokens:
+            fts = table(search_table, column('rowid'), column('rank'), column(search_table))
+            match = ' '.join(f'"{token}"*' for token in tokens)
+            query = query.join(fts, fts.c.rowid == model.id) \
+                .filter(fts.c[search_table].match(match)) \
+                .order_by(fts.c.rank, model.id)
+        else:
+            query = query.order_by(model.name, model.id)
     else:
-        flash('Show was successfully listed!')
-        return render_template('pages/home.html')
+        pattern = '%' + re.sub(r'([\\%_])', r'\\\1', search_term) + '%'
+        matches = [col.ilike(pattern, escape='\\') for col in (model.name, model.city, model.state)]
+        matching_genres = db.session.query(Genre.id).filter(Genre.name.ilike(pattern, escape='\\'))
+        matches.append(exists().where(genre_owner == model.id, genre_owner.table.c.genre_id.in_(matching_genres)))
+        rank = func.greatest(*(func.word_similarity(search_term, col) for col in (model.name, model.city, model.state)))
+        query = query.filter(or_(*matches)).order_by(rank.desc(), model.name, model.id)
+
+    rows = query.limit(page_size).offset((page - 1) * page_size).all()
+    count = rows[0].total if rows else 0
+    return {
+        'count': count,
+        'page': page,
+        'pages': -(-count // page_size),
+        'data': [{
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.num_upcoming_shows,
+        } for row in rows],
+    }
+
+
+def upcoming_validator(*criteria):
+    # Count and latest write of the upcoming shows, read from the current
+    # and future partitions only. A show that starts drops out of the count
+    # at once; the counter roll then also bumps its owners' updated_at,
+    # which moves Last-Modified.
+    now = datetime.datetime.now()
+    return tuple(db.session.query(func.count(Show.id), func.max(Show.updated_at))
+                 .filter(Show.start_time > now, *criteria).one())
+
+
+def venues_validator():
+    # Counter updates (new shows, rolls) bump updated_at as well.
+    return tuple(db.session.query(func.count(Venue.id), func.max(Venue.updated_at)).one())
+
+
+def artists_validator():
+    return tuple(db.session.query(func.count(Artist.id), func.max(Artist.updated_at)).one())
+
+
+def shows_validator():
+    return (
+        db.session.query(func.max(Venue.updated_at)).scalar(),
+        db.session.query(func.max(Artist.updated_at)).scalar(),
+    ) + upcoming_validator()
+
+
+def venue_validator(venue_id):
+    # The venue's updated_at covers its show counters; the upcoming shows
+    # and the artists they list are checked directly.
+    updated_at = db.session.query(Venue.updated_at).filter(Venue.id == venue_id).scalar()
+    if updated_at is None:
+        return None
+    artists = db.session.query(func.max(Artist.updated_at)) \
+        .join(Show, Show.artist_id == Artist.id) \
+        .filter(Show.venue_id == venue_id, Show.start_time > datetime.datetime.now()).scalar()
+    return (updated_at, artists) + upcoming_validator(Show.venue_id == venue_id)
+
+
+def artist_validator(artist_id):
+    updated_at = db.session.query(Artist.updated_at).filter(Artist.id == artist_id).scalar()
+    if updated_at is None:
+        return None
+    venues = db.session.query(func.max(Venue.updated_at)) \
+        .join(Show, Show.venue_id == Venue.id) \
+        .filter(Show.artist_id == artist_id, Show.start_time > datetime.datetime.now()).scalar()
+    return (updated_at, venues) + upcoming_validator(Show.artist_id == artist_id)
 
-
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('errors/404.html'), 404
-
-
-@app.errorhandler(500)
-def server_error(error):
-    return render_template('errors/500.html'), 500
+#----------------------------------------------------------------------------#
+# App Factory.
+#----------------------------------------------------------------------------#
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+def init_migrations(app):
+    # Flask-Migrate pulls in Alembic, which only the `flask db` commands need.
+    from flask_migrate import Migrate
+
+    return Migrate(app, db)
+
+
+def create_app(test_config=None):
+    # Settings come from config.py, then FLASK_* environment variables
+    # (FLASK_SECRET_KEY, FLASK_PAGE_SIZE=100, ...), then test_config.
+    app = Flask(__name__)
+    app.config.from_object('config')
+    app.config.from_prefixed_env()
+    if test_config is not None:
+        app.config.update(test_config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    app.config.setdefault('SQLALCHEMY_BINDS', replica_binds(app.config))
+    if not app.config.get('SECRET_KEY'):
+        raise RuntimeError('SECRET_KEY must be set outside of debug mode.')
+
+    moment.init_app(app)
+    db.init_app(app)
+    request_logging.init_app(app)
+    instrumentation.init_app(app)
+    page_cache.init_app(app)
+    autocomplete.init_app(app)
+    pool_metrics.init_app(app, db)
+    replicas.init_app(app, db)
+    assets.init_app(app)
+    app.jinja_env.filters['datetime'] = format_datetime
+    app.jinja_env.globals['page_flashes'] = page_flashes
+
+    if click.get_current_context(silent=True) is not None:
+        from seed import seed_command
+        from importer import import_command
+        from exporter import export_command
+        from counters import roll_command
+        from assets import build_assets_command
+        from geo import geocode_command
+        from partitions import partition_command, archive_command
+
+        init_migrations(app)
+        app.cli.add_command(seed_command)
+        app.cli.add_command(import_command)
+        app.cli.add_command(export_command)
+        app.cli.add_command(roll_command)
+        app.cli.add_command(build_assets_command)
+        app.cli.add_command(geocode_command)
+        app.cli.add_command(partition_command)
+        app.cli.add_command(archive_command)
+
+    from views import main, venues, artists, shows, api
+
+    app.register_blueprint(main.bp)
+    app.register_blueprint(venues.bp)
+    app.register_blueprint(artists.bp)
+    app.register_blueprint(shows.bp)
+    app.register_blueprint(api.bp)
+
+    if click.get_current_context(silent=True) is None and app.config['AUTOCOMPLETE_PRELOAD']:
+        autocomplete.preload(app)
+
+    return app
 
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
-# Default port:
+# Default port. The blueprints import their models from the `app` module,
+# so the factory is taken from there rather than from __main__:
 if __name__ == '__main__':
-    app.run()
+    import app
+    app.create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,177 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+import mimetypes
+
+import click
+from flask import current_app, request, send_from_directory, url_for, abort
+from flask.cli import with_appcontext
+
+# Bundles served by the layouts, built from these files under static/. The
+# output goes to static/dist, one level below static/ like the sources, so
+# relative url(../fonts/...) references keep working.
+BUNDLES = {
+    'main.css': (
+        'css/bootstrap.min.css',
+        'css/icons.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ),
+    # Needed before the page renders.
+    'head.js': (
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ),
+    # Loaded with `defer`, in this order, once the page is parsed.
+    'main.js': (
+        'js/libs/jquery-1.11.1.min.js',
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ),
+}
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+CSS_COMMENTS = re.compile(r'/\*(?!!).*?\*/', re.S)
+CSS_SPACES = re.compile(r'\s*([{};,>])\s*')
+SOURCE_MAP = re.compile(r'^[ \t]*//[#@] sourceMappingURL=.*$', re.M)
+
+
+def minify_css(text):
+    # Comments (except /*! license banners */) and whitespace only. Spaces around : (descendant pseudo-class
+    # selectors) and + and - (calc()) can be significant and are kept.
+    text = CSS_COMMENTS.sub('', text)
+    text = CSS_SPACES.sub(r'\1', text)
+    return re.sub(r'\s+', ' ', text).replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # Safely minifying JavaScript takes a real tokenizer; rjsmin is used
+    # when installed, otherwise the (mostly pre-minified) sources are kept.
+    try:
+        import rjsmin
+    except ImportError:
+        return text
+    return rjsmin.jsmin(text)
+
+
+def bundle(static_folder, name):
+    sources = []
+    for path in BUNDLES[name]:
+        with open(os.path.join(static_folder, path), encoding='utf-8') as source:
+            sources.append(SOURCE_MAP.sub('', source.read()))
+    if name.endswith('.css'):
+        return minify_css('\n'.join(sources))
+    # Guards against files not ending in a semicolon.
+    return ';\n'.join(minify_js(source) for source in sources)
+
+
+def write_variants(directory, filename, data):
+    with open(os.path.join(directory, filename), 'wb') as output:
+        output.write(data)
+    with open(os.path.join(directory, filename + '.gz'), 'wb') as output:
+        output.write(gzip.compress(data, compresslevel=9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        return
+    with open(os.path.join(directory, filename + '.br'), 'wb') as output:
+        output.write(brotli.compress(data, quality=11))
+
+
+def build_assets(static_folder):
+    # Writes every bundle as <name>.<content hash>.<ext> with .gz (and .br
+    # when brotli is installed) next to it, and the manifest mapping bundle
+    # names to those files. Files of the previous build are kept so pages
+    # rendered by workers still running it keep loading.
+    directory = os.path.join(static_folder, DIST)
+    os.makedirs(directory, exist_ok=True)
+    previous = load_manifest(static_folder) or {}
+
+    manifest = {}
+    for name in BUNDLES:
+        data = bundle(static_folder, name).encode()
+        stem, ext = os.path.splitext(name)
+        filename = f'{stem}.{hashlib.sha1(data).hexdigest()[:12]}{ext}'
+        write_variants(directory, filename, data)
+        manifest[name] = filename
+
+    keep = set(manifest.values()) | set(previous.values())
+    for filename in os.listdir(directory):
+        if filename != MANIFEST and re.sub(r'\.(gz|br)$', '', filename) not in keep:
+            os.remove(os.path.join(directory, filename))
+
+    with open(os.path.join(directory, MANIFEST), 'w') as output:
+        json.dump(manifest, output, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return None
+
+
+class Assets(object):
+    # Serves the built bundles from /static/dist with far-future immutable
+    # caching, precompressed when the client accepts it, and provides the
+    # `asset_urls(bundle)` template helper. Without a build (or with
+    # ASSETS_USE_BUILD off, the default in debug mode) the helper lists the
+    # source files instead, so edits show up without rebuilding.
+
+    def __init__(self, app=None):
+        self.manifest = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_USE_BUILD', not app.debug)
+        app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+
+        self.manifest = None
+        if app.config['ASSETS_USE_BUILD']:
+            self.manifest = load_manifest(app.static_folder)
+            if self.manifest is None:
+                app.logger.warning('No asset build found; run `flask build-assets`. Serving the sources.')
+
+        app.add_url_rule(f'{app.static_url_path}/{DIST}/<path:filename>', 'asset', self.send)
+        app.jinja_env.globals['asset_urls'] = self.urls
+
+    def urls(self, name):
+        if self.manifest and name in self.manifest:
+            return [url_for('asset', filename=self.manifest[name])]
+        return [url_for('static', filename=path) for path in BUNDLES[name]]
+
+    def send(self, filename):
+        if filename == MANIFEST:
+            abort(404)
+        directory = os.path.join(current_app.static_folder, DIST)
+        max_age = current_app.config['ASSETS_MAX_AGE']
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[encoding] and os.path.isfile(os.path.join(directory, filename + suffix)):
+                response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=max_age)
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(directory, filename, mimetype=mimetype, max_age=max_age)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Bundle, minify, fingerprint and precompress static/css and static/js."""
+    for name, filename in build_assets(current_app.static_folder).items():
+        click.echo(f'{name} -> {DIST}/{filename}')
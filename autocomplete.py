@@ -0,0 +1,179 @@
+import re
+import time
+import datetime
+import bisect
+import threading
+import unicodedata
+
+from sqlalchemy import func
+
+
+def normalize(text):
+    # Case-folded, without accents or punctuation, one space between words.
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'\w+', text.casefold()))
+
+
+def index_keys(name):
+    # The whole name, then the name from each later word on, so "hop" also
+    # finds "The Musical Hop".
+    words = normalize(name).split(' ')
+    return [' '.join(words[start:]) for start in range(len(words)) if words[start]]
+
+
+class PrefixIndex(object):
+    # Sorted (key, id) pairs of one catalog: a lookup is a bisect to the
+    # first key with the prefix and a scan of at most a few entries past it.
+    # Whole-name matches come before matches on a later word.
+
+    def __init__(self, rows=()):
+        self.entries = {}
+        names, words = [], []
+        for id, name, city, state in rows:
+            self.entries[id] = (name, city, state)
+            keys = index_keys(name)
+            names.extend((key, id) for key in keys[:1])
+            words.extend((key, id) for key in keys[1:])
+        self.names = sorted(names)
+        self.words = sorted(words)
+
+    def add(self, id, name, city, state):
+        self.remove(id)
+        self.entries[id] = (name, city, state)
+        keys = index_keys(name)
+        for key in keys[:1]:
+            bisect.insort(self.names, (key, id))
+        for key in keys[1:]:
+            bisect.insort(self.words, (key, id))
+
+    def remove(self, id):
+        entry = self.entries.pop(id, None)
+        if entry is None:
+            return
+        keys = index_keys(entry[0])
+        for pairs, pair_keys in ((self.names, keys[:1]), (self.words, keys[1:])):
+            for key in pair_keys:
+                position = bisect.bisect_left(pairs, (key, id))
+                if position < len(pairs) and pairs[position] == (key, id):
+                    del pairs[position]
+
+    def search(self, query, limit):
+        prefix = normalize(query)
+        found = []
+        if prefix.isdigit() and int(prefix) in self.entries:
+            found.append(int(prefix))
+        if prefix:
+            for pairs in (self.names, self.words):
+                position = bisect.bisect_left(pairs, (prefix,))
+                while position < len(pairs) and len(found) < limit and pairs[position][0].startswith(prefix):
+                    id = pairs[position][1]
+                    if id not in found:
+                        found.append(id)
+                    position += 1
+        return [
+            {'id': id, 'name': name, 'city': city, 'state': state}
+            for id, (name, city, state) in ((id, self.entries[id]) for id in found[:limit])
+        ]
+
+
+class Autocomplete(object):
+    # In-memory name indexes of venues and artists for the typeahead pickers.
+    # Each worker builds its own at startup (or on first use), the create,
+    # edit and delete handlers update it in place, and every
+    # AUTOCOMPLETE_REFRESH_SECONDS a lookup also picks up rows other workers
+    # or imports changed since (by updated_at), rebuilding when the row count
+    # no longer matches. `lock` guards the indexes and is never held during a
+    # query; `refreshing` lets one thread refresh while the others keep
+    # searching the current indexes.
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.refreshing = threading.Lock()
+        self.indexes = {}
+        self.watermarks = {}
+        self.checked_at = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUTOCOMPLETE_LIMIT', 10)
+        app.config.setdefault('AUTOCOMPLETE_REFRESH_SECONDS', 30)
+        app.config.setdefault('AUTOCOMPLETE_PRELOAD', True)
+        self.refresh_seconds = app.config['AUTOCOMPLETE_REFRESH_SECONDS']
+        with self.lock:
+            self.indexes = {}
+            self.watermarks = {}
+            self.checked_at = 0
+
+    def models(self):
+        from app import Venue, Artist
+
+        return {'venues': Venue, 'artists': Artist}
+
+    def preload(self, app):
+        # Startup is not the place to fail on a database that is down or not
+        # migrated yet; the indexes are then built by the first lookup.
+        with app.app_context():
+            try:
+                self.refresh()
+            except Exception:
+                app.logger.warning('Autocomplete indexes not preloaded', exc_info=True)
+
+    def fresh(self):
+        return len(self.indexes) == len(self.models()) and \
+            time.monotonic() - self.checked_at < self.refresh_seconds
+
+    def refresh(self):
+        if self.fresh():
+            return
+        # Without indexes there is nothing to search yet, so wait for the
+        # thread building them; otherwise leave the refresh to it.
+        if not self.refreshing.acquire(blocking=len(self.indexes) < len(self.models())):
+            return
+        try:
+            if not self.fresh():
+                self.load()
+        finally:
+            self.refreshing.release()
+
+    def load(self):
+        # The watermark is read before the rows, so a row the handlers add
+        # to an index that is then replaced by a rebuild is newer than it and
+        # comes back with the next refresh.
+        from app import db
+
+        for kind, model in self.models().items():
+            updated_at, count = db.session.query(func.max(model.updated_at), func.count(model.id)).one()
+            with self.lock:
+                index = self.indexes.get(kind)
+                watermark = self.watermarks.get(kind)
+                rebuild = index is None or len(index.entries) != count
+            columns = db.session.query(model.id, model.name, model.city, model.state)
+            if rebuild:
+                index = PrefixIndex(columns.all())
+                with self.lock:
+                    self.indexes[kind] = index
+            elif updated_at is not None and updated_at > watermark:
+                rows = columns.filter(model.updated_at > watermark).all()
+                with self.lock:
+                    for row in rows:
+                        index.add(*row)
+            with self.lock:
+                self.watermarks[kind] = updated_at or datetime.datetime.min
+        self.checked_at = time.monotonic()
+
+    def search(self, kind, query, limit):
+        self.refresh()
+        with self.lock:
+            return self.indexes[kind].search(query, limit)
+
+    def update(self, kind, id, name, city, state):
+        with self.lock:
+            if kind in self.indexes:
+                self.indexes[kind].add(id, name, city, state)
+
+    def remove(self, kind, id):
+        with self.lock:
+            if kind in self.indexes:
+                self.indexes[kind].remove(id)
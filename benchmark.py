@@ -0,0 +1,486 @@
+#----------------------------------------------------------------------------#
+# Load-test benchmark for every route in app.py.
+#
+#   DATABASE_URL=postgresql://.../fyyur_bench python benchmark.py --seed --scale 100k --save
+#   DATABASE_URL=postgresql://.../fyyur_bench python benchmark.py --check
+#
+# Requests go through the Flask test client, or with --server through a
+# local multi-process server driven by concurrent clients. Per endpoint it
+# reports p50/p95/p99 latency, throughput and SQL queries per request (read
+# from the Server-Timing header), and compares them with a stored baseline.
+#
+#   python benchmark.py --startup --startup-overhead-budget-ms 150
+#
+# measures worker start-up instead: importing app.py and calling
+# create_app(), with the heaviest imports from `python -X importtime`, and
+# how much longer that takes than a bare Flask app with Flask-SQLAlchemy.
+#
+#   DATABASE_URL=postgresql://.../fyyur_bench python benchmark.py --seed --scale 100k \
+#       --venues 100000 --artists 100000 --search-compare
+#
+# times the venue and artist search against the `name ILIKE '%term%'`
+# scan it replaced, and
+#
+#   python benchmark.py --format-times 10000
+#
+# formats that many show times through the `datetime` filter and through
+# the dateutil parse and Babel call it replaced.
+#----------------------------------------------------------------------------#
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import statistics
+import subprocess
+import multiprocessing
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+\d+ \| *(\S+)$')
+SEARCH_TERMS = ['the', 'blue', 'jazz', 'austin', 'NY', 'hall', 'wolves']
+
+# Times importing app.py and building the app, in milliseconds. The
+# autocomplete preload is left out: it reads the catalog, so its cost depends
+# on the database rather than on the code.
+STARTUP_SCRIPT = (
+    'import time; started = time.perf_counter(); '
+    'from app import create_app; create_app({"AUTOCOMPLETE_PRELOAD": False}); '
+    'print((time.perf_counter() - started) * 1000)'
+)
+# The floor under that: the framework alone, most of it SQLAlchemy, with the
+# PostgreSQL dialect production loads anyway (the models' PostgreSQL index
+# options load it on SQLite too). Machines differ far more in this than in
+# what the app adds on top.
+FRAMEWORK_STARTUP_SCRIPT = (
+    'import time; started = time.perf_counter(); '
+    'from flask import Flask; from flask_sqlalchemy import SQLAlchemy; import sqlalchemy.dialects.postgresql; '
+    'app = Flask("floor"); app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"; SQLAlchemy(app); '
+    'print((time.perf_counter() - started) * 1000)'
+)
+
+APP = None
+
+
+def load_app(page_cache):
+    global APP
+    from app import create_app
+
+    APP = create_app({
+        'WTF_CSRF_ENABLED': False,
+        'SQL_INSTRUMENTATION': True,
+        'SQL_SLOW_REQUEST_MS': float('inf'),
+        'SQL_MAX_QUERIES_PER_REQUEST': float('inf'),
+        'PAGE_CACHE_BACKEND': 'lru' if page_cache else 'null',
+        # The database is only prepared after the app is created.
+        'AUTOCOMPLETE_PRELOAD': False,
+    })
+    APP.logger.disabled = True
+    return APP
+
+
+def prepare_database(app, args):
+    from flask_migrate import upgrade
+    from app import db, Venue, Artist, Show, init_migrations
+    from seed import SCALES, seed_catalog
+
+    with app.app_context():
+        if args.seed:
+            init_migrations(app)
+            upgrade()
+            seed_catalog(SCALES[args.scale], args.random_seed, venues=args.venues, artists=args.artists)
+        venue_ids = [id for id, in db.session.query(Venue.id)]
+        artist_ids = [id for id, in db.session.query(Artist.id)]
+        # A sample is enough to spread the show lookups.
+        show_ids = [id for id, in db.session.query(Show.id).limit(10000)]
+        db.session.remove()
+        # Forked server workers must not share the parent's pooled connections.
+        db.engine.dispose()
+    if not venue_ids or not artist_ids or not show_ids:
+        sys.exit('The database is empty; run with --seed first.')
+    return venue_ids, artist_ids, show_ids
+
+
+def build_requests(venue_ids, artist_ids, show_ids, rng):
+    # Each endpoint maps to a factory returning (method, path, form data).
+    venue_form = {
+        'name': 'Benchmark Venue', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+        'phone': '512-555-0100', 'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/bench',
+    }
+    artist_form = dict(venue_form, name='Benchmark Artist')
+    term = lambda: rng.choice(SEARCH_TERMS)
+    # Exports of whole tables are bounded to a city or a week of shows.
+    week = datetime.date.today().isoformat(), (datetime.date.today() + datetime.timedelta(days=7)).isoformat()
+    city = lambda: rng.choice(['New York', 'Austin', 'Nashville', 'Seattle'])
+    # Around seeded cities (New York, Austin, Nashville, Seattle), or nowhere near one.
+    point = lambda: rng.choice([(40.73, -73.99), (30.27, -97.74), (36.16, -86.78), (47.61, -122.33), (44.0, -110.0)])
+    return {
+        'index': lambda: ('GET', '/', None),
+        'venues': lambda: ('GET', '/venues', None),
+        'artists': lambda: ('GET', '/artists', None),
+        'shows': lambda: ('GET', '/shows', None),
+        'past_shows': lambda: ('GET', '/shows/past', None),
+        'show_venue': lambda: ('GET', f'/venues/{rng.choice(venue_ids)}', None),
+        'show_artist': lambda: ('GET', f'/artists/{rng.choice(artist_ids)}', None),
+        'venue_past_shows': lambda: ('GET', f'/venues/{rng.choice(venue_ids)}/past-shows?partial=1', None),
+        'artist_past_shows': lambda: ('GET', f'/artists/{rng.choice(artist_ids)}/past-shows', None),
+        'search_venues': lambda: ('POST', '/venues/search', {'search_term': term()}),
+        'search_artists': lambda: ('POST', '/artists/search', {'search_term': term()}),
+        'create_venue_form': lambda: ('GET', '/venues/create', None),
+        'create_artist_form': lambda: ('GET', '/artists/create', None),
+        'create_shows': lambda: ('GET', '/shows/create', None),
+        'edit_venue': lambda: ('GET', f'/venues/{rng.choice(venue_ids)}/edit', None),
+        'edit_artist': lambda: ('GET', f'/artists/{rng.choice(artist_ids)}/edit', None),
+        'create_venue_submission': lambda: ('POST', '/venues/create', venue_form),
+        'create_artist_submission': lambda: ('POST', '/artists/create', artist_form),
+        'create_show_submission': lambda: ('POST', '/shows/create', {
+            'venue_id': rng.choice(venue_ids), 'artist_id': rng.choice(artist_ids),
+            'start_time': '2030-06-01 20:00:00',
+        }),
+        'edit_venue_submission': lambda: ('POST', f'/venues/{rng.choice(venue_ids)}/edit', venue_form),
+        'edit_artist_submission': lambda: ('POST', f'/artists/{rng.choice(artist_ids)}/edit', artist_form),
+        'export_venues': lambda: ('GET', f'/export/venues.csv?city={urllib.parse.quote(city())}', None),
+        'export_shows': lambda: ('GET', f'/export/shows.jsonl?since={week[0]}&until={week[1]}', None),
+        'api_venues': lambda: ('GET', '/api/v1/venues', None),
+        'api_venues_ids': lambda: ('GET', '/api/v1/venues?include=shows&ids='
+                                   + ','.join(map(str, rng.sample(venue_ids, min(20, len(venue_ids))))), None),
+        'api_venue': lambda: ('GET', f'/api/v1/venues/{rng.choice(venue_ids)}?include=shows', None),
+        'api_artists': lambda: ('GET', '/api/v1/artists?fields=name,city,state,genres', None),
+        'api_artist': lambda: ('GET', f'/api/v1/artists/{rng.choice(artist_ids)}?include=shows', None),
+        'api_shows': lambda: ('GET', f'/api/v1/shows?venue_id={rng.choice(venue_ids)}', None),
+        'api_show': lambda: ('GET', f'/api/v1/shows/{rng.choice(show_ids)}', None),
+        'venue_availability': lambda: ('GET', f'/api/v1/venues/{rng.choice(venue_ids)}/availability', None),
+        'artist_availability': lambda: ('GET', f'/api/v1/artists/{rng.choice(artist_ids)}/availability'
+                                        f'?since={week[0]}T00:00&until={week[1]}T00:00&min_minutes=120', None),
+        'venues_near_me': lambda: ('GET', '/venues/near?lat=%s&lng=%s' % point(), None),
+        'api_venues_near': lambda: ('GET', '/api/v1/venues/near?lat=%s&lng=%s&radius=50' % point(), None),
+        # The first lookup builds the index, as the preload is off here.
+        'venue_autocomplete': lambda: ('GET', f'/api/v1/venues/autocomplete?q={term()[:3]}', None),
+        'artist_autocomplete': lambda: ('GET', f'/api/v1/artists/autocomplete?q={term()[:3]}', None),
+    }
+
+
+def queries_of(headers):
+    match = SERVER_TIMING_QUERIES.search(headers.get('Server-Timing') or '')
+    return int(match.group(1)) if match else None
+
+
+def run_test_client(app, factory, count):
+    client = app.test_client()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(count):
+        method, path, data = factory()
+        begin = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        # Streamed responses are only produced as they are read.
+        response.get_data()
+        samples.append(((time.perf_counter() - begin) * 1000, queries_of(response.headers), response.status_code))
+    return samples, time.perf_counter() - started
+
+
+def serve(port, workers, page_cache):
+    from werkzeug.serving import make_server
+
+    # A forked child inherits the configured app; a spawned one loads it.
+    app = APP or load_app(page_cache)
+    make_server('127.0.0.1', port, app, processes=workers).serve_forever()
+
+
+def run_server(base_url, factory, count, concurrency):
+    def fetch(_):
+        method, path, data = factory()
+        body = urllib.parse.urlencode(data).encode() if data else None
+        request = urllib.request.Request(base_url + path, data=body, method=method)
+        begin = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as error:
+            status, headers = error.code, error.headers
+        return (time.perf_counter() - begin) * 1000, queries_of(headers), status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = list(pool.map(fetch, range(count)))
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(latency for latency, _, _ in samples)
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    queries = [count for _, count, _ in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, status in samples if status >= 500),
+        'p50_ms': round(cuts[49], 2),
+        'p95_ms': round(cuts[94], 2),
+        'p99_ms': round(cuts[98], 2),
+        'rps': round(len(samples) / elapsed, 1),
+        'queries': max(queries) if queries else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+    for endpoint, result in results.items():
+        expected = baseline.get(endpoint)
+        if expected is None:
+            continue
+        if result['errors']:
+            failures.append(f'{endpoint}: {result["errors"]} server errors')
+        if result['queries'] is not None and expected['queries'] is not None \
+                and result['queries'] > expected['queries']:
+            failures.append(f'{endpoint}: {result["queries"]} queries per request, baseline {expected["queries"]}')
+        if result['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+            failures.append(f'{endpoint}: p95 {result["p95_ms"]}ms, baseline {expected["p95_ms"]}ms')
+    return failures
+
+
+def ilike_search(model, search_term):
+    # The search before search_catalog(): a substring match on the name
+    # alone, which no B-tree index can serve, so every search scans the table.
+    from app import db
+
+    rows = db.session.query(model.id, model.name).filter(model.name.ilike('%' + search_term + '%')).all()
+    return {'count': len(rows), 'data': [{'id': id, 'name': name, 'num_upcoming_shows': 0} for id, name in rows]}
+
+
+def compare_search(app, count, rng):
+    from app import db, Venue, Artist, venue_genres, artist_genres, search_catalog
+
+    catalogs = [
+        ('venue', Venue, venue_genres.c.venue_id, 'venue_search'),
+        ('artist', Artist, artist_genres.c.artist_id, 'artist_search'),
+    ]
+    results = {}
+    with app.app_context():
+        for name, model, genre_owner, search_table in catalogs:
+            rows = db.session.query(model).count()
+            engines = [
+                ('ilike', lambda term: ilike_search(model, term)),
+                ('search', lambda term: search_catalog(model, genre_owner, search_table, term, 1)),
+            ]
+            for engine, search in engines:
+                samples = []
+                started = time.perf_counter()
+                for _ in range(count):
+                    term = rng.choice(SEARCH_TERMS)
+                    begin = time.perf_counter()
+                    search(term)
+                    samples.append(((time.perf_counter() - begin) * 1000, None, 200))
+                    db.session.remove()
+                results[f'{name}_search_{engine}'] = dict(summarize(samples, time.perf_counter() - started), rows=rows)
+    return results
+
+
+def check_search(app, args):
+    results = compare_search(app, args.requests, random.Random(args.random_seed))
+    print(f'{"search":<26}{"rows":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"req/s":>9}')
+    for search, result in results.items():
+        print(f'{search:<26}{result["rows"]:>9}{result["p50_ms"]:>9}{result["p95_ms"]:>9}'
+              f'{result["p99_ms"]:>9}{result["rps"]:>9}')
+    for name in ('venue', 'artist'):
+        ilike, search = results[f'{name}_search_ilike'], results[f'{name}_search_search']
+        print(f'{name} search p95 {search["p95_ms"]}ms against {ilike["p95_ms"]}ms for the ILIKE scan, '
+              f'speed-up {ilike["p95_ms"] / max(search["p95_ms"], 0.01):.1f}x')
+
+
+def format_times(count, rng):
+    # Drawn like the seeded shows, so the same times come round again as on
+    # real listings.
+    from seed import show_time
+
+    now = datetime.datetime.now()
+    return [show_time(rng, now) for _ in range(count)]
+
+
+def compare_formatting(times):
+    import babel.dates
+    import dateutil.parser
+    from formatting import FORMATS, format_datetime, format_native_datetime
+
+    def parse_and_format(value):
+        # The filter before formatting.py: the /shows view passed str(start_time).
+        return babel.dates.format_datetime(dateutil.parser.parse(str(value)), FORMATS['full'], locale='en')
+
+    format_native_datetime.cache_clear()
+    formatters = [
+        ('dateutil + babel', parse_and_format),
+        ('compiled pattern', lambda value: format_native_datetime.__wrapped__(value, 'full', 'en')),
+        ('format_datetime', lambda value: format_datetime(value, 'full')),
+    ]
+    results = {}
+    for name, formatter in formatters:
+        started = time.perf_counter()
+        outputs = [formatter(value) for value in times]
+        results[name] = ((time.perf_counter() - started) * 1000, outputs)
+    expected = results['dateutil + babel'][1]
+    for name, (_, outputs) in results.items():
+        if outputs != expected:
+            sys.exit(f'{name} formats show times differently from dateutil + babel')
+    return {name: ms for name, (ms, _) in results.items()}
+
+
+def check_formatting(args):
+    results = compare_formatting(format_times(args.format_times, random.Random(args.random_seed)))
+    slowest = results['dateutil + babel']
+    print(f'{"formatter":<26}{"total ms":>10}{"us each":>10}{"speed-up":>10}')
+    for name, ms in results.items():
+        print(f'{name:<26}{ms:>10.1f}{ms * 1000 / args.format_times:>10.1f}{slowest / ms:>9.1f}x')
+
+
+def time_script(script, env):
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return float(process.stdout.strip().splitlines()[-1]), process.stderr
+
+
+def measure_startup(runs):
+    # Each run is a fresh interpreter, alternating between the app and the
+    # framework floor; the fastest of each is reported, as the others only
+    # add noise from the machine. With the autocomplete preload off nothing
+    # connects to the database at start-up, so an in-memory SQLite URL is
+    # enough.
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    best = floor = None
+    for _ in range(runs):
+        total, report = time_script(STARTUP_SCRIPT, env)
+        if best is None or total < best[0]:
+            best = (total, report)
+        framework, _ = time_script(FRAMEWORK_STARTUP_SCRIPT, env)
+        floor = framework if floor is None else min(floor, framework)
+
+    total, report = best
+    packages = {}
+    for line in report.splitlines():
+        match = IMPORT_TIME.match(line)
+        # Self times summed per top-level package, so nested modules are
+        # not counted twice.
+        if match:
+            package = match.group(2).split('.')[0]
+            packages[package] = packages.get(package, 0) + int(match.group(1)) / 1000
+    return total, floor, sorted(((ms, package) for package, ms in packages.items()), reverse=True)
+
+
+def check_startup(args):
+    total, floor, imports = measure_startup(args.startup_runs)
+    print(f'{"package":<30}{"import ms":>10}')
+    for ms, package in imports[:args.startup_top]:
+        print(f'{package:<30}{ms:>10.1f}')
+    print(f'Start-up (import app + create_app()): {total:.1f}ms')
+    print(f'Framework floor (Flask, Flask-SQLAlchemy, PostgreSQL dialect): {floor:.1f}ms, '
+          f'app overhead {total - floor:.1f}ms')
+    failed = False
+    if args.startup_budget_ms and total > args.startup_budget_ms:
+        print(f'REGRESSION start-up {total:.1f}ms, budget {args.startup_budget_ms}ms')
+        failed = True
+    if args.startup_overhead_budget_ms and total - floor > args.startup_overhead_budget_ms:
+        print(f'REGRESSION start-up overhead {total - floor:.1f}ms, budget {args.startup_overhead_budget_ms}ms')
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test benchmark for the Fyyur routes.')
+    parser.add_argument('--seed', action='store_true', help='migrate and seed the database first')
+    parser.add_argument('--scale', default='1k', help='seed scale: 1k, 100k or 1m shows')
+    parser.add_argument('--venues', type=int, help='venues to seed (default: shows/50)')
+    parser.add_argument('--artists', type=int, help='artists to seed (default: shows/20)')
+    parser.add_argument('--random-seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--endpoints', help='comma-separated subset of endpoints to run')
+    parser.add_argument('--page-cache', action='store_true', help='keep the rendered-page cache on')
+    parser.add_argument('--server', action='store_true', help='drive a local multi-process server')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--baseline', default='benchmark_baseline.json')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--check', action='store_true', help='fail on regressions against the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 slowdown')
+    parser.add_argument('--startup', action='store_true', help='measure worker start-up instead of the routes')
+    parser.add_argument('--startup-budget-ms', type=float, help='fail when start-up takes longer')
+    parser.add_argument('--startup-overhead-budget-ms', type=float,
+                        help='fail when start-up takes this much longer than the framework alone')
+    parser.add_argument('--startup-runs', type=int, default=5)
+    parser.add_argument('--startup-top', type=int, default=15, help='number of packages listed')
+    parser.add_argument('--search-compare', action='store_true',
+                        help='time the search against the old ILIKE scan instead of the routes')
+    parser.add_argument('--format-times', type=int, metavar='COUNT',
+                        help='time formatting COUNT show times instead of the routes')
+    args = parser.parse_args()
+
+    if args.startup:
+        return check_startup(args)
+    if args.format_times:
+        return check_formatting(args)
+
+    # Baselines hold this machine's latencies, so each contributor saves their own.
+    if args.check and not args.save and not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}, skipping the regression check. '
+              'Save one first: DATABASE_URL=... python benchmark.py --seed --save')
+        return
+
+    if 'DATABASE_URL' not in os.environ:
+        sys.exit('Set DATABASE_URL to a scratch database; the benchmark writes to it.')
+
+    app = load_app(args.page_cache)
+    venue_ids, artist_ids, show_ids = prepare_database(app, args)
+    if args.search_compare:
+        return check_search(app, args)
+    factories = build_requests(venue_ids, artist_ids, show_ids, random.Random(args.random_seed))
+    if args.endpoints:
+        factories = {name: factories[name] for name in args.endpoints.split(',')}
+
+    server = None
+    if args.server:
+        server = multiprocessing.Process(target=serve, args=(args.port, args.workers, args.page_cache), daemon=True)
+        server.start()
+        time.sleep(1)
+
+    results = {}
+    try:
+        for endpoint, factory in factories.items():
+            if server:
+                samples, elapsed = run_server(f'http://127.0.0.1:{args.port}', factory,
+                                              args.requests, args.concurrency)
+            else:
+                samples, elapsed = run_test_client(app, factory, args.requests)
+            results[endpoint] = summarize(samples, elapsed)
+    finally:
+        if server:
+            server.terminate()
+
+    print(f'{"endpoint":<26}{"p50":>9}{"p95":>9}{"p99":>9}{"req/s":>9}{"queries":>9}{"5xx":>6}')
+    for endpoint, result in results.items():
+        print(f'{endpoint:<26}{result["p50_ms"]:>9}{result["p95_ms"]:>9}{result["p99_ms"]:>9}'
+              f'{result["rps"]:>9}{str(result["queries"]):>9}{result["errors"]:>6}')
+
+    if args.save:
+        with open(args.baseline, 'w') as baseline:
+            json.dump(results, baseline, indent=2, sort_keys=True)
+        print(f'Baseline saved to {args.baseline}')
+    if args.check:
+        with open(args.baseline) as baseline:
+            failures = compare(results, json.load(baseline), args.tolerance)
+        for failure in failures:
+            print('REGRESSION ' + failure)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
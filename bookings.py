@@ -0,0 +1,154 @@
+import bisect
+import datetime
+
+from flask import current_app
+
+# A show books its venue and its artist from start_time to end_time
+# (half-open, so back-to-back shows do not clash). New shows are checked by
+# reject_conflicts() against an IntervalIndex of the existing ones. On
+# PostgreSQL every monthly partition of shows also has exclusion constraints,
+# which catch concurrent bookings but cannot see across partitions.
+
+# Constraint name prefixes; each partition appends its own suffix.
+CONSTRAINTS = {
+    'ex_shows_venue_overlap': 'venue',
+    'ex_shows_artist_overlap': 'artist',
+}
+
+
+class BookingError(Exception):
+    pass
+
+
+class BookingConflict(BookingError):
+
+    def __init__(self, owner):
+        super().__init__(f'The {owner} is already booked at that time.')
+        self.owner = owner
+
+
+class IntervalIndex(object):
+    # Busy [start, end) intervals of one venue or artist. Overlapping input is
+    # merged, so the intervals are disjoint and sorted by start and by end
+    # alike, and both lookups are binary searches.
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if self.ends and start < self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def overlaps(self, start, end):
+        # Of the intervals starting before `end`, the last one ends latest.
+        index = bisect.bisect_left(self.starts, end)
+        return index > 0 and self.ends[index - 1] > start
+
+    def add(self, start, end):
+        # Only for intervals that do not overlap the index.
+        index = bisect.bisect_left(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+
+    def gaps(self, since, until, min_length=datetime.timedelta(0)):
+        # Free [start, end) slots between since and until, at least min_length long.
+        free = []
+        cursor = since
+        first = bisect.bisect_right(self.ends, since)
+        for start, end in zip(self.starts[first:], self.ends[first:]):
+            if start >= until:
+                break
+            if start > cursor and start - cursor >= min_length:
+                free.append((cursor, start))
+            cursor = max(cursor, end)
+        if until > cursor and until - cursor >= min_length:
+            free.append((cursor, until))
+        return free
+
+
+def max_duration():
+    return datetime.timedelta(hours=current_app.config['SHOW_MAX_DURATION_HOURS'])
+
+
+def show_end(start_time, end_time=None):
+    # The end of a new show: end_time, or SHOW_DEFAULT_DURATION_MINUTES after
+    # the start. Shows that end before they start or last longer than
+    # SHOW_MAX_DURATION_HOURS are refused.
+    if end_time is None:
+        return start_time + datetime.timedelta(minutes=current_app.config['SHOW_DEFAULT_DURATION_MINUTES'])
+    if end_time <= start_time:
+        raise BookingError('A show must end after it starts.')
+    if end_time - start_time > max_duration():
+        raise BookingError(f'A show cannot last longer than {current_app.config["SHOW_MAX_DURATION_HOURS"]} hours.')
+    return end_time
+
+
+def busy_intervals(owner_column, owner_ids, since, until):
+    # The shows of the owners overlapping [since, until), as
+    # {owner_id: [(start, end), ...]}, in one query. A show can only reach
+    # into the range if it starts at most SHOW_MAX_DURATION_HOURS before it,
+    # which bounds the range scan on the (owner, start_time) index.
+    from app import db, Show
+
+    rows = db.session.query(owner_column, Show.start_time, Show.end_time).filter(
+        owner_column.in_(owner_ids),
+        Show.start_time >= since - max_duration(),
+        Show.start_time < until,
+        Show.end_time > since,
+    )
+    intervals = {owner_id: [] for owner_id in owner_ids}
+    for owner_id, start, end in rows:
+        intervals[owner_id].append((start, end))
+    return intervals
+
+
+def reject_conflicts(shows):
+    # Splits new shows, given as (key, venue_id, artist_id, start, end), into
+    # the keys of those that can be booked and (key, 'venue' or 'artist')
+    # for those that clash with an existing show or with an earlier one of
+    # the batch. Two queries for the whole batch.
+    from app import Show
+
+    if not shows:
+        return [], []
+    since = min(show[3] for show in shows)
+    until = max(show[4] for show in shows)
+    indexes = {}
+    for owner, column, position in (('venue', Show.venue_id, 1), ('artist', Show.artist_id, 2)):
+        owner_ids = {show[position] for show in shows}
+        for owner_id, intervals in busy_intervals(column, owner_ids, since, until).items():
+            indexes[owner, owner_id] = IntervalIndex(intervals)
+
+    accepted, conflicts = [], []
+    for key, venue_id, artist_id, start, end in shows:
+        for owner, owner_id in (('venue', venue_id), ('artist', artist_id)):
+            if indexes[owner, owner_id].overlaps(start, end):
+                conflicts.append((key, owner))
+                break
+        else:
+            indexes['venue', venue_id].add(start, end)
+            indexes['artist', artist_id].add(start, end)
+            accepted.append(key)
+    return accepted, conflicts
+
+
+def conflict_owner(error):
+    # 'venue' or 'artist' if an IntegrityError comes from an exclusion
+    # constraint on shows, else None.
+    message = str(getattr(error, 'orig', error))
+    for constraint, owner in CONSTRAINTS.items():
+        if constraint in message:
+            return owner
+    return None
+
+
+def availability(owner_column, owner_id, since, until, min_length=datetime.timedelta(0)):
+    # Busy and free slots of a venue or artist over [since, until).
+    index = IntervalIndex(busy_intervals(owner_column, [owner_id], since, until)[owner_id])
+    return {
+        'busy': [(max(start, since), min(end, until)) for start, end in zip(index.starts, index.ends)],
+        'free': index.gaps(since, until, min_length),
+    }
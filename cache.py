@@ -0,0 +1,213 @@
+import time
+import pickle
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, session, current_app, get_flashed_messages, Response
+
+
+def has_session_cookie():
+    # Reading the session makes Flask add Vary: Cookie to the response, which
+    # keeps shared caches from storing it, so GET requests only open the
+    # session of visitors who sent a session cookie.
+    return current_app.session_interface.get_cookie_name(current_app) in request.cookies
+
+
+def has_flashes():
+    return has_session_cookie() and bool(session.get('_flashes'))
+
+
+def page_flashes():
+    # get_flashed_messages() for the layouts. Messages are only flashed by
+    # POST handlers, so a GET without a session cookie has none to show.
+    if request.method == 'GET' and not has_session_cookie():
+        return []
+    return get_flashed_messages()
+
+
+class NullBackend(object):
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl, tags):
+        pass
+
+    def invalidate(self, tags):
+        pass
+
+
+class LRUBackend(object):
+    # In-process cache: entries expire after their TTL and the least recently
+    # used ones are evicted past max_entries. Each worker has its own copy.
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value, tags = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, tags):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, tags):
+        with self.lock:
+            for tag in tags:
+                for key in self.tags.pop(tag, ()):
+                    self._remove(key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+class RedisBackend(object):
+    # Shared cache for multi-worker deployments. Works with any client
+    # exposing the redis-py get/set/sadd/smembers/expire/delete commands.
+
+    def __init__(self, client, prefix='fyyur:page:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl, tags):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+        for tag in tags:
+            pipe.sadd(self.prefix + 'tag:' + tag, self.prefix + key)
+            pipe.expire(self.prefix + 'tag:' + tag, ttl)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            keys = self.client.smembers(tag_key)
+            self.client.delete(tag_key, *keys)
+
+
+class PageCache(object):
+    # Caches rendered GET responses of catalog pages. Pages are tagged by the
+    # entities they show and write handlers invalidate the tags they touch.
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PAGE_CACHE_BACKEND', 'lru')
+        app.config.setdefault('PAGE_CACHE_TTL', 300)
+        app.config.setdefault('PAGE_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('PAGE_CACHE_REDIS_URL', None)
+
+        backend = app.config['PAGE_CACHE_BACKEND']
+        if backend == 'lru':
+            self.backend = LRUBackend(app.config['PAGE_CACHE_MAX_ENTRIES'])
+        elif backend == 'redis':
+            import redis
+            self.backend = RedisBackend(redis.Redis.from_url(app.config['PAGE_CACHE_REDIS_URL']))
+        else:
+            self.backend = NullBackend()
+
+    def cached(self, *tags):
+        # Tags may reference the view arguments, e.g. 'venue:{venue_id}'.
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # Pages carrying flashed messages are specific to one visitor.
+                if request.method != 'GET' or has_flashes():
+                    return view(**kwargs)
+
+                key = request.full_path
+                entry = self.backend.get(key)
+                if entry is not None:
+                    data, status, mimetype = entry
+                    return Response(data, status=status, mimetype=mimetype)
+
+                response = current_app.make_response(view(**kwargs))
+                if response.status_code == 200:
+                    entry = (response.get_data(), response.status_code, response.mimetype)
+                    page_tags = [tag.format(**kwargs) for tag in tags]
+                    self.backend.set(key, entry, current_app.config['PAGE_CACHE_TTL'], page_tags)
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        self.backend.invalidate(tags)
+
+
+def conditional(validator, last_modified=True):
+    # Answers If-None-Match / If-Modified-Since with 304 Not Modified without
+    # running the view. `validator` gets the view arguments and returns a tuple
+    # of cheap aggregates (updated_at maxima, counts) that change whenever the
+    # page does, or None to skip validation; its naive UTC datetimes give
+    # Last-Modified. Pages whose updated_at maxima can stay put while the page
+    # changes pass last_modified=False and are validated by ETag alone: a
+    # deleted row only moves the counts in the ETag, and so does a show
+    # passing from upcoming to past as the clock moves on.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if request.method != 'GET' or has_flashes():
+                return view(**kwargs)
+            values = validator(**kwargs)
+            if values is None:
+                return view(**kwargs)
+
+            etag = hashlib.sha1(repr((request.full_path, values)).encode()).hexdigest()
+            modified = [value for value in values if isinstance(value, datetime.datetime)]
+            modified_at = None
+            if modified and last_modified:
+                modified_at = max(modified).replace(microsecond=0, tzinfo=datetime.timezone.utc)
+
+            if request.if_none_match:
+                fresh = request.if_none_match.contains(etag)
+            elif request.if_modified_since and modified_at:
+                fresh = modified_at <= request.if_modified_since
+            else:
+                fresh = False
+
+            response = Response(status=304) if fresh else current_app.make_response(view(**kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag)
+                # Werkzeug stamps the current time when this is set to None.
+                if modified_at:
+                    response.last_modified = modified_at
+                response.cache_control.public = True
+                response.cache_control.max_age = current_app.config['HTTP_CACHE_MAX_AGE']
+            return response
+        return wrapper
+    return decorator
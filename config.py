@@ -1,21 +1,140 @@
 import os
-SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+
+def env_flag(name, default):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+# Enable debug mode (DEBUG=0 in production).
+DEBUG = env_flag('DEBUG', '1')
+
+# Signs the session and CSRF tokens, so every worker must share it: set
+# SECRET_KEY in production. The fixed development key is only used in debug
+# mode; create_app() refuses to start without a key otherwise.
+SECRET_KEY = os.environ.get('SECRET_KEY', 'fyyur-development-key' if DEBUG else None)
+
 
 # Connect to the database
 
-host = 'localhost'
-port = 5432
-user_name = 'postgres'
-passowrd = 'postgres'
-db_name = 'fyyur'
+host = os.environ.get('DB_HOST', 'localhost')
+port = int(os.environ.get('DB_PORT', 5432))
+user_name = os.environ.get('DB_USER', 'postgres')
+passowrd = os.environ.get('DB_PASSWORD', 'postgres')
+db_name = os.environ.get('DB_NAME', 'fyyur')
 
 conn = f'postgresql://{user_name}:{passowrd}@{host}:{port}/{db_name}'
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = conn
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', conn)
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Maximum number of past/upcoming shows listed on a venue or artist page.
+DETAIL_SHOWS_LIMIT = 30
+
+# Number of results per page on the venue and artist search pages.
+SEARCH_PAGE_SIZE = 20
+
+# Default and maximum page sizes (?limit=) of the venue, artist and show listings.
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Per-request SQL instrumentation: query count and DB time in a Server-Timing
+# header and a structured log line; requests over these thresholds are logged
+# as warnings together with their slowest statements.
+SQL_INSTRUMENTATION = False
+SQL_SLOW_QUERY_MS = 100
+SQL_SLOW_REQUEST_MS = 500
+SQL_MAX_QUERIES_PER_REQUEST = 20
+SQL_SLOWEST_STATEMENTS = 3
+
+# Rendered-page cache for the catalog pages: 'lru' (per process), 'redis'
+# (shared between workers, needs PAGE_CACHE_REDIS_URL) or 'null' (disabled).
+PAGE_CACHE_BACKEND = 'lru'
+PAGE_CACHE_TTL = 300
+PAGE_CACHE_MAX_ENTRIES = 1024
+PAGE_CACHE_REDIS_URL = None
+
+# max-age of the Cache-Control header sent with the catalog pages; clients and
+# the CDN revalidate with ETag / Last-Modified afterwards.
+HTTP_CACHE_MAX_AGE = 60
+
+# Connection pool of each worker process (see pooling.py). Connections are
+# pinged before use and recycled, so failovers do not surface as errors.
+# DB_PGBOUNCER=1 hands pooling to a transaction-mode PgBouncer (NullPool, no
+# prepared statements); the statement timeout is then set per transaction.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = env_flag('DB_POOL_PRE_PING', '1')
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+DB_PGBOUNCER = env_flag('DB_PGBOUNCER', '0')
+
+# Where the pool metrics (checked out, overflow, checkout wait) are served as
+# JSON, e.g. /metrics/db-pool; unset, there is no endpoint. When
+# DB_POOL_METRICS_TOKEN is set, requests must send it as a bearer token.
+DB_POOL_METRICS_URL = os.environ.get('DB_POOL_METRICS_URL') or None
+DB_POOL_METRICS_TOKEN = os.environ.get('DB_POOL_METRICS_TOKEN') or None
+
+# Read replicas (comma-separated URLs in DATABASE_REPLICA_URLS) serving the
+# queries of GET and HEAD requests, picked 'round_robin' or
+# 'least_connections'. Replicas that are down or lag further behind than
+# REPLICA_MAX_LAG_SECONDS (checked every REPLICA_CHECK_INTERVAL seconds) are
+# skipped; after a write the visitor reads from the primary for
+# REPLICA_STICKY_SECONDS.
+REPLICA_DATABASE_URIS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+REPLICA_SELECTION = os.environ.get('REPLICA_SELECTION', 'round_robin')
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_CHECK_INTERVAL = 10
+REPLICA_STICKY_SECONDS = 5
+
+# Static bundles built by `flask build-assets` (see assets.py), served with
+# far-future immutable caching. In debug mode the templates load the source
+# files instead, so they can be edited without rebuilding.
+ASSETS_USE_BUILD = not DEBUG
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# JSON logs written by a background thread (see logs.py): to stderr, or to
+# LOG_FILE rotated every LOG_MAX_BYTES (and stderr in debug mode). Every
+# request is logged with its id (X-Request-ID), route, status, latency and,
+# with SQL_INSTRUMENTATION, DB time; LOG_INFO_SAMPLE_RATE keeps only that
+# fraction of INFO records.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FILE = os.environ.get('LOG_FILE', '')
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+LOG_INFO_SAMPLE_RATE = float(os.environ.get('LOG_INFO_SAMPLE_RATE', 1.0))
+LOG_REQUESTS = True
+
+# Shows booked without an end time last SHOW_DEFAULT_DURATION_MINUTES; none may
+# last longer than SHOW_MAX_DURATION_HOURS (which bounds the overlap checks,
+# see bookings.py). Availability queries span at most AVAILABILITY_MAX_DAYS.
+SHOW_DEFAULT_DURATION_MINUTES = 120
+SHOW_MAX_DURATION_HOURS = 24
+AVAILABILITY_MAX_DAYS = 92
+
+# Venue coordinates come from this bundled city dataset (see geo.py and
+# `flask geocode-venues`). /venues/near returns up to VENUES_NEAR_LIMIT venues
+# within VENUES_NEAR_DEFAULT_RADIUS_KM unless asked otherwise.
+GEO_DATASET = os.path.join(basedir, 'data', 'us_cities.csv')
+VENUES_NEAR_DEFAULT_RADIUS_KM = 25
+VENUES_NEAR_MAX_RADIUS_KM = 500
+VENUES_NEAR_LIMIT = 20
+
+# Typeahead name indexes of venues and artists, held in memory by each worker
+# (see autocomplete.py): built at startup, and refreshed from rows changed
+# elsewhere at most every AUTOCOMPLETE_REFRESH_SECONDS.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_REFRESH_SECONDS = 30
+AUTOCOMPLETE_PRELOAD = True
+
+# On PostgreSQL shows is partitioned by month (see partitions.py);
+# `flask partition-shows` keeps SHOW_PARTITIONS_AHEAD_MONTHS ready and
+# `flask archive-shows` moves shows older than SHOW_RETENTION_DAYS to
+# shows_archive.
+SHOW_PARTITIONS_AHEAD_MONTHS = 12
+SHOW_RETENTION_DAYS = 365
+# /api/v1/shows lists the shows of the last API_RECENT_SHOWS_DAYS and every
+# upcoming one unless asked for ?since= or ?archived=1.
+API_RECENT_SHOWS_DAYS = 7
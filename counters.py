@@ -0,0 +1,102 @@
+import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, update, exists, bindparam
+
+# Venue.upcoming_shows_count and friends hold each venue's and artist's show
+# counts as of its show_counts_as_of: shows starting after it are upcoming.
+# New shows are classified against that watermark rather than the clock,
+# and roll_show_counts() moves shows that have since started to past and
+# advances it, so no show is ever counted twice.
+
+
+def owners():
+    from app import Venue, Artist, Show
+
+    return ((Venue, Show.venue_id, 0), (Artist, Show.artist_id, 1))
+
+
+def count_shows(shows):
+    # Adds new shows, given as (venue_id, artist_id, start_time), to the
+    # counters in the current transaction. Owner rows are locked first so a
+    # concurrent roll cannot move the watermark in between.
+    from app import db
+
+    for model, _, position in owners():
+        ids = {show[position] for show in shows}
+        as_of = dict(
+            db.session.query(model.id, model.show_counts_as_of)
+            .filter(model.id.in_(ids)).with_for_update()
+        )
+        deltas = {}
+        for show in shows:
+            owner_id = show[position]
+            delta = deltas.setdefault(owner_id, {'owner_id': owner_id, 'upcoming': 0, 'past': 0})
+            delta['upcoming' if show[2] > as_of[owner_id] else 'past'] += 1
+
+        table = model.__table__
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('owner_id')).values(
+                upcoming_shows_count=table.c.upcoming_shows_count + bindparam('upcoming'),
+                past_shows_count=table.c.past_shows_count + bindparam('past'),
+            ),
+            list(deltas.values()),
+        )
+
+
+def roll_show_counts(now=None):
+    # Moves shows that started since each owner's watermark from upcoming to
+    # past. Only owners with such shows are written; the (owner, start_time)
+    # indexes on shows serve both subqueries.
+    from app import db, Show
+
+    now = now or datetime.datetime.now()
+    rolled = 0
+    for model, owner, _ in owners():
+        started = (owner == model.id, Show.start_time > model.show_counts_as_of, Show.start_time <= now)
+        moved = select(func.count(Show.id)).where(*started).scalar_subquery()
+        result = db.session.execute(
+            update(model).where(exists().where(*started)).values(
+                upcoming_shows_count=model.upcoming_shows_count - moved,
+                past_shows_count=model.past_shows_count + moved,
+                show_counts_as_of=now,
+            ).execution_options(synchronize_session=False)
+        )
+        rolled += result.rowcount
+    db.session.commit()
+    return rolled
+
+
+def recount_show_counts(now=None):
+    # Rebuilds every counter from the shows table and its archive.
+    from app import db, Show, ArchivedShow
+
+    now = now or datetime.datetime.now()
+    for model, owner, _ in owners():
+        count = lambda *criteria: select(func.count(Show.id)).where(owner == model.id, *criteria).scalar_subquery()
+        archived = select(func.count(ArchivedShow.id)) \
+            .where(getattr(ArchivedShow, owner.key) == model.id).scalar_subquery()
+        db.session.execute(
+            update(model).values(
+                upcoming_shows_count=count(Show.start_time > now),
+                past_shows_count=count(Show.start_time <= now) + archived,
+                show_counts_as_of=now,
+            ).execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+
+@click.command('roll-show-counts')
+@click.option('--recount', is_flag=True, help='Rebuild all counters from the shows table and its archive.')
+@with_appcontext
+def roll_command(recount):
+    """Move started shows from the upcoming to the past counters (run from cron)."""
+    from app import page_cache
+
+    if recount:
+        recount_show_counts()
+        click.echo('Recounted the shows of every venue and artist.')
+    else:
+        click.echo(f'Rolled the show counts of {roll_show_counts()} venues and artists.')
+    page_cache.invalidate('venues', 'artists')
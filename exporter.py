@@ -0,0 +1,144 @@
+import io
+import csv
+import json
+import zlib
+import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows fetched per round trip from the server-side cursor, and rows
+# serialized into each chunk of output.
+BATCH_SIZE = 1000
+
+
+def genre_names(genre_owner, owner_id):
+    from app import db, Genre
+
+    if db.engine.dialect.name == 'postgresql':
+        aggregate = func.string_agg(Genre.name, ';')
+    else:
+        aggregate = func.group_concat(Genre.name, ';')
+    return select(aggregate).join(genre_owner.table, genre_owner.table.c.genre_id == Genre.id) \
+        .where(genre_owner == owner_id).scalar_subquery()
+
+
+def export_statement(kind, since=None, until=None, city=None):
+    # Shows (archived ones included) are filtered on start_time and their
+    # venue's city, venues and artists on updated_at (for incremental
+    # exports) and their own city.
+    from app import Venue, Artist, venue_genres, artist_genres, all_shows
+
+    if kind == 'shows':
+        shows = all_shows()
+        statement = select(
+            shows.c.id, shows.c.start_time, shows.c.end_time, shows.c.venue_id, Venue.name.label('venue_name'),
+            Venue.city, Venue.state, shows.c.artist_id, Artist.name.label('artist_name'),
+        ).join(Venue, Venue.id == shows.c.venue_id) \
+            .join(Artist, Artist.id == shows.c.artist_id) \
+            .order_by(shows.c.start_time, shows.c.id)
+        timestamp, city_column = shows.c.start_time, Venue.city
+    else:
+        model, genre_owner = {
+            'venues': (Venue, venue_genres.c.venue_id),
+            'artists': (Artist, artist_genres.c.artist_id),
+        }[kind]
+        columns = [column for column in model.__table__.columns]
+        statement = select(*columns, genre_names(genre_owner, model.id).label('genres')) \
+            .order_by(model.id)
+        timestamp, city_column = model.updated_at, model.city
+
+    if since:
+        statement = statement.where(timestamp >= since)
+    if until:
+        statement = statement.where(timestamp < until)
+    if city:
+        statement = statement.where(city_column == city)
+    return statement
+
+
+def export_rows(kind, **filters):
+    # Streams rows from a server-side cursor, BATCH_SIZE at a time, so memory
+    # use does not depend on the size of the table.
+    from app import db
+
+    statement = export_statement(kind, **filters).execution_options(yield_per=BATCH_SIZE)
+    result = db.session.execute(statement)
+    yield list(result.keys())
+    for partition in result.partitions():
+        yield from partition
+
+
+def serialize(rows, format):
+    # Turns the row stream into text chunks of up to BATCH_SIZE rows each.
+    columns = next(rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == 'csv':
+        writer.writerow(columns)
+
+    def default(value):
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        return str(value)
+
+    count = 0
+    for row in rows:
+        if format == 'csv':
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(dict(zip(columns, row)), default=default) + '\n')
+        count += 1
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(kind, format, gzip=False, **filters):
+    chunks = serialize(export_rows(kind, **filters), format)
+    if gzip:
+        return gzipped(chunks)
+    return (chunk.encode() for chunk in chunks)
+
+
+def parse_date(value):
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value)
+
+
+@click.command('export-catalog')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', type=click.Choice(sorted(FORMATS)), default='csv')
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='Defaults to stdout.')
+@click.option('--gzip', is_flag=True, help='Compress the output with gzip.')
+@click.option('--since', help='Only rows at or after this ISO date/time.')
+@click.option('--until', help='Only rows before this ISO date/time.')
+@click.option('--city', help='Only venues, artists or shows in this city.')
+@with_appcontext
+def export_command(kind, format, output, gzip, since, until, city):
+    """Export venues, artists or shows as CSV or JSON lines."""
+    try:
+        since, until = parse_date(since), parse_date(until)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+    for chunk in export(kind, format, gzip, since=since, until=until, city=city):
+        output.write(chunk)
@@ -0,0 +1,31 @@
+import datetime
+from functools import lru_cache
+
+# Named formats accepted by the `datetime` template filter.
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def compiled_pattern(format, locale):
+    # Parsing a pattern and loading a locale are the expensive parts of a
+    # Babel format call, so each (format, locale) pair is compiled once.
+    # Babel itself is imported on first use, not at worker start.
+    from babel import Locale
+    from babel.dates import parse_pattern
+    return parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=4096)
+def format_native_datetime(value, format, locale):
+    pattern, locale = compiled_pattern(format, locale)
+    return pattern.apply(value, locale)
+
+
+def format_datetime(value, format='medium', locale='en'):
+    if not isinstance(value, datetime.datetime):
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+    return format_native_datetime(value, format, locale)
@@ -0,0 +1,220 @@
+import csv
+import math
+from functools import lru_cache
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, update, and_, or_, bindparam
+
+# Venues are placed by an offline lookup of their city and state in a bundled
+# dataset (GEO_DATASET, a CSV of city,state,latitude,longitude), never by a
+# network geocoder. Nearby venues are found through a GiST index on
+# ll_to_earth(latitude, longitude) on PostgreSQL (the earthdistance
+# extension), and elsewhere through range scans of the indexed geohash
+# column over the cells around the point.
+
+EARTH_RADIUS_KM = 6371.0
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Just after the last geohash character, to turn a prefix into a range.
+GEOHASH_END = '{'
+# The fallback search starts this close and widens until it has enough venues.
+FIRST_SEARCH_KM = 2.0
+
+
+@lru_cache(maxsize=4)
+def load_places(path):
+    with open(path, newline='', encoding='utf-8') as source:
+        return {
+            place_key(row['city'], row['state']): (float(row['latitude']), float(row['longitude']))
+            for row in csv.DictReader(source)
+        }
+
+
+def place_key(city, state):
+    return ' '.join(city.split()).lower(), state.strip().upper()
+
+
+def place_of(city, state, path=None):
+    # Venue columns for a city: latitude, longitude and geohash, or Nones
+    # when the dataset does not know it.
+    places = load_places(path or current_app.config['GEO_DATASET'])
+    coordinates = places.get(place_key(city, state)) if city and state else None
+    if coordinates is None:
+        return {'latitude': None, 'longitude': None, 'geohash': None}
+    latitude, longitude = coordinates
+    return {'latitude': latitude, 'longitude': longitude, 'geohash': encode_geohash(latitude, longitude)}
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    latitudes, longitudes = [-90.0, 90.0], [-180.0, 180.0]
+    code = []
+    bits = count = 0
+    even = True
+    while len(code) < precision:
+        interval, value = (longitudes, longitude) if even else (latitudes, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        count += 1
+        if count == 5:
+            code.append(GEOHASH_ALPHABET[bits])
+            bits = count = 0
+    return ''.join(code)
+
+
+def cell_size(precision):
+    # (height, width) in degrees of a geohash cell.
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
+
+
+def haversine_km(latitude, longitude, other_latitude, other_longitude):
+    phi, other_phi = math.radians(latitude), math.radians(other_latitude)
+    a = math.sin((other_phi - phi) / 2) ** 2 + \
+        math.cos(phi) * math.cos(other_phi) * math.sin(math.radians(other_longitude - longitude) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def steps(low, high, step):
+    value = low
+    while value < high:
+        yield value
+        value += step
+    yield high
+
+
+def covering_prefixes(latitude, longitude, radius_km):
+    # Geohash prefixes whose cells cover the bounding box of the circle: the
+    # longest prefix whose cells span at least half the box each way, so at
+    # most 3x3 cells.
+    south = max(latitude - math.degrees(radius_km / EARTH_RADIUS_KM), -90.0)
+    north = min(latitude + math.degrees(radius_km / EARTH_RADIUS_KM), 90.0)
+    cosine = math.cos(math.radians(max(abs(south), abs(north))))
+    half_width = 180.0 if cosine < 1e-9 else min(math.degrees(radius_km / (EARTH_RADIUS_KM * cosine)), 180.0)
+    west, east = longitude - half_width, longitude + half_width
+
+    precision = GEOHASH_PRECISION
+    while precision > 1:
+        height, width = cell_size(precision)
+        if 2 * height >= north - south and 2 * width >= east - west:
+            break
+        precision -= 1
+    height, width = cell_size(precision)
+    return {
+        encode_geohash(cell_latitude, (cell_longitude + 180.0) % 360.0 - 180.0, precision)
+        for cell_latitude in steps(south, north, height)
+        for cell_longitude in steps(west, east, width)
+    }
+
+
+def near_arguments(args):
+    # (latitude, longitude, radius_km, limit) from ?lat=&lng=&radius=&limit=;
+    # raises ValueError with a message for the visitor.
+    config = current_app.config
+    try:
+        latitude = float(args['lat'])
+        longitude = float(args['lng'])
+        radius_km = float(args.get('radius', config['VENUES_NEAR_DEFAULT_RADIUS_KM']))
+        limit = int(args.get('limit', config['VENUES_NEAR_LIMIT']))
+    except (KeyError, ValueError):
+        raise ValueError('lat and lng are required, and lat, lng and radius must be numbers')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('lat must be within [-90, 90] and lng within [-180, 180]')
+    if not 0 < radius_km <= config['VENUES_NEAR_MAX_RADIUS_KM']:
+        raise ValueError(f'radius must be between 0 and {config["VENUES_NEAR_MAX_RADIUS_KM"]} km')
+    return latitude, longitude, radius_km, min(max(limit, 1), config['MAX_PAGE_SIZE'])
+
+
+def venues_near(latitude, longitude, radius_km, limit):
+    # The `limit` venues closest to the point within radius_km, nearest
+    # first, as dicts with their distance and upcoming show count.
+    from app import db, Venue
+
+    columns = (Venue.id, Venue.name, Venue.city, Venue.state, Venue.image_link,
+               Venue.upcoming_shows_count, Venue.latitude, Venue.longitude)
+
+    if db.engine.dialect.name == 'postgresql':
+        point = func.ll_to_earth(latitude, longitude)
+        location = func.ll_to_earth(Venue.latitude, Venue.longitude)
+        distance = func.earth_distance(point, location)
+        rows = db.session.query(*columns, (distance / 1000).label('distance_km')).filter(
+            func.earth_box(point, radius_km * 1000).op('@>')(location),
+            distance <= radius_km * 1000,
+        ).order_by(distance, Venue.id).limit(limit)
+        found = [row._asdict() for row in rows]
+    else:
+        # Everything within search_km is in the covering cells, so once that
+        # holds `limit` venues they are the nearest ones.
+        search_km = min(FIRST_SEARCH_KM, radius_km)
+        while True:
+            cells = [and_(Venue.geohash >= prefix, Venue.geohash < prefix + GEOHASH_END)
+                     for prefix in covering_prefixes(latitude, longitude, search_km)]
+            found = []
+            for row in db.session.query(*columns).filter(or_(*cells)):
+                distance_km = haversine_km(latitude, longitude, row.latitude, row.longitude)
+                if distance_km <= search_km:
+                    found.append(dict(row._asdict(), distance_km=distance_km))
+            if len(found) >= limit or search_km >= radius_km:
+                break
+            search_km = min(search_km * 4, radius_km)
+        found.sort(key=lambda venue: (venue['distance_km'], venue['id']))
+        found = found[:limit]
+
+    for venue in found:
+        venue['distance_km'] = round(venue['distance_km'], 3)
+    return found
+
+
+def geocode_venues(path=None, everything=False):
+    # Places the venues that have no coordinates yet (or all of them) with
+    # one UPDATE per distinct city; returns the number of cities placed and
+    # the (city, state) pairs the dataset does not know.
+    from app import db, Venue
+
+    table = Venue.__table__
+    query = db.session.query(Venue.city, Venue.state).distinct()
+    if not everything:
+        query = query.filter(Venue.latitude.is_(None))
+    placed, unknown = [], []
+    for city, state in query:
+        place = place_of(city, state, path)
+        if place['geohash'] is None:
+            unknown.append((city, state))
+        else:
+            placed.append({'place_city': city, 'place_state': state,
+                           **{f'place_{key}': value for key, value in place.items()}})
+
+    if placed:
+        statement = update(table).where(
+            table.c.city == bindparam('place_city'),
+            table.c.state == bindparam('place_state'),
+        )
+        if not everything:
+            statement = statement.where(table.c.latitude.is_(None))
+        db.session.execute(statement.values(
+            latitude=bindparam('place_latitude'),
+            longitude=bindparam('place_longitude'),
+            geohash=bindparam('place_geohash'),
+        ), placed)
+    db.session.commit()
+    return len(placed), unknown
+
+
+@click.command('geocode-venues')
+@click.option('--dataset', type=click.Path(exists=True, dir_okay=False),
+              help='CSV of city,state,latitude,longitude (default: GEO_DATASET).')
+@click.option('--all', 'everything', is_flag=True, help='Place every venue again, not only new ones.')
+@with_appcontext
+def geocode_command(dataset, everything):
+    """Set venue coordinates from the bundled city dataset."""
+    placed, unknown = geocode_venues(dataset, everything)
+    click.echo(f'Placed the venues of {placed} cities.')
+    for city, state in unknown:
+        click.echo(f'Unknown city: {city}, {state}', err=True)
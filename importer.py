@@ -0,0 +1,227 @@
+import os
+import csv
+import json
+from itertools import islice
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+from werkzeug.datastructures import MultiDict
+
+from bookings import BookingError, show_end, reject_conflicts
+from forms import VenueForm, ArtistForm, ShowForm
+from geo import place_of
+from partitions import ensure_partitions
+
+FORMS = {
+    'venues': VenueForm,
+    'artists': ArtistForm,
+    'shows': ShowForm,
+}
+
+
+def read_rows(path, format):
+    # Yields (line number, row, errors) without loading the file; CSV genres
+    # are separated by ';' and line numbers count the CSV header as line 1.
+    # A JSONL line that is not a JSON object is yielded with its errors and
+    # no row, and rejected like any invalid row.
+    with open(path, newline='', encoding='utf-8') as source:
+        if format == 'csv':
+            for line, row in enumerate(csv.DictReader(source), start=2):
+                if row.get('genres'):
+                    row['genres'] = [genre.strip() for genre in row['genres'].split(';')]
+                yield line, row, None
+        else:
+            for line, text in enumerate(source, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError as error:
+                    yield line, None, {'json': [f'Invalid JSON: {error}']}
+                    continue
+                if not isinstance(row, dict):
+                    yield line, None, {'json': ['Each line must be a JSON object.']}
+                else:
+                    yield line, row, None
+
+
+def validate(kind, row):
+    formdata = MultiDict()
+    for key, value in row.items():
+        if isinstance(value, list):
+            formdata.setlist(key, [str(item) for item in value])
+        elif value is not None:
+            formdata[key] = str(value)
+    form = FORMS[kind](formdata=formdata, meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    data = {name: value for name, value in form.data.items() if value not in (None, '')}
+    if kind == 'shows':
+        try:
+            data['venue_id'] = int(data.get('venue_id'))
+            data['artist_id'] = int(data.get('artist_id'))
+        except (TypeError, ValueError):
+            return None, {'venue_id/artist_id': ['Both must be integer ids.']}
+        try:
+            data['end_time'] = show_end(data['start_time'], data.get('end_time'))
+        except BookingError as error:
+            return None, {'end_time': [str(error)]}
+    if kind == 'venues':
+        data.update(place_of(data.get('city'), data.get('state')))
+    return data, None
+
+
+def write_chunk(kind, rows):
+    # One executemany per table for the whole chunk; genres follow their
+    # parents using the ids returned in parameter order.
+    from app import db, Venue, Artist, Show, venue_genres, artist_genres, genre_ids
+    from counters import count_shows
+
+    if kind == 'shows':
+        db.session.execute(insert(Show), [
+            {'venue_id': row['venue_id'], 'artist_id': row['artist_id'],
+             'start_time': row['start_time'], 'end_time': row['end_time']}
+            for row in rows
+        ])
+        count_shows([(row['venue_id'], row['artist_id'], row['start_time']) for row in rows])
+        return
+
+    model, genre_table, owner = {
+        'venues': (Venue, venue_genres, 'venue_id'),
+        'artists': (Artist, artist_genres, 'artist_id'),
+    }[kind]
+    columns = set(model.__table__.columns.keys()) - {'id'}
+    ids = db.session.scalars(
+        insert(model).returning(model.id, sort_by_parameter_order=True),
+        [{key: value for key, value in row.items() if key in columns} for row in rows],
+    ).all()
+    ids_by_name = genre_ids({genre for row in rows for genre in row.get('genres') or ()})
+    genres = [
+        {owner: entity_id, 'genre_id': ids_by_name[genre]}
+        for entity_id, row in zip(ids, rows)
+        for genre in set(row.get('genres') or ())
+    ]
+    if genres:
+        db.session.execute(insert(genre_table), genres)
+
+
+def reject_unknown_ids(rows):
+    # Shows referencing missing venues/artists are rejected per row instead
+    # of failing the whole chunk on the foreign keys.
+    from app import db, Venue, Artist
+
+    venue_ids = {row['venue_id'] for _, row in rows}
+    artist_ids = {row['artist_id'] for _, row in rows}
+    known_venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+    known_artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+    valid, errors = [], []
+    for line, row in rows:
+        if row['venue_id'] not in known_venues:
+            errors.append((line, {'venue_id': ['Unknown venue.']}))
+        elif row['artist_id'] not in known_artists:
+            errors.append((line, {'artist_id': ['Unknown artist.']}))
+        else:
+            valid.append((line, row))
+    return valid, errors
+
+
+def reject_double_bookings(rows):
+    # Shows overlapping an existing show of their venue or artist, or an
+    # earlier row of the file, are rejected per row; on PostgreSQL the
+    # exclusion constraints would otherwise fail the whole chunk.
+    by_line = dict(rows)
+    accepted, conflicts = reject_conflicts([
+        (line, row['venue_id'], row['artist_id'], row['start_time'], row['end_time'])
+        for line, row in rows
+    ])
+    errors = [(line, {f'{owner}_id': [f'The {owner} is already booked at that time.']})
+              for line, owner in conflicts]
+    return [(line, by_line[line]) for line in accepted], errors
+
+
+def import_file(kind, path, format, chunk_size, checkpoint, errors_path, progress=None):
+    # Reads, validates and writes `chunk_size` rows at a time. Each chunk is
+    # committed in its own transaction together with its checkpoint (the
+    # ImportCheckpoint row named `checkpoint`), so a failed run resumes after
+    # the last committed chunk.
+    from app import db, page_cache, ImportCheckpoint
+
+    saved = db.session.get(ImportCheckpoint, checkpoint) if checkpoint else None
+    done = saved.line if saved else 0
+
+    totals = {'read': 0, 'imported': 0, 'rejected': 0}
+    touched = {kind}
+    rows = (entry for entry in read_rows(path, format) if entry[0] > done)
+    with open(errors_path, 'a') as errors_file:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            valid, errors = [], []
+            for line, row, row_errors in chunk:
+                if not row_errors:
+                    data, row_errors = validate(kind, row)
+                if row_errors:
+                    errors.append((line, row_errors))
+                else:
+                    valid.append((line, data))
+            if kind == 'shows' and valid:
+                valid, unknown = reject_unknown_ids(valid)
+                errors.extend(unknown)
+                # Before anything in this chunk's transaction touches shows.
+                ensure_partitions(row['start_time'] for _, row in valid)
+                valid, booked = reject_double_bookings(valid)
+                errors.extend(booked)
+
+            if kind == 'shows':
+                touched.update(f'venue:{row["venue_id"]}' for _, row in valid)
+                touched.update(f'artist:{row["artist_id"]}' for _, row in valid)
+            try:
+                if valid:
+                    write_chunk(kind, [row for _, row in valid])
+                if checkpoint:
+                    db.session.merge(ImportCheckpoint(source=checkpoint, line=chunk[-1][0]))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            for line, row_errors in sorted(errors):
+                errors_file.write(json.dumps({'line': line, 'errors': row_errors}) + '\n')
+            errors_file.flush()
+
+            totals['read'] += len(chunk)
+            totals['imported'] += len(valid)
+            totals['rejected'] += len(errors)
+            if progress:
+                progress(totals)
+
+    page_cache.invalidate(*touched)
+    return totals
+
+
+@click.command('import-catalog')
+@click.argument('kind', type=click.Choice(sorted(FORMS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=1000, help='Rows validated and written per transaction.')
+@click.option('--errors', 'errors_path', help='Where rejected rows are logged (default: PATH.errors.jsonl).')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of a previous run.')
+@with_appcontext
+def import_command(kind, path, format, chunk_size, errors_path, restart):
+    """Import venues, artists or shows from a CSV or JSONL file."""
+    from app import db, ImportCheckpoint
+
+    format = format or ('csv' if path.endswith('.csv') else 'jsonl')
+    checkpoint = f'{kind}:{os.path.abspath(path)}'
+    errors_path = errors_path or path + '.errors.jsonl'
+    if restart:
+        db.session.query(ImportCheckpoint).filter_by(source=checkpoint).delete()
+        db.session.commit()
+
+    def progress(totals):
+        click.echo('{read} rows read, {imported} imported, {rejected} rejected'.format(**totals))
+
+    totals = import_file(kind, path, format, chunk_size, checkpoint, errors_path, progress)
+    click.echo(f'Done: {totals["imported"]} {kind} imported, {totals["rejected"]} rejected (see {errors_path}).')
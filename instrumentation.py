@@ -0,0 +1,105 @@
+import heapq
+import time
+
+from flask import g, current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = (time.perf_counter() - conn.info['query_start_time'].pop()) * 1000
+    if not has_request_context() or 'sql_stats' not in g:
+        return
+
+    config = current_app.config
+    stats = g.sql_stats
+    stats['count'] += 1
+    stats['time'] += elapsed
+    entry = (elapsed, stats['count'], statement)
+    if len(stats['slowest']) < config['SQL_SLOWEST_STATEMENTS']:
+        heapq.heappush(stats['slowest'], entry)
+    else:
+        heapq.heappushpop(stats['slowest'], entry)
+
+    if elapsed > config['SQL_SLOW_QUERY_MS']:
+        current_app.logger.warning('Slow query (%.2fms)', elapsed, extra={
+            'event': 'slow_query',
+            'duration_ms': round(elapsed, 2),
+            'statement': statement,
+        })
+
+
+def handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # time so the next query on the connection is not timed from it.
+    if context.connection is not None and context.statement is not None:
+        starts = context.connection.info.get('query_start_time')
+        if starts:
+            starts.pop()
+
+
+class QueryInstrumentation(object):
+    # Counts the SQL statements each request issues and how long they take,
+    # reports them in a Server-Timing header and the request log line, and
+    # flags requests over the SQL_* thresholds in config.py. Opt-in through
+    # SQL_INSTRUMENTATION.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_INSTRUMENTATION', False)
+        app.config.setdefault('SQL_SLOW_QUERY_MS', 100)
+        app.config.setdefault('SQL_SLOW_REQUEST_MS', 500)
+        app.config.setdefault('SQL_MAX_QUERIES_PER_REQUEST', 20)
+        app.config.setdefault('SQL_SLOWEST_STATEMENTS', 3)
+        if not app.config['SQL_INSTRUMENTATION']:
+            return
+
+        # Listening on the Engine class covers every engine the app creates.
+        if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+            event.listen(Engine, 'handle_error', handle_error)
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+
+    def start_request(self):
+        g.sql_stats = {'count': 0, 'time': 0.0, 'slowest': [], 'start': time.perf_counter()}
+
+    def finish_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        config = current_app.config
+        total = (time.perf_counter() - stats['start']) * 1000
+        response.headers.add(
+            'Server-Timing',
+            'db;dur=%.2f;desc="%d queries", app;dur=%.2f' % (stats['time'], stats['count'], total),
+        )
+
+        slow = (
+            stats['count'] > config['SQL_MAX_QUERIES_PER_REQUEST']
+            or total > config['SQL_SLOW_REQUEST_MS']
+        )
+        # Picked up by the request log line (logs.py).
+        g.sql_summary = {'queries': stats['count'], 'db_ms': round(stats['time'], 2)}
+        if slow:
+            current_app.logger.warning('Slow request (%d queries, %.2fms)', stats['count'], total, extra={
+                'event': 'slow_request',
+                'status': response.status_code,
+                'queries': stats['count'],
+                'db_ms': round(stats['time'], 2),
+                'total_ms': round(total, 2),
+                'slowest': [
+                    {'duration_ms': round(elapsed, 2), 'statement': statement}
+                    for elapsed, _, statement in sorted(stats['slowest'], reverse=True)
+                ],
+            })
+        return response
@@ -0,0 +1,141 @@
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, request, current_app, has_request_context
+from flask.logging import default_handler
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+# and ends up in the JSON record.
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class RequestContextFilter(logging.Filter):
+    # Stamps records with the request they were logged from. Runs on the
+    # request thread, before the record is queued.
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+            record.route = request.url_rule.rule if request.url_rule else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    # Keeps a `rate` fraction of INFO and DEBUG records; warnings and errors
+    # are always kept.
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.INFO or self.rate >= 1 or random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestLogging(object):
+    # Sends app.logger through a QueueHandler, so request threads only format
+    # and enqueue records; a QueueListener thread writes them to stderr, or to
+    # LOG_FILE (rotated every LOG_MAX_BYTES) and, in debug mode, stderr too. Records are JSON with the
+    # request id, route and, per request, status, latency and DB time.
+    # Under gunicorn, create the app in each worker (no --preload) so every
+    # worker starts its own listener thread.
+
+    def __init__(self, app=None):
+        self.listener = None
+        self.queue_handler = None
+        atexit.register(self.stop)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LOG_LEVEL', 'INFO')
+        app.config.setdefault('LOG_FILE', '')
+        app.config.setdefault('LOG_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('LOG_BACKUP_COUNT', 5)
+        app.config.setdefault('LOG_INFO_SAMPLE_RATE', 1.0)
+        app.config.setdefault('LOG_REQUESTS', True)
+
+        handlers = [logging.StreamHandler(sys.stderr)]
+        if app.config['LOG_FILE']:
+            file_handler = RotatingFileHandler(app.config['LOG_FILE'], maxBytes=app.config['LOG_MAX_BYTES'],
+                                               backupCount=app.config['LOG_BACKUP_COUNT'], delay=True)
+            # The debug server echoes the records to the console as well.
+            handlers = [file_handler] + handlers if app.debug else [file_handler]
+        # Records arrive already formatted as JSON by the queue handler.
+        for handler in handlers:
+            handler.setFormatter(logging.Formatter('%(message)s'))
+
+        records = queue.SimpleQueue()
+        queue_handler = QueueHandler(records)
+        queue_handler.setFormatter(JSONFormatter())
+        queue_handler.addFilter(RequestContextFilter())
+        queue_handler.addFilter(SamplingFilter(app.config['LOG_INFO_SAMPLE_RATE']))
+
+        # app.logger is shared by every app created in the process.
+        self.stop()
+        app.logger.removeHandler(self.queue_handler)
+        self.listener = QueueListener(records, *handlers, respect_handler_level=True)
+        self.listener.start()
+        self.queue_handler = queue_handler
+
+        # Flask's console handler would write on the request thread.
+        app.logger.removeHandler(default_handler)
+        app.logger.addHandler(queue_handler)
+        app.logger.setLevel(app.config['LOG_LEVEL'])
+
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+
+    def stop(self):
+        # Flushes the queued records; also runs at interpreter exit.
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def start_request(self):
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_start = time.perf_counter()
+
+    def finish_request(self, response):
+        # Registered before QueryInstrumentation, so it runs after it and
+        # finds the request's g.sql_summary.
+        if 'request_id' not in g:
+            return response
+        response.headers['X-Request-ID'] = g.request_id
+        if not current_app.config['LOG_REQUESTS']:
+            return response
+        extra = {
+            'event': 'request',
+            'status': response.status_code,
+            'latency_ms': round((time.perf_counter() - g.request_start) * 1000, 2),
+        }
+        # Query count and DB time, when SQL_INSTRUMENTATION is on.
+        extra.update(g.get('sql_summary', {}))
+        level = logging.ERROR if response.status_code >= 500 else logging.INFO
+        current_app.logger.log(level, '%s %s %s', request.method, request.path, response.status_code, extra=extra)
+        return response
@@ -0,0 +1,120 @@
+"""search indexes
+
+Revision ID: 2b7e9f13c4a8
+Revises: 8c3d7e41a2f6
+Create Date: 2026-10-18 02:47:15.495229
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7e9f13c4a8'
+down_revision = '8c3d7e41a2f6'
+branch_labels = None
+depends_on = None
+
+# SQLite has no trigram indexes, so local databases get one FTS5 table per
+# searchable entity instead, rebuilt row by row by triggers on the entity and
+# its genre table.
+SEARCH_TABLES = (
+    ('venue_search', 'venues', 'venue_genre_list', 'venue_id'),
+    ('artist_search', 'artists', 'artist_genre_list', 'artist_id'),
+)
+
+
+def search_rows(table, genre_table, owner):
+    return (
+        f'SELECT id, name, city, state, '
+        f'(SELECT group_concat(name, \' \') FROM {genre_table} WHERE {genre_table}.{owner} = {table}.id) '
+        f'FROM {table}'
+    )
+
+
+def create_sqlite_search():
+    for search_table, table, genre_table, owner in SEARCH_TABLES:
+        insert = f'INSERT INTO {search_table} (rowid, name, city, state, genres) {search_rows(table, genre_table, owner)}'
+
+        def refresh(owner_id):
+            return f'DELETE FROM {search_table} WHERE rowid = {owner_id}; {insert} WHERE id = {owner_id};'
+
+        op.execute(f'CREATE VIRTUAL TABLE {search_table} USING fts5(name, city, state, genres)')
+        op.execute(insert)
+        op.execute(f'CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN {refresh("NEW.id")} END')
+        op.execute(f'CREATE TRIGGER {table}_search_update AFTER UPDATE ON {table} BEGIN {refresh("NEW.id")} END')
+        op.execute(
+            f'CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} '
+            f'BEGIN DELETE FROM {search_table} WHERE rowid = OLD.id; END'
+        )
+        op.execute(
+            f'CREATE TRIGGER {genre_table}_search_insert AFTER INSERT ON {genre_table} '
+            f'BEGIN {refresh(f"NEW.{owner}")} END'
+        )
+        op.execute(
+            f'CREATE TRIGGER {genre_table}_search_update AFTER UPDATE ON {genre_table} '
+            f'BEGIN {refresh(f"OLD.{owner}")} {refresh(f"NEW.{owner}")} END'
+        )
+        op.execute(
+            f'CREATE TRIGGER {genre_table}_search_delete AFTER DELETE ON {genre_table} '
+            f'BEGIN {refresh(f"OLD.{owner}")} END'
+        )
+
+
+def drop_sqlite_search():
+    for search_table, table, genre_table, owner in SEARCH_TABLES:
+        for trigger_table in (table, genre_table):
+            for action in ('insert', 'update', 'delete'):
+                op.execute(f'DROP TRIGGER IF EXISTS {trigger_table}_search_{action}')
+        op.execute(f'DROP TABLE IF EXISTS {search_table}')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('artist_genre_list', schema=None) as batch_op:
+        batch_op.create_index('ix_artist_genre_list_name_trgm', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+    with op.batch_alter_table('artists', schema=None) as batch_op:
+        batch_op.create_index('ix_artists_city_trgm', ['city'], unique=False, postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'})
+        batch_op.create_index('ix_artists_name_trgm', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        batch_op.create_index('ix_artists_state_trgm', ['state'], unique=False, postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'})
+
+    with op.batch_alter_table('venue_genre_list', schema=None) as batch_op:
+        batch_op.create_index('ix_venue_genre_list_name_trgm', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+    with op.batch_alter_table('venues', schema=None) as batch_op:
+        batch_op.create_index('ix_venues_city_trgm', ['city'], unique=False, postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'})
+        batch_op.create_index('ix_venues_name_trgm', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        batch_op.create_index('ix_venues_state_trgm', ['state'], unique=False, postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'})
+
+    # ### end Alembic commands ###
+
+    if dialect == 'sqlite':
+        create_sqlite_search()
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        drop_sqlite_search()
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('venues', schema=None) as batch_op:
+        batch_op.drop_index('ix_venues_state_trgm', postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'})
+        batch_op.drop_index('ix_venues_name_trgm', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        batch_op.drop_index('ix_venues_city_trgm', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'})
+
+    with op.batch_alter_table('venue_genre_list', schema=None) as batch_op:
+        batch_op.drop_index('ix_venue_genre_list_name_trgm', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+    with op.batch_alter_table('artists', schema=None) as batch_op:
+        batch_op.drop_index('ix_artists_state_trgm', postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'})
+        batch_op.drop_index('ix_artists_name_trgm', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        batch_op.drop_index('ix_artists_city_trgm', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'})
+
+    with op.batch_alter_table('artist_genre_list', schema=None) as batch_op:
+        batch_op.drop_index('ix_artist_genre_list_name_trgm', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+    # ### end Alembic commands ###
@@ -0,0 +1,50 @@
+"""add show counters
+
+Revision ID: 4c8e2a6d1f93
+Revises: 9d4f1b7c3e20
+Create Date: 2026-10-18 03:24:08.511937
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8e2a6d1f93'
+down_revision = '9d4f1b7c3e20'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('venues', 'venue_id'), ('artists', 'artist_id'))
+
+
+def upgrade():
+    # Counters start from a full count as of now (show times are naive local
+    # times). As with updated_at, SQLite keeps show_counts_as_of nullable
+    # rather than recreating the tables under the search triggers.
+    dialect = op.get_bind().dialect.name
+    now = datetime.datetime.now()
+    for table, owner in OWNERS:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('show_counts_as_of', sa.DateTime(), nullable=True))
+        op.get_bind().execute(
+            sa.text(
+                f'UPDATE {table} SET '
+                f'upcoming_shows_count = (SELECT count(*) FROM shows WHERE shows.{owner} = {table}.id AND shows.start_time > :now), '
+                f'past_shows_count = (SELECT count(*) FROM shows WHERE shows.{owner} = {table}.id AND shows.start_time <= :now), '
+                f'show_counts_as_of = :now'
+            ),
+            {'now': now},
+        )
+        if dialect != 'sqlite':
+            op.alter_column(table, 'show_counts_as_of', nullable=False)
+
+
+def downgrade():
+    for table, _ in OWNERS:
+        op.drop_column(table, 'show_counts_as_of')
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
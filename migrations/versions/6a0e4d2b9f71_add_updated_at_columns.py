@@ -0,0 +1,38 @@
+"""add updated_at columns
+
+Revision ID: 6a0e4d2b9f71
+Revises: 2b7e9f13c4a8
+Create Date: 2026-10-18 02:52:14.734130
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a0e4d2b9f71'
+down_revision = '2b7e9f13c4a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Added nullable, backfilled, then made NOT NULL. SQLite can only tighten
+    # the column by recreating the table, which would drop the search
+    # triggers, so there it stays nullable and the application fills it in.
+    # The application writes naive UTC; CURRENT_TIMESTAMP is UTC on SQLite but
+    # would be stored in the server's time zone on PostgreSQL.
+    dialect = op.get_bind().dialect.name
+    now = "timezone('utc', now())" if dialect == 'postgresql' else 'CURRENT_TIMESTAMP'
+    for table in ('artists', 'shows', 'venues'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f'UPDATE {table} SET updated_at = {now}')
+        if dialect != 'sqlite':
+            op.alter_column(table, 'updated_at', nullable=False)
+        op.create_index(op.f(f'ix_{table}_updated_at'), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('venues', 'shows', 'artists'):
+        op.drop_index(op.f(f'ix_{table}_updated_at'), table_name=table)
+        op.drop_column(table, 'updated_at')
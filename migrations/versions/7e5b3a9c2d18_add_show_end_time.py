@@ -0,0 +1,54 @@
+"""add show end time
+
+Revision ID: 7e5b3a9c2d18
+Revises: 4c8e2a6d1f93
+Create Date: 2026-10-18 04:02:51.604113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e5b3a9c2d18'
+down_revision = '4c8e2a6d1f93'
+branch_labels = None
+depends_on = None
+
+# Length of the existing shows, matching SHOW_DEFAULT_DURATION_MINUTES.
+DEFAULT_DURATION_MINUTES = 120
+
+OWNERS = (('ex_shows_venue_overlap', 'venue_id'), ('ex_shows_artist_overlap', 'artist_id'))
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+    if dialect == 'postgresql':
+        op.execute(f"UPDATE shows SET end_time = start_time + interval '{DEFAULT_DURATION_MINUTES} minutes'")
+    else:  # SQLite
+        op.execute(f"UPDATE shows SET end_time = datetime(start_time, '+{DEFAULT_DURATION_MINUTES} minutes')")
+
+    # As with updated_at, SQLite keeps the column nullable rather than
+    # recreating the table under the search triggers.
+    if dialect == 'sqlite':
+        return
+    op.alter_column('shows', 'end_time', nullable=False)
+    if dialect == 'postgresql':
+        # Fails on venues or artists that are already double-booked; those
+        # shows have to be moved or shortened first.
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for name, owner in OWNERS:
+            op.create_exclude_constraint(
+                name, 'shows',
+                (owner, '='), (sa.text('tsrange(start_time, end_time)'), '&&'),
+                using='gist',
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, _ in OWNERS:
+            op.drop_constraint(name, 'shows')
+    op.drop_column('shows', 'end_time')
@@ -0,0 +1,184 @@
+"""normalize genres
+
+Revision ID: 9d4f1b7c3e20
+Revises: 6a0e4d2b9f71
+Create Date: 2026-10-18 03:10:42.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4f1b7c3e20'
+down_revision = '6a0e4d2b9f71'
+branch_labels = None
+depends_on = None
+
+# (search table, entity table, old genre list, new association table, owner)
+SEARCH_TABLES = (
+    ('venue_search', 'venues', 'venue_genre_list', 'venue_genres', 'venue_id'),
+    ('artist_search', 'artists', 'artist_genre_list', 'artist_genres', 'artist_id'),
+)
+
+
+def drop_sqlite_search(genre_tables):
+    for (search_table, table, _, _, _), genre_table in zip(SEARCH_TABLES, genre_tables):
+        for trigger_table in (table, genre_table):
+            for action in ('insert', 'update', 'delete'):
+                op.execute(f'DROP TRIGGER IF EXISTS {trigger_table}_search_{action}')
+        op.execute(f'DROP TRIGGER IF EXISTS genres_{search_table}_update')
+        op.execute(f'DROP TABLE IF EXISTS {search_table}')
+
+
+def create_sqlite_search(normalized):
+    # Same FTS5 tables as the search migration; genre names now come through
+    # the association table, and renaming a genre refreshes its owners.
+    for search_table, table, genre_list, association, owner in SEARCH_TABLES:
+        if normalized:
+            genre_table = association
+            genres = (
+                f'(SELECT group_concat(genres.name, \' \') FROM {association} '
+                f'JOIN genres ON genres.id = {association}.genre_id WHERE {association}.{owner} = {table}.id)'
+            )
+        else:
+            genre_table = genre_list
+            genres = f'(SELECT group_concat(name, \' \') FROM {genre_list} WHERE {genre_list}.{owner} = {table}.id)'
+        insert = f'INSERT INTO {search_table} (rowid, name, city, state, genres) SELECT id, name, city, state, {genres} FROM {table}'
+
+        def refresh(owner_id):
+            return f'DELETE FROM {search_table} WHERE rowid = {owner_id}; {insert} WHERE id = {owner_id};'
+
+        op.execute(f'CREATE VIRTUAL TABLE {search_table} USING fts5(name, city, state, genres)')
+        op.execute(insert)
+        op.execute(f'CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN {refresh("NEW.id")} END')
+        op.execute(f'CREATE TRIGGER {table}_search_update AFTER UPDATE ON {table} BEGIN {refresh("NEW.id")} END')
+        op.execute(
+            f'CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} '
+            f'BEGIN DELETE FROM {search_table} WHERE rowid = OLD.id; END'
+        )
+        op.execute(
+            f'CREATE TRIGGER {genre_table}_search_insert AFTER INSERT ON {genre_table} '
+            f'BEGIN {refresh(f"NEW.{owner}")} END'
+        )
+        op.execute(
+            f'CREATE TRIGGER {genre_table}_search_update AFTER UPDATE ON {genre_table} '
+            f'BEGIN {refresh(f"OLD.{owner}")} {refresh(f"NEW.{owner}")} END'
+        )
+        op.execute(
+            f'CREATE TRIGGER {genre_table}_search_delete AFTER DELETE ON {genre_table} '
+            f'BEGIN {refresh(f"OLD.{owner}")} END'
+        )
+        if normalized:
+            owners = f'(SELECT {owner} FROM {association} WHERE genre_id = NEW.id)'
+            op.execute(
+                f'CREATE TRIGGER genres_{search_table}_update AFTER UPDATE ON genres '
+                f'BEGIN DELETE FROM {search_table} WHERE rowid IN {owners}; {insert} WHERE id IN {owners}; END'
+            )
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    with op.batch_alter_table('genres', schema=None) as batch_op:
+        batch_op.create_index('ix_genres_name_trgm', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+    op.create_table('artist_genres',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    with op.batch_alter_table('artist_genres', schema=None) as batch_op:
+        batch_op.create_index('ix_artist_genres_genre_id', ['genre_id'], unique=False)
+
+    op.create_table('venue_genres',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    with op.batch_alter_table('venue_genres', schema=None) as batch_op:
+        batch_op.create_index('ix_venue_genres_genre_id', ['genre_id'], unique=False)
+    # ### end Alembic commands ###
+
+    # One canonical row per distinct (trimmed) name, then one association
+    # per owner and genre. Rows left behind by deleted venues/artists or
+    # without an owner are dropped on the way.
+    op.execute(
+        'INSERT INTO genres (name) SELECT DISTINCT TRIM(name) FROM ('
+        'SELECT venue_genre_list.name FROM venue_genre_list JOIN venues ON venues.id = venue_genre_list.venue_id '
+        'UNION SELECT artist_genre_list.name FROM artist_genre_list JOIN artists ON artists.id = artist_genre_list.artist_id'
+        ") AS names WHERE name IS NOT NULL AND TRIM(name) <> ''"
+    )
+    for _, table, genre_list, association, owner in SEARCH_TABLES:
+        op.execute(
+            f'INSERT INTO {association} ({owner}, genre_id) '
+            f'SELECT DISTINCT {genre_list}.{owner}, genres.id FROM {genre_list} '
+            f'JOIN genres ON genres.name = TRIM({genre_list}.name) '
+            f'JOIN {table} ON {table}.id = {genre_list}.{owner}'
+        )
+
+    if dialect == 'sqlite':
+        drop_sqlite_search(('venue_genre_list', 'artist_genre_list'))
+        create_sqlite_search(normalized=True)
+
+    op.drop_table('venue_genre_list')
+    op.drop_table('artist_genre_list')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    op.create_table('artist_genre_list',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=True),
+    sa.Column('artist_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('artist_id', 'name', name='uq_artist_genre_list_artist_id_name')
+    )
+    op.create_table('venue_genre_list',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=True),
+    sa.Column('venue_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('venue_id', 'name', name='uq_venue_genre_list_venue_id_name')
+    )
+    for _, _, genre_list, association, owner in SEARCH_TABLES:
+        op.create_index(f'ix_{genre_list}_name_trgm', genre_list, ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.execute(
+            f'INSERT INTO {genre_list} ({owner}, name) '
+            f'SELECT {association}.{owner}, genres.name FROM {association} '
+            f'JOIN genres ON genres.id = {association}.genre_id'
+        )
+
+    if dialect == 'sqlite':
+        drop_sqlite_search(('venue_genres', 'artist_genres'))
+        create_sqlite_search(normalized=False)
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('venue_genres', schema=None) as batch_op:
+        batch_op.drop_index('ix_venue_genres_genre_id')
+
+    op.drop_table('venue_genres')
+    with op.batch_alter_table('artist_genres', schema=None) as batch_op:
+        batch_op.drop_index('ix_artist_genres_genre_id')
+
+    op.drop_table('artist_genres')
+    with op.batch_alter_table('genres', schema=None) as batch_op:
+        batch_op.drop_index('ix_genres_name_trgm', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+    op.drop_table('genres')
+    # ### end Alembic commands ###
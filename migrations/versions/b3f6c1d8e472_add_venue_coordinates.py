@@ -0,0 +1,42 @@
+"""add venue coordinates
+
+Revision ID: b3f6c1d8e472
+Revises: 7e5b3a9c2d18
+Create Date: 2026-10-18 05:11:37.281904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f6c1d8e472'
+down_revision = '7e5b3a9c2d18'
+branch_labels = None
+depends_on = None
+
+# Existing venues are placed afterwards by `flask geocode-venues`.
+
+
+def upgrade():
+    op.add_column('venues', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('venues', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('venues', sa.Column('geohash', sa.String(length=12), nullable=True))
+    op.create_index('ix_venues_geohash', 'venues', ['geohash'], unique=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS cube')
+        op.execute('CREATE EXTENSION IF NOT EXISTS earthdistance')
+        op.create_index(
+            'ix_venues_earth', 'venues', [sa.text('ll_to_earth(latitude, longitude)')],
+            unique=False, postgresql_using='gist',
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_venues_earth', table_name='venues')
+    op.drop_index('ix_venues_geohash', table_name='venues')
+    op.drop_column('venues', 'geohash')
+    op.drop_column('venues', 'longitude')
+    op.drop_column('venues', 'latitude')
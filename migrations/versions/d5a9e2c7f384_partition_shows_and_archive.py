@@ -0,0 +1,139 @@
+"""partition shows and archive
+
+Revision ID: d5a9e2c7f384
+Revises: b3f6c1d8e472
+Create Date: 2026-10-18 06:03:12.447019
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a9e2c7f384'
+down_revision = 'b3f6c1d8e472'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, venue_id, artist_id, start_time, end_time, updated_at'
+INDEXES = (
+    ('ix_shows_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_shows_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_shows_start_time', ['start_time']),
+    ('ix_shows_updated_at', ['updated_at']),
+)
+OVERLAP_CONSTRAINTS = (('ex_shows_venue_overlap', 'venue_id'), ('ex_shows_artist_overlap', 'artist_id'))
+# Partitions created past the latest show, as SHOW_PARTITIONS_AHEAD_MONTHS.
+MONTHS_AHEAD = 12
+
+
+def next_month(month):
+    return datetime.date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def create_partition(month):
+    # Frozen copy of partitions.create_partition().
+    name = f'shows_y{month:%Y}m{month:%m}'
+    op.execute(
+        f"CREATE TABLE {name} PARTITION OF shows "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+    )
+    for constraint, owner in OVERLAP_CONSTRAINTS:
+        op.execute(
+            f'ALTER TABLE {name} ADD CONSTRAINT {constraint}_{name[len("shows_"):]} '
+            f'EXCLUDE USING gist ({owner} WITH =, tsrange(start_time, end_time) WITH &&)'
+        )
+
+
+def create_show_keys():
+    op.create_foreign_key('shows_venue_id_fkey', 'shows', 'venues', ['venue_id'], ['id'])
+    op.create_foreign_key('shows_artist_id_fkey', 'shows', 'artists', ['artist_id'], ['id'])
+    for name, columns in INDEXES:
+        op.create_index(name, 'shows', columns, unique=False)
+
+
+def upgrade():
+    op.create_table('shows_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=True),
+    sa.Column('artist_id', sa.Integer(), nullable=True),
+    sa.Column('start_time', sa.DateTime(), nullable=True),
+    sa.Column('end_time', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('shows_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_shows_archive_artist_id_start_time', ['artist_id', 'start_time'], unique=False)
+        batch_op.create_index('ix_shows_archive_start_time', ['start_time'], unique=False)
+        batch_op.create_index('ix_shows_archive_venue_id_start_time', ['venue_id', 'start_time'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # SQLite hands out the highest rowid plus one, which reuses the id of
+        # an archived show; AUTOINCREMENT never does.
+        with op.batch_alter_table('shows', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+        return
+
+    # Rebuild shows as a table partitioned by month of start_time. The
+    # primary key has to include the partition key, and the exclusion
+    # constraints move to the partitions. Shows without a start time cannot
+    # be placed in any partition and go to the archive.
+    op.execute('ALTER TABLE shows RENAME TO shows_unpartitioned')
+    op.execute('CREATE TABLE shows (LIKE shows_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (start_time)')
+    op.execute('ALTER TABLE shows ALTER COLUMN start_time SET NOT NULL')
+
+    first, last = bind.execute(sa.text('SELECT min(start_time), max(start_time) FROM shows_unpartitioned')).one()
+    today = datetime.date.today()
+    month = min(first.date() if first else today, today).replace(day=1)
+    last = max(last.date() if last else today, today).replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last = next_month(last)
+    while month <= last:
+        create_partition(month)
+        month = next_month(month)
+
+    op.execute(f'INSERT INTO shows ({COLUMNS}) SELECT {COLUMNS} FROM shows_unpartitioned WHERE start_time IS NOT NULL')
+    op.execute(f'INSERT INTO shows_archive ({COLUMNS}) SELECT {COLUMNS} FROM shows_unpartitioned WHERE start_time IS NULL')
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+    op.execute('DROP TABLE shows_unpartitioned')
+    op.execute('ALTER TABLE shows ADD CONSTRAINT shows_pkey PRIMARY KEY (id, start_time)')
+    create_show_keys()
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('ALTER TABLE shows RENAME TO shows_partitioned')
+        op.execute('CREATE TABLE shows (LIKE shows_partitioned INCLUDING DEFAULTS)')
+        op.execute('ALTER TABLE shows ALTER COLUMN start_time DROP NOT NULL')
+        op.execute(f'INSERT INTO shows ({COLUMNS}) SELECT {COLUMNS} FROM shows_partitioned')
+        op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+        op.execute('DROP TABLE shows_partitioned')
+        op.execute('ALTER TABLE shows ADD CONSTRAINT shows_pkey PRIMARY KEY (id)')
+        create_show_keys()
+    else:
+        with op.batch_alter_table('shows', recreate='always'):
+            pass
+
+    # Archived shows go back into shows.
+    op.execute(f'INSERT INTO shows ({COLUMNS}) SELECT {COLUMNS} FROM shows_archive')
+
+    if bind.dialect.name == 'postgresql':
+        for name, owner in OVERLAP_CONSTRAINTS:
+            op.create_exclude_constraint(
+                name, 'shows',
+                (owner, '='), (sa.text('tsrange(start_time, end_time)'), '&&'),
+                using='gist',
+            )
+
+    with op.batch_alter_table('shows_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_shows_archive_venue_id_start_time')
+        batch_op.drop_index('ix_shows_archive_start_time')
+        batch_op.drop_index('ix_shows_archive_artist_id_start_time')
+
+    op.drop_table('shows_archive')
@@ -0,0 +1,32 @@
+"""add import checkpoints
+
+Revision ID: e8b4f0a6c213
+Revises: d5a9e2c7f384
+Create Date: 2026-10-18 09:42:05.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b4f0a6c213'
+down_revision = 'd5a9e2c7f384'
+branch_labels = None
+depends_on = None
+
+# Replaces the <file>.checkpoint files of `flask import-catalog`, which were
+# written after the chunk's commit.
+
+
+def upgrade():
+    op.create_table('import_checkpoints',
+    sa.Column('source', sa.String(length=500), nullable=False),
+    sa.Column('line', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade():
+    op.drop_table('import_checkpoints')
@@ -0,0 +1,178 @@
+import re
+import datetime
+import threading
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import text, select, insert, delete
+
+# On PostgreSQL `shows` is partitioned by RANGE (start_time), one partition per
+# month named shows_yYYYYmMM. Queries for upcoming shows filter on start_time,
+# so the planner only reads the current and later months. Each partition
+# carries the booking exclusion constraints, which PostgreSQL cannot declare
+# on the partitioned table itself. Partitions are created ahead by
+# `flask partition-shows` and on demand before shows are written to a month
+# without one. Shows older than SHOW_RETENTION_DAYS are moved to
+# shows_archive by `flask archive-shows`, which then drops the emptied
+# partitions. Elsewhere `shows` is a plain table and only archiving applies.
+
+OVERLAP_CONSTRAINTS = (('ex_shows_venue_overlap', 'venue_id'), ('ex_shows_artist_overlap', 'artist_id'))
+PARTITION_NAME = re.compile(r'^shows_y(\d{4})m(\d{2})$')
+# pg_advisory_xact_lock key serializing partition DDL between processes.
+PARTITION_LOCK = 4216
+
+# Months known to have a partition, per database URL, so writes to an
+# existing month cost no query. Months past the retention window are not
+# remembered, as archiving may drop them.
+known_months = {}
+known_lock = threading.Lock()
+
+
+def month_start(value):
+    return datetime.datetime(value.year, value.month, 1)
+
+
+def next_month(month):
+    return datetime.datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def months_between(first, last):
+    month = month_start(first)
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+
+def partition_name(month):
+    return f'shows_y{month:%Y}m{month:%m}'
+
+
+def retention_cutoff(now=None):
+    now = now or datetime.datetime.now()
+    return now - datetime.timedelta(days=current_app.config['SHOW_RETENTION_DAYS'])
+
+
+def create_partition(connection, month):
+    # Called with PARTITION_LOCK held; False if the partition exists.
+    name = partition_name(month)
+    if connection.execute(text('SELECT to_regclass(:name)'), {'name': name}).scalar() is not None:
+        return False
+    connection.execute(text(
+        f"CREATE TABLE {name} PARTITION OF shows "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+    ))
+    for constraint, owner in OVERLAP_CONSTRAINTS:
+        connection.execute(text(
+            f'ALTER TABLE {name} ADD CONSTRAINT {constraint}_{name[len("shows_"):]} '
+            f'EXCLUDE USING gist ({owner} WITH =, tsrange(start_time, end_time) WITH &&)'
+        ))
+    return True
+
+
+def ensure_partitions(start_times):
+    # Creates the partitions of the months the start times fall in. The DDL
+    # runs on its own connection and commits at once; it locks `shows`, so
+    # call this before the current transaction reads or writes shows.
+    from app import db
+
+    if db.engine.dialect.name != 'postgresql':
+        return 0
+    with known_lock:
+        known = known_months.setdefault(str(db.engine.url), set())
+        months = {month_start(start_time) for start_time in start_times} - known
+    if not months:
+        return 0
+
+    created = 0
+    with db.engine.begin() as connection:
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': PARTITION_LOCK})
+        for month in sorted(months):
+            created += create_partition(connection, month)
+    cutoff = retention_cutoff()
+    with known_lock:
+        known.update(month for month in months if next_month(month) > cutoff)
+    return created
+
+
+def drop_empty_partitions(cutoff):
+    # Drops the partitions that lie wholly before the cutoff and are empty.
+    from app import db
+
+    names = db.session.scalars(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "WHERE parent.relname = 'shows' ORDER BY child.relname"
+    )).all()
+    dropped = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if not match:
+            continue
+        month = datetime.datetime(int(match.group(1)), int(match.group(2)), 1)
+        if next_month(month) <= cutoff and \
+                not db.session.execute(text(f'SELECT EXISTS (SELECT 1 FROM {name})')).scalar():
+            db.session.execute(text(f'DROP TABLE {name}'))
+            dropped.append(name)
+    db.session.commit()
+    return dropped
+
+
+def archive_shows(now=None, batch_size=5000):
+    # Moves shows that started before the retention cutoff to shows_archive,
+    # oldest first, one transaction per batch. The start_time bound keeps
+    # every statement on the old partitions. Returns the number of shows
+    # moved and the partitions dropped.
+    from app import db, Show, ArchivedShow
+
+    cutoff = retention_cutoff(now)
+    shows = Show.__table__
+    columns = [column.key for column in ArchivedShow.__table__.columns]
+    moved = 0
+    while True:
+        ids = db.session.scalars(
+            select(shows.c.id).where(shows.c.start_time < cutoff)
+            .order_by(shows.c.start_time, shows.c.id).limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        batch = (shows.c.id.in_(ids), shows.c.start_time < cutoff)
+        db.session.execute(insert(ArchivedShow.__table__).from_select(
+            columns, select(*(shows.c[name] for name in columns)).where(*batch)
+        ))
+        db.session.execute(delete(shows).where(*batch))
+        db.session.commit()
+        moved += len(ids)
+
+    dropped = drop_empty_partitions(cutoff) if db.engine.dialect.name == 'postgresql' else []
+    return moved, dropped
+
+
+@click.command('partition-shows')
+@click.option('--months', default=None, type=int, help='Months ahead to create (default: SHOW_PARTITIONS_AHEAD_MONTHS).')
+@with_appcontext
+def partition_command(months):
+    """Create the monthly partitions of shows for the coming months (run from cron)."""
+    from app import db
+
+    if db.engine.dialect.name != 'postgresql':
+        click.echo('shows is only partitioned on PostgreSQL.')
+        return
+    first = month_start(datetime.datetime.now())
+    last = first
+    for _ in range(current_app.config['SHOW_PARTITIONS_AHEAD_MONTHS'] if months is None else months):
+        last = next_month(last)
+    click.echo(f'Created {ensure_partitions(months_between(first, last))} partitions.')
+
+
+@click.command('archive-shows')
+@click.option('--batch-size', default=5000, help='Shows moved per transaction.')
+@with_appcontext
+def archive_command(batch_size):
+    """Move shows older than SHOW_RETENTION_DAYS to the archive (run from cron)."""
+    from app import page_cache
+
+    moved, dropped = archive_shows(batch_size=batch_size)
+    page_cache.invalidate('shows')
+    click.echo(f'Archived {moved} shows; dropped {len(dropped)} empty partitions.')
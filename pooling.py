@@ -0,0 +1,132 @@
+import hmac
+import time
+import threading
+
+from flask import abort, jsonify, request
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, NullPool
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that records how long each checkout waited for a connection,
+    # so pool exhaustion shows up as wait time before it becomes a timeout.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'timeouts': 0}
+        self.waits_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self.waits_lock:
+                self.waits['timeouts'] += 1
+            raise
+        finally:
+            waited = (time.perf_counter() - start) * 1000
+            with self.waits_lock:
+                self.waits['count'] += 1
+                self.waits['total_ms'] += waited
+                self.waits['max_ms'] = max(self.waits['max_ms'], waited)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.waits = self.waits
+        pool.waits_lock = self.waits_lock
+        return pool
+
+
+def engine_options(config):
+    # SQLALCHEMY_ENGINE_OPTIONS built from the DB_* settings in config.py.
+    # SQLite keeps Flask-SQLAlchemy's defaults.
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        return {}
+
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    connect_args = {}
+    if config['DB_PGBOUNCER']:
+        # PgBouncer owns the pooling; prepared statements do not survive its
+        # transaction pooling, so psycopg 3 must not create them.
+        options['poolclass'] = NullPool
+        if url.get_driver_name() == 'psycopg':
+            connect_args['prepare_threshold'] = None
+    else:
+        options.update({
+            'poolclass': TimedQueuePool,
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+        })
+        if config['DB_STATEMENT_TIMEOUT_MS'] and url.get_backend_name() == 'postgresql':
+            connect_args['options'] = '-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT_MS']
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+
+def set_local_statement_timeout(timeout_ms):
+    # PgBouncer rejects startup options, so the timeout is set per
+    # transaction instead, which also keeps it from leaking to other clients.
+    def begin(conn):
+        conn.exec_driver_sql('SET LOCAL statement_timeout = %d' % timeout_ms)
+    return begin
+
+
+class PoolMetrics(object):
+    # Exposes the connection pool of the current worker (checked out,
+    # overflow, checkout wait times) as JSON at DB_POOL_METRICS_URL. Off
+    # unless that is set; with DB_POOL_METRICS_TOKEN, requests must send it
+    # as `Authorization: Bearer <token>`.
+
+    def __init__(self, app=None, db=None):
+        self.db = db
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        app.config.setdefault('DB_POOL_METRICS_URL', None)
+        app.config.setdefault('DB_POOL_METRICS_TOKEN', None)
+        app.config.setdefault('DB_PGBOUNCER', False)
+        app.config.setdefault('DB_STATEMENT_TIMEOUT_MS', 0)
+        self.db = db or self.db
+
+        with app.app_context():
+            engine = self.db.engine
+        if app.config['DB_PGBOUNCER'] and app.config['DB_STATEMENT_TIMEOUT_MS'] \
+                and engine.dialect.name == 'postgresql':
+            event.listen(engine, 'begin', set_local_statement_timeout(app.config['DB_STATEMENT_TIMEOUT_MS']))
+
+        if app.config['DB_POOL_METRICS_URL']:
+            token = app.config['DB_POOL_METRICS_TOKEN']
+
+            def db_pool_metrics():
+                if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+                    abort(401)
+                return jsonify(self.snapshot(engine.pool))
+
+            app.add_url_rule(app.config['DB_POOL_METRICS_URL'], 'db_pool_metrics', db_pool_metrics)
+
+    def snapshot(self, pool):
+        metrics = {'pool': type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            metrics.update({
+                'size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': max(pool.overflow(), 0),
+                'max_overflow': pool._max_overflow,
+            })
+        waits = getattr(pool, 'waits', None)
+        if waits is not None:
+            with pool.waits_lock:
+                metrics['checkouts'] = waits['count']
+                metrics['wait_ms_total'] = round(waits['total_ms'], 2)
+                metrics['wait_ms_max'] = round(waits['max_ms'], 2)
+                metrics['wait_ms_avg'] = round(waits['total_ms'] / waits['count'], 2) if waits['count'] else 0.0
+                metrics['timeouts'] = waits['timeouts']
+        return metrics
@@ -0,0 +1,120 @@
+import time
+import threading
+
+from flask import g, request, session, current_app, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Replication delay in seconds, or NULL on a primary. A replica that has
+# replayed everything it received is current even if the primary is idle.
+POSTGRES_LAG = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+def replica_binds(config):
+    # SQLALCHEMY_BINDS entries for the replicas; they share the primary's
+    # SQLALCHEMY_ENGINE_OPTIONS.
+    return {f'replica_{index}': uri for index, uri in enumerate(config['REPLICA_DATABASE_URIS'])}
+
+
+class RoutingSession(Session):
+    # Sends reads to the replica picked for the current request, if any.
+    # Flushes and INSERT/UPDATE/DELETE statements always go to the primary and
+    # mark the request as a write.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or getattr(clause, 'is_dml', False):
+                g.db_wrote = True
+            elif g.get('db_replica'):
+                return self._db.engines[g.db_replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter(object):
+    # Picks a read replica (round robin or least connections) for each GET or
+    # HEAD request. Replicas that are down or lag more than
+    # REPLICA_MAX_LAG_SECONDS are skipped, falling back to the primary. After a
+    # write, the visitor's requests stay on the primary for
+    # REPLICA_STICKY_SECONDS so the redirected page shows their change.
+
+    def __init__(self, app=None, db=None):
+        self.db = db
+        self.names = []
+        self.health = {}
+        self.counter = 0
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        app.config.setdefault('REPLICA_DATABASE_URIS', [])
+        app.config.setdefault('REPLICA_SELECTION', 'round_robin')
+        app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 5)
+        app.config.setdefault('REPLICA_CHECK_INTERVAL', 10)
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+        self.db = db or self.db
+        self.names = list(replica_binds(app.config))
+        self.health = {name: {'ok': True, 'checked': 0.0} for name in self.names}
+        if not self.names:
+            return
+
+        with app.app_context():
+            for name in self.names:
+                event.listen(self.db.engines[name], 'handle_error', self.disconnect_handler(name))
+        app.before_request(self.route_request)
+        app.after_request(self.stick_after_write)
+
+    def disconnect_handler(self, name):
+        def handle_error(context):
+            if context.is_disconnect:
+                self.health[name] = {'ok': False, 'checked': time.monotonic()}
+        return handle_error
+
+    def check(self, name):
+        engine = self.db.engines[name]
+        try:
+            with engine.connect() as conn:
+                if engine.dialect.name != 'postgresql':
+                    conn.exec_driver_sql('SELECT 1')
+                    return True
+                lag = conn.exec_driver_sql(POSTGRES_LAG).scalar()
+        except Exception as error:
+            current_app.logger.warning('Replica %s is unavailable: %s', name, error)
+            return False
+        if lag is not None and lag > current_app.config['REPLICA_MAX_LAG_SECONDS']:
+            current_app.logger.warning('Replica %s is %.1fs behind the primary', name, lag)
+            return False
+        return True
+
+    def healthy(self, name):
+        state = self.health[name]
+        now = time.monotonic()
+        if now - state['checked'] > current_app.config['REPLICA_CHECK_INTERVAL']:
+            state = self.health[name] = {'ok': self.check(name), 'checked': now}
+        return state['ok']
+
+    def choose(self):
+        candidates = [name for name in self.names if self.healthy(name)]
+        if not candidates:
+            return None
+        if current_app.config['REPLICA_SELECTION'] == 'least_connections':
+            return min(candidates, key=lambda name: getattr(self.db.engines[name].pool, 'checkedout', int)())
+        with self.lock:
+            self.counter += 1
+            return candidates[self.counter % len(candidates)]
+
+    def route_request(self):
+        g.db_replica = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+        if session.get('db_primary_until', 0) > time.time():
+            return
+        g.db_replica = self.choose()
+
+    def stick_after_write(self, response):
+        if g.get('db_wrote'):
+            session['db_primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+        return response
@@ -0,0 +1,189 @@
+import random
+import datetime
+from itertools import accumulate, islice
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+
+from bookings import IntervalIndex
+from forms import VenueForm
+from geo import place_of, encode_geohash
+
+# Number of shows generated at each scale; venues and artists follow from it.
+SCALES = {
+    '1k': 1000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+# (city, state) pairs weighted roughly by the size of their music scene.
+CITIES = [
+    (('New York', 'NY'), 30), (('Los Angeles', 'CA'), 24), (('Chicago', 'IL'), 14),
+    (('Nashville', 'TN'), 12), (('Austin', 'TX'), 11), (('San Francisco', 'CA'), 9),
+    (('Seattle', 'WA'), 8), (('New Orleans', 'LA'), 8), (('Atlanta', 'GA'), 7),
+    (('Boston', 'MA'), 6), (('Denver', 'CO'), 5), (('Portland', 'OR'), 5),
+    (('Detroit', 'MI'), 4), (('Memphis', 'TN'), 4), (('Minneapolis', 'MN'), 3),
+    (('Philadelphia', 'PA'), 3), (('Miami', 'FL'), 3), (('Kansas City', 'MO'), 2),
+    (('Asheville', 'NC'), 1), (('Burlington', 'VT'), 1),
+]
+
+GENRES = [name for name, _ in VenueForm.genres.kwargs['choices']]
+
+VENUE_WORDS = (
+    ['The Blue', 'The Musical', 'Park Square', 'The Dueling', 'Red Rocks', 'Golden', 'Velvet',
+     'Midnight', 'Crystal', 'Iron', 'Silver', 'Electric', 'Underground', 'Neon', 'Old Town'],
+    ['Hop', 'Hall', 'Live', 'Pianos', 'Lounge', 'Ballroom', 'Room', 'Theatre', 'Club', 'Tavern',
+     'Garden', 'Arena', 'Cellar', 'Stage', 'House'],
+)
+ARTIST_WORDS = (
+    ['Guns', 'Matt', 'The Wild', 'Quevedo', 'The Black', 'Lonely', 'Velvet', 'Golden', 'Young',
+     'Electric', 'Howling', 'Silent', 'Broken', 'Neon', 'Dusty'],
+    ['N Petals', 'Quevedo', 'Sax Band', 'Keys', 'Wolves', 'Hearts', 'Riders', 'Saints', 'Echoes',
+     'Strangers', 'Kids', 'Pilots', 'Roses', 'Ghosts', 'Machines'],
+)
+
+
+def make_name(rng, words, index):
+    return f'{rng.choice(words[0])} {rng.choice(words[1])} {index}'
+
+
+def pick_genres(rng):
+    return set(rng.choices(GENRES, k=rng.choice((1, 1, 2, 2, 3))))
+
+
+def show_time(rng, now):
+    # Two years of history and one year of bookings, mostly evenings and
+    # weighted towards Fridays and Saturdays.
+    day = now.date() + datetime.timedelta(days=rng.randint(-730, 365))
+    while day.weekday() < 4 and rng.random() < 0.5:
+        day += datetime.timedelta(days=1)
+    return datetime.datetime.combine(day, datetime.time(rng.choice((18, 19, 20, 20, 21, 21, 22, 23))))
+
+
+def venue_place(rng, city, state):
+    # Synthetic venues are scattered up to about 10 km around their city.
+    place = place_of(city, state)
+    latitude = place['latitude'] + rng.uniform(-0.09, 0.09)
+    longitude = place['longitude'] + rng.uniform(-0.09, 0.09)
+    return {'latitude': latitude, 'longitude': longitude, 'geohash': encode_geohash(latitude, longitude)}
+
+
+def book_shows(rng, now, venue_ids, venue_weights, artist_ids, artist_weights, count):
+    # Yields `count` shows that never double-book a venue or artist. A show
+    # that clashes first tries other times; the popular end of the power law
+    # fills up at large scales, so after that it also redraws its venue and
+    # artist, which moves it down the tail.
+    venue_weights = list(accumulate(venue_weights))
+    artist_weights = list(accumulate(artist_weights))
+    booked = {}
+    for _ in range(count):
+        for attempt in range(100):
+            if attempt % 4 == 0:
+                venue_id = rng.choices(venue_ids, cum_weights=venue_weights)[0]
+                artist_id = rng.choices(artist_ids, cum_weights=artist_weights)[0]
+            start_time = show_time(rng, now)
+            end_time = start_time + datetime.timedelta(minutes=rng.choice((90, 120, 120, 150, 180)))
+            venue = booked.setdefault(('venue', venue_id), IntervalIndex())
+            artist = booked.setdefault(('artist', artist_id), IntervalIndex())
+            if not venue.overlaps(start_time, end_time) and not artist.overlaps(start_time, end_time):
+                venue.add(start_time, end_time)
+                artist.add(start_time, end_time)
+                yield {'venue_id': venue_id, 'artist_id': artist_id,
+                       'start_time': start_time, 'end_time': end_time}
+                break
+
+
+def insert_entities(table, genre_table, owner, rows, genres, batch_size):
+    from app import db, genre_ids
+
+    first_id = (db.session.query(func.max(table.c.id)).scalar() or 0) + 1
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(table.insert(), rows[start:start + batch_size])
+    ids = [row.id for row in db.session.query(table.c.id).filter(table.c.id >= first_id).order_by(table.c.id)]
+
+    ids_by_name = genre_ids(set().union(*genres))
+    genre_rows = [
+        {owner: entity_id, 'genre_id': ids_by_name[genre]}
+        for entity_id, entity_genres in zip(ids, genres)
+        for genre in entity_genres
+    ]
+    for start in range(0, len(genre_rows), batch_size):
+        db.session.execute(genre_table.insert(), genre_rows[start:start + batch_size])
+    return ids
+
+
+def seed_catalog(shows=1000, seed=0, batch_size=10000, venues=None, artists=None):
+    # Fills the catalog with `shows` shows spread over `venues` venues and
+    # `artists` artists, by default shows/50 and shows/20. Popularity follows
+    # a power law, so a few venues and artists carry most of the shows, as in
+    # real listings.
+    from app import db, Venue, Artist, Show, venue_genres, artist_genres
+    from counters import recount_show_counts
+    from partitions import ensure_partitions, months_between
+
+    rng = random.Random(seed)
+    now = datetime.datetime.now()
+    cities, city_weights = zip(*CITIES)
+
+    venue_count = venues or max(shows // 50, 10)
+    venues = []
+    for index in range(venue_count):
+        city, state = rng.choices(cities, city_weights)[0]
+        venues.append({
+            'name': make_name(rng, VENUE_WORDS, index),
+            'city': city,
+            'state': state,
+            'address': f'{rng.randint(1, 9999)} {rng.choice(["Main", "Market", "Mission", "Broadway"])} St',
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'image_link': f'https://picsum.photos/seed/venue{index}/400/300',
+            'facebook_link': f'https://www.facebook.com/venue{index}',
+            'seeking_talent': rng.random() < 0.3,
+            **venue_place(rng, city, state),
+        })
+    venue_ids = insert_entities(Venue.__table__, venue_genres, 'venue_id', venues,
+                                [pick_genres(rng) for _ in venues], batch_size)
+
+    artist_count = artists or max(shows // 20, 10)
+    artists = []
+    for index in range(artist_count):
+        city, state = rng.choices(cities, city_weights)[0]
+        artists.append({
+            'name': make_name(rng, ARTIST_WORDS, index),
+            'city': city,
+            'state': state,
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'image_link': f'https://picsum.photos/seed/artist{index}/400/300',
+            'facebook_link': f'https://www.facebook.com/artist{index}',
+            'seeking_venue': rng.random() < 0.4,
+        })
+    artist_ids = insert_entities(Artist.__table__, artist_genres, 'artist_id', artists,
+                                 [pick_genres(rng) for _ in artists], batch_size)
+
+    venue_weights = [1 / (rank + 1) ** 0.8 for rank in range(len(venue_ids))]
+    artist_weights = [1 / (rank + 1) ** 0.8 for rank in range(len(artist_ids))]
+    # Every month show_time() can pick, before the transaction touches shows.
+    ensure_partitions(months_between(now - datetime.timedelta(days=730), now + datetime.timedelta(days=372)))
+    booked = 0
+    show_rows = book_shows(rng, now, venue_ids, venue_weights, artist_ids, artist_weights, shows)
+    while True:
+        batch = list(islice(show_rows, batch_size))
+        if not batch:
+            break
+        db.session.execute(Show.__table__.insert(), batch)
+        booked += len(batch)
+    db.session.commit()
+    recount_show_counts()
+    return len(venue_ids), len(artist_ids), booked
+
+
+@click.command('seed')
+@click.option('--scale', type=click.Choice(sorted(SCALES)), default='1k', help='Number of shows to generate.')
+@click.option('--seed', 'random_seed', default=0, help='Random seed, for reproducible datasets.')
+@click.option('--venues', type=click.IntRange(1), help='Number of venues (default: shows/50).')
+@click.option('--artists', type=click.IntRange(1), help='Number of artists (default: shows/20).')
+@with_appcontext
+def seed_command(scale, random_seed, venues, artists):
+    """Fill the database with a synthetic catalog."""
+    venues, artists, shows = seed_catalog(SCALES[scale], random_seed, venues=venues, artists=artists)
+    click.echo(f'Seeded {venues} venues, {artists} artists and {shows} shows.')
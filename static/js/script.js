@@ -2,3 +2,70 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Links marked data-near-me ask the browser for its position and pass it on
+// as ?lat=&lng=; without geolocation they open the page unchanged.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest && event.target.closest('[data-near-me]');
+  if (!link || !navigator.geolocation) return;
+  event.preventDefault();
+  navigator.geolocation.getCurrentPosition(function (position) {
+    window.location = link.href.split('?')[0] +
+      '?lat=' + position.coords.latitude.toFixed(4) +
+      '&lng=' + position.coords.longitude.toFixed(4);
+  }, function () {
+    window.location = link.href;
+  });
+});
+
+// Typeahead pickers: an input with data-autocomplete="<url>" lists matching
+// names as you type and puts the chosen id into the field named by
+// data-target. Only the answer to the latest keystroke is shown.
+Array.prototype.forEach.call(document.querySelectorAll('[data-autocomplete]'), function (input) {
+  var results = input.parentNode.querySelector('.autocomplete-results');
+  var target = document.getElementById(input.getAttribute('data-target'));
+  var timer;
+  var latest = 0;
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      var request = ++latest;
+      fetch(input.getAttribute('data-autocomplete') + '?q=' + encodeURIComponent(input.value))
+        .then(function (response) { return response.json(); })
+        .then(function (body) {
+          if (request !== latest) return;
+          results.innerHTML = '';
+          body.data.forEach(function (item) {
+            var place = [item.city, item.state].filter(Boolean).join(', ');
+            var option = document.createElement('li');
+            option.textContent = item.name + (place ? ' (' + place + ')' : '') + ' #' + item.id;
+            option.addEventListener('mousedown', function (event) {
+              event.preventDefault();
+              target.value = item.id;
+              input.value = item.name;
+              results.innerHTML = '';
+            });
+            results.appendChild(option);
+          });
+        });
+    }, 100);
+  });
+  input.addEventListener('blur', function () {
+    results.innerHTML = '';
+  });
+});
+
+// Past shows are loaded on demand: links marked data-more-shows fetch the
+// next page of tiles and put it in their place.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest && event.target.closest('[data-more-shows]');
+  if (!link || !window.fetch) return;
+  event.preventDefault();
+  fetch(link.href + (link.href.indexOf('?') < 0 ? '?' : '&') + 'partial=1')
+    .then(function (response) { return response.text(); })
+    .then(function (html) {
+      var holder = link.parentNode;
+      holder.insertAdjacentHTML('beforebegin', html);
+      holder.parentNode.removeChild(holder);
+    });
+});
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_app(database_uri, **config):
+    # The app with SQL instrumentation on (its Server-Timing header gives the
+    # query count of each request) and the caches off.
+    from app import create_app
+
+    settings = {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'REPLICA_DATABASE_URIS': [],
+        'WTF_CSRF_ENABLED': False,
+        'PAGE_CACHE_BACKEND': 'null',
+        'AUTOCOMPLETE_PRELOAD': False,
+        'LOG_REQUESTS': False,
+        'SQL_INSTRUMENTATION': True,
+        'SQL_SLOW_REQUEST_MS': float('inf'),
+        'SQL_MAX_QUERIES_PER_REQUEST': float('inf'),
+    }
+    settings.update(config)
+    return create_app(settings)
+
+
+def migrate(app):
+    from flask_migrate import upgrade
+    from app import init_migrations
+
+    init_migrations(app)
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+
+
+@pytest.fixture
+def empty_app(tmp_path):
+    # A migrated, empty database of its own, for tests that write.
+    app = make_app(f'sqlite:///{tmp_path}/fyyur.db')
+    migrate(app)
+    return app
+
+
+@pytest.fixture(scope='session')
+def seeded(tmp_path_factory):
+    # Migrated SQLite databases filled by the seeder, one per size, shared by
+    # the tests that only read.
+    apps = {}
+
+    def seeded_app(shows):
+        if shows not in apps:
+            from seed import seed_catalog
+
+            path = tmp_path_factory.mktemp(f'catalog{shows}') / 'fyyur.db'
+            app = make_app(f'sqlite:///{path}')
+            migrate(app)
+            with app.app_context():
+                seed_catalog(shows)
+            apps[shows] = app
+        return apps[shows]
+    return seeded_app
+
+
+@pytest.fixture
+def app(seeded):
+    return seeded(1000)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,75 @@
+import datetime
+
+import pytest
+
+from benchmark import queries_of
+
+
+def data(client, path, **query):
+    response = client.get(path, query_string=query)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    return response.get_json()['data']
+
+
+def test_fields_select_only_the_given_columns(client):
+    venues = data(client, '/api/v1/venues', fields='name,city,genres', limit=5)
+    assert len(venues) == 5
+    assert all(set(venue) == {'id', 'name', 'city', 'genres'} for venue in venues)
+    assert all(isinstance(venue['genres'], list) for venue in venues)
+    shows = data(client, '/api/v1/shows', fields='artist_name')
+    assert shows and all(set(show) == {'id', 'start_time', 'artist_name'} for show in shows)
+
+
+def test_ids_fetch_a_batch(client):
+    assert [venue['id'] for venue in data(client, '/api/v1/venues', ids='3,1,2', fields='name')] == [1, 2, 3]
+    assert data(client, '/api/v1/artists', ids='99999') == []
+
+
+def test_include_shows_batches_every_owner(client, app):
+    def include(ids):
+        response = client.get('/api/v1/artists', query_string={'ids': ids, 'fields': 'name', 'include': 'shows'})
+        assert response.status_code == 200
+        return response.get_json()['data'], queries_of(response.headers)
+
+    one, queries_for_one = include('1')
+    many, queries_for_many = include(','.join(str(id) for id in range(1, 21)))
+    assert len(many) == 20
+    assert queries_for_one == queries_for_many
+
+    now = datetime.datetime.now().isoformat()
+    limit = app.config['DETAIL_SHOWS_LIMIT']
+    for artist in many:
+        assert len(artist['upcoming_shows']) <= limit and len(artist['past_shows']) <= limit
+        assert all(show['start_time'] > now for show in artist['upcoming_shows'])
+        assert all(show['start_time'] <= now for show in artist['past_shows'])
+        assert all(set(show) >= {'id', 'venue_id', 'venue_name', 'start_time'} for show in artist['upcoming_shows'])
+    assert any(artist['upcoming_shows'] for artist in many)
+    assert one == many[:1]
+
+
+def test_show_listing_starts_with_recent_shows(client, app):
+    shows = data(client, '/api/v1/shows', limit=50)
+    start_times = [show['start_time'] for show in shows]
+    since = datetime.datetime.now() - datetime.timedelta(days=app.config['API_RECENT_SHOWS_DAYS'], minutes=1)
+    assert start_times == sorted(start_times)
+    assert start_times[0] >= since.isoformat()
+
+
+@pytest.mark.parametrize('path', [
+    '/api/v1/venues?fields=name,password',
+    '/api/v1/venues?ids=1,two',
+    '/api/v1/venues?ids=' + ','.join(str(id) for id in range(1, 202)),
+    '/api/v1/artists?include=shows,reviews',
+    '/api/v1/shows?fields=venue',
+    '/api/v1/shows?ids=1;2',
+    '/api/v1/shows?since=yesterday',
+    '/api/v1/venues/1?fields=nope',
+])
+def test_bad_arguments_are_400(client, path):
+    assert client.get(path).status_code == 400
+
+
+@pytest.mark.parametrize('path', ['/api/v1/venues/99999', '/api/v1/artists/99999', '/api/v1/shows/99999'])
+def test_missing_records_are_404(client, path):
+    assert client.get(path).status_code == 404
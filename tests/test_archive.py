@@ -0,0 +1,79 @@
+import datetime
+
+import pytest
+
+from app import db, Venue, Artist, Show, ArchivedShow
+from counters import recount_show_counts
+from partitions import archive_shows
+
+NOW = datetime.datetime.now().replace(microsecond=0)
+# Days from now of each show, in id order: the two oldest lie past the
+# 365-day retention window and have the highest ids.
+SHOW_DAYS = [30, -3, -30, -400, -730]
+
+
+@pytest.fixture
+def app(empty_app):
+    with empty_app.app_context():
+        db.session.add(Venue(name='The Hall', city='Austin', state='TX', address='1 Main St'))
+        db.session.add(Artist(name='The Band', city='Austin', state='TX'))
+        db.session.add_all([Show(venue_id=1, artist_id=1, start_time=NOW + datetime.timedelta(days=days))
+                            for days in SHOW_DAYS])
+        db.session.commit()
+        recount_show_counts()
+    return empty_app
+
+
+def ids_of(model):
+    return sorted(id for id, in db.session.query(model.id))
+
+
+def test_archive_moves_shows_past_the_retention_window(app):
+    with app.app_context():
+        assert archive_shows(batch_size=1) == (2, [])
+        assert ids_of(Show) == [1, 2, 3]
+        assert ids_of(ArchivedShow) == [4, 5]
+        archived = db.session.get(ArchivedShow, 5)
+        assert (archived.venue_id, archived.artist_id, archived.start_time) == \
+            (1, 1, NOW - datetime.timedelta(days=730))
+        # Nothing left to move.
+        assert archive_shows() == (0, [])
+
+
+def test_recount_after_archiving_keeps_archived_shows_as_past(app):
+    with app.app_context():
+        archive_shows()
+        recount_show_counts()
+        for model in (Venue, Artist):
+            owner = db.session.get(model, 1)
+            assert (owner.upcoming_shows_count, owner.past_shows_count) == (1, 4)
+
+
+def test_archived_ids_are_not_reused(app):
+    with app.app_context():
+        archive_shows()
+        show = Show(venue_id=1, artist_id=1, start_time=NOW + datetime.timedelta(days=60))
+        db.session.add(show)
+        db.session.commit()
+        assert show.id == 6
+
+
+def listed(client, **query):
+    response = client.get('/api/v1/shows', query_string=dict(query, fields='start_time'))
+    assert response.status_code == 200
+    return [show['id'] for show in response.get_json()['data']]
+
+
+def test_api_lists_recent_and_upcoming_shows_by_default(app):
+    with app.app_context():
+        archive_shows()
+    client = app.test_client()
+    assert listed(client) == [2, 1]
+    assert listed(client, since=(NOW - datetime.timedelta(days=60)).isoformat()) == [3, 2, 1]
+    # Before the retention cutoff, or on request, the archive is read too.
+    assert listed(client, since=(NOW - datetime.timedelta(days=800)).isoformat()) == [5, 4, 3, 2, 1]
+    assert listed(client, archived=1) == [5, 4, 3, 2, 1]
+    assert client.get('/api/v1/shows?since=last+week').status_code == 400
+    # Single shows and ?ids= still reach archived shows.
+    assert client.get('/api/v1/shows/5').status_code == 200
+    assert listed(client, ids='1,5') == [5, 1]
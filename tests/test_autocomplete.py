@@ -0,0 +1,159 @@
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from app import db, autocomplete, Venue, Artist
+from autocomplete import PrefixIndex, index_keys, normalize
+
+
+def names(results):
+    return [result['name'] for result in results]
+
+
+def test_normalize_and_keys():
+    assert normalize('  Café  Tacuba!! ') == 'cafe tacuba'
+    assert normalize(None) == ''
+    assert index_keys('The Musical Hop') == ['the musical hop', 'musical hop', 'hop']
+
+
+def test_prefix_index_search():
+    index = PrefixIndex([
+        (1, 'The Musical Hop', 'San Francisco', 'CA'),
+        (2, 'Hop Scotch', 'Austin', 'TX'),
+        (3, 'Park Square Live Music & Coffee', 'San Francisco', 'CA'),
+        (4, 'Hopper', 'Austin', 'TX'),
+    ])
+    # Whole-name matches before matches on a later word.
+    assert names(index.search('hop', 10)) == ['Hop Scotch', 'Hopper', 'The Musical Hop']
+    assert names(index.search('HOP', 2)) == ['Hop Scotch', 'Hopper']
+    assert names(index.search('music', 10)) == ['Park Square Live Music & Coffee', 'The Musical Hop']
+    assert names(index.search('musical h', 10)) == ['The Musical Hop']
+    assert index.search('3', 10)[0] == {'id': 3, 'name': 'Park Square Live Music & Coffee',
+                                        'city': 'San Francisco', 'state': 'CA'}
+    assert index.search('', 10) == []
+    assert index.search('jazz', 10) == []
+
+
+def test_prefix_index_add_and_remove():
+    index = PrefixIndex([(1, 'The Musical Hop', 'San Francisco', 'CA')])
+    index.add(2, 'Dueling Pianos Bar', 'New York', 'NY')
+    assert names(index.search('pianos', 10)) == ['Dueling Pianos Bar']
+
+    # Renaming drops the keys of the old name.
+    index.add(1, 'The Jazz Club', 'San Francisco', 'CA')
+    assert index.search('musical', 10) == [] and index.search('hop', 10) == []
+    assert names(index.search('jazz', 10)) == ['The Jazz Club']
+    assert len(index.names) == 2 and len(index.words) == 4
+
+    index.remove(2)
+    index.remove(2)
+    assert index.search('dueling', 10) == [] and index.search('2', 10) == []
+    assert len(index.names) == 1 and len(index.words) == 2
+
+
+@pytest.fixture
+def app(empty_app):
+    with empty_app.app_context():
+        db.session.add_all([
+            Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street'),
+            Venue(name='Park Square Live Music & Coffee', city='San Francisco', state='CA', address='34 Whiskey Moore Ave'),
+            Artist(name='Guns N Petals', city='San Francisco', state='CA'),
+        ])
+        db.session.commit()
+    return empty_app
+
+
+def test_autocomplete_endpoints(app):
+    client = app.test_client()
+    assert names(client.get('/api/v1/venues/autocomplete?q=the m').get_json()['data']) == ['The Musical Hop']
+    assert names(client.get('/api/v1/venues/autocomplete?q=mus').get_json()['data']) == \
+        ['Park Square Live Music & Coffee', 'The Musical Hop']
+    assert len(client.get('/api/v1/venues/autocomplete?q=mus&limit=1').get_json()['data']) == 1
+    assert names(client.get('/api/v1/artists/autocomplete?q=pet').get_json()['data']) == ['Guns N Petals']
+
+
+def test_handlers_update_the_index(app):
+    client = app.test_client()
+    with app.app_context():
+        autocomplete.refresh()
+    index = autocomplete.indexes['venues']
+    client.post('/venues/create', data={
+        'name': 'Dueling Pianos', 'city': 'New York', 'state': 'NY', 'address': '335 Delancey Street',
+        'phone': '914-003-1132', 'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/pianos',
+    })
+    assert names(index.search('pianos', 10)) == ['Dueling Pianos']
+    with app.app_context():
+        assert names(autocomplete.search('venues', 'pianos', 10)) == ['Dueling Pianos']
+        autocomplete.update('venues', 1, 'The Jazz Hop', 'San Francisco', 'CA')
+        assert names(autocomplete.search('venues', 'jazz', 10)) == ['The Jazz Hop']
+        autocomplete.remove('venues', 1)
+        assert autocomplete.search('venues', 'jazz', 10) == []
+
+
+def test_refresh_picks_up_changes_made_elsewhere(app, monkeypatch):
+    with app.app_context():
+        assert names(autocomplete.search('venues', 'hop', 10)) == ['The Musical Hop']
+        monkeypatch.setattr(autocomplete, 'refresh_seconds', 0)
+
+        # A rename keeps the row count, so only the changed row is read.
+        db.session.get(Venue, 1).name = 'The Jazz Hop'
+        db.session.commit()
+        index = autocomplete.indexes['venues']
+        assert names(autocomplete.search('venues', 'jazz', 10)) == ['The Jazz Hop']
+        assert autocomplete.search('venues', 'musical', 10) == []
+        assert autocomplete.indexes['venues'] is index
+
+        # A delete changes it, so the index is rebuilt.
+        db.session.delete(db.session.get(Venue, 2))
+        db.session.commit()
+        assert autocomplete.search('venues', 'park', 10) == []
+        assert autocomplete.indexes['venues'] is not index
+
+
+def test_refresh_does_not_hold_the_lock_during_queries(app, monkeypatch):
+    locked = []
+
+    def before_cursor_execute(*args):
+        locked.append(autocomplete.lock.locked())
+
+    with app.app_context():
+        autocomplete.search('venues', 'hop', 10)
+        monkeypatch.setattr(autocomplete, 'refresh_seconds', 0)
+        db.session.add(Venue(name='Hopscotch', city='Austin', state='TX', address='1 Main St'))
+        db.session.commit()
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            assert names(autocomplete.search('venues', 'hop', 10)) == ['Hopscotch', 'The Musical Hop']
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    assert locked and not any(locked)
+
+
+def test_lookups_during_a_refresh_use_the_current_index(app, monkeypatch):
+    started, finish = threading.Event(), threading.Event()
+    load = autocomplete.load
+
+    def slow_load():
+        started.set()
+        finish.wait(5)
+        load()
+
+    with app.app_context():
+        autocomplete.search('venues', 'hop', 10)
+    monkeypatch.setattr(autocomplete, 'refresh_seconds', 0)
+    monkeypatch.setattr(autocomplete, 'load', slow_load)
+
+    def refresh():
+        with app.app_context():
+            autocomplete.refresh()
+
+    refreshing = threading.Thread(target=refresh)
+    refreshing.start()
+    try:
+        assert started.wait(5)
+        with app.app_context():
+            assert names(autocomplete.search('venues', 'hop', 10)) == ['The Musical Hop']
+    finally:
+        finish.set()
+        refreshing.join(5)
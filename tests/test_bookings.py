@@ -0,0 +1,126 @@
+import datetime
+import os
+
+import pytest
+from flask_migrate import upgrade
+from sqlalchemy import text
+
+from app import db, init_migrations, Venue, Artist, Show
+from bookings import IntervalIndex, reject_conflicts
+from conftest import ROOT, make_app
+
+DAY = datetime.datetime(2030, 1, 31)
+
+
+def at(hours, day=DAY):
+    return day + datetime.timedelta(hours=hours)
+
+
+def test_interval_index_overlaps():
+    index = IntervalIndex([(at(20), at(22)), (at(10), at(12))])
+    assert index.overlaps(at(21), at(23))
+    assert index.overlaps(at(9), at(13))
+    assert index.overlaps(at(11), at(11.5))
+    # Back to back on either side.
+    assert not index.overlaps(at(22), at(23))
+    assert not index.overlaps(at(12), at(20))
+    assert not index.overlaps(at(8), at(10))
+
+
+def test_interval_index_merges_overlapping_input():
+    index = IntervalIndex([(at(10), at(14)), (at(12), at(13)), (at(13), at(16)), (at(16), at(17))])
+    assert list(zip(index.starts, index.ends)) == [(at(10), at(16)), (at(16), at(17))]
+    assert index.overlaps(at(15), at(15.5))
+
+
+def test_interval_index_gaps():
+    index = IntervalIndex([(at(10), at(12)), (at(13), at(14)), (at(20), at(26))])
+    assert index.gaps(at(9), at(22)) == [(at(9), at(10)), (at(12), at(13)), (at(14), at(20))]
+    assert index.gaps(at(11), at(22), datetime.timedelta(hours=2)) == [(at(14), at(20))]
+    assert index.gaps(at(21), at(25)) == []
+    assert IntervalIndex().gaps(at(0), at(1)) == [(at(0), at(1))]
+
+
+@pytest.fixture
+def app(empty_app):
+    # A venue and two artists; the venue's show runs from 22:00 on January
+    # 31 into February.
+    with empty_app.app_context():
+        db.session.add(Venue(name='The Hall', city='Austin', state='TX', address='1 Main St'))
+        db.session.add_all([Artist(name='The Band', city='Austin', state='TX'),
+                            Artist(name='The Other Band', city='Austin', state='TX')])
+        db.session.add(Show(venue_id=1, artist_id=1, start_time=at(22), end_time=at(26)))
+        db.session.commit()
+    return empty_app
+
+
+def test_reject_conflicts_across_months(app):
+    with app.app_context():
+        accepted, conflicts = reject_conflicts([
+            ('venue overlap in February', 1, 2, at(25), at(27)),
+            ('artist overlap', 2, 1, at(21), at(23)),
+            ('back to back', 1, 2, at(26), at(28)),
+            ('overlaps the previous row', 1, 2, at(27), at(29)),
+        ])
+    assert accepted == ['back to back']
+    assert conflicts == [('venue overlap in February', 'venue'), ('artist overlap', 'artist'),
+                         ('overlaps the previous row', 'venue')]
+
+
+def show_form(start, end, artist_id=2):
+    return {'venue_id': 1, 'artist_id': artist_id, 'start_time': start.isoformat(' '), 'end_time': end.isoformat(' ')}
+
+
+def test_create_show_conflicting_across_months_is_409(app):
+    client = app.test_client()
+    response = client.post('/shows/create', data=show_form(at(25), at(27)))
+    assert response.status_code == 409
+    assert b'The venue is already booked at that time.' in response.data
+    assert client.post('/shows/create', data=show_form(at(26), at(28))).status_code == 200
+
+
+def test_availability(app):
+    client = app.test_client()
+    client.post('/shows/create', data=show_form(at(28), at(29)))
+    response = client.get('/api/v1/venues/1/availability', query_string={
+        'since': at(12).isoformat(), 'until': at(36).isoformat(), 'min_minutes': 150,
+    })
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    slot = lambda start, end: {'start': start.isoformat(), 'end': end.isoformat()}
+    assert data['busy'] == [slot(at(22), at(26)), slot(at(28), at(29))]
+    # The two hours between the shows are shorter than min_minutes.
+    assert data['free'] == [slot(at(12), at(22)), slot(at(29), at(36))]
+
+
+@pytest.mark.parametrize('query', [
+    {'since': 'tomorrow'},
+    {'min_minutes': 'ninety'},
+    {'since': at(12).isoformat(), 'until': at(10).isoformat()},
+    {'since': at(0).isoformat(), 'until': at(24 * 400).isoformat()},
+])
+def test_availability_rejects_bad_ranges(app, query):
+    assert app.test_client().get('/api/v1/venues/1/availability', query_string=query).status_code == 400
+
+
+def test_availability_of_a_missing_venue_is_404(app):
+    assert app.test_client().get('/api/v1/venues/99/availability').status_code == 404
+
+
+def test_end_time_migration_backfills_existing_shows(tmp_path):
+    app = make_app(f'sqlite:///{tmp_path}/fyyur.db')
+    init_migrations(app)
+    directory = os.path.join(ROOT, 'migrations')
+    with app.app_context():
+        upgrade(directory=directory, revision='4c8e2a6d1f93')
+        db.session.execute(text("INSERT INTO venues (id, name, updated_at) VALUES (1, 'The Hall', '2030-01-01')"))
+        db.session.execute(text("INSERT INTO artists (id, name, updated_at) VALUES (1, 'The Band', '2030-01-01')"))
+        db.session.execute(text("INSERT INTO shows (venue_id, artist_id, start_time, updated_at) "
+                                "VALUES (1, 1, '2030-01-31 23:00:00.000000', '2030-01-01')"))
+        db.session.commit()
+        upgrade(directory=directory)
+        show = db.session.get(Show, 1)
+        assert show.end_time == at(25)
+        # The backfilled end time takes part in the overlap checks.
+        assert reject_conflicts([('overlap', 1, 1, at(24.5), at(26))])[1] == [('overlap', 'venue')]
+        assert reject_conflicts([('after', 1, 1, at(25), at(26))])[0] == ['after']
@@ -0,0 +1,228 @@
+import datetime
+
+import pytest
+from sqlalchemy import update
+
+import cache
+from app import db, page_cache, Venue, Artist, Show
+from cache import LRUBackend, NullBackend, RedisBackend
+from conftest import make_app, migrate
+
+VENUE_FORM = {
+    'city': 'Austin', 'state': 'TX', 'address': '1 Main St', 'phone': '512-555-0100',
+    'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/hall',
+}
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis(object):
+    # The redis-py commands RedisBackend uses, with expiry on a fake clock.
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.values = {}
+        self.expires = {}
+
+    def _live(self, key):
+        if key in self.expires and self.expires[key] <= self.clock():
+            self.values.pop(key, None)
+            self.expires.pop(key)
+        return self.values.get(key)
+
+    def get(self, key):
+        return self._live(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        if ex is not None:
+            self.expires[key] = self.clock() + ex
+
+    def sadd(self, key, *members):
+        self.values.setdefault(key, set()).update(members)
+
+    def smembers(self, key):
+        return set(self._live(key) or ())
+
+    def expire(self, key, seconds):
+        self.expires[key] = self.clock() + seconds
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline(object):
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        for name, args, kwargs in self.commands:
+            getattr(self.client, name)(*args, **kwargs)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture(params=['lru', 'redis'])
+def backend(request, clock):
+    if request.param == 'lru':
+        return LRUBackend(max_entries=3)
+    return RedisBackend(FakeRedis(clock))
+
+
+def test_miss_then_hit(backend):
+    assert backend.get('/venues') is None
+    backend.set('/venues', (b'page', 200, 'text/html'), 60, ['venues'])
+    assert backend.get('/venues') == (b'page', 200, 'text/html')
+
+
+def test_entries_expire_after_their_ttl(backend, clock):
+    backend.set('/venues', b'page', 60, ['venues'])
+    clock.now += 59
+    assert backend.get('/venues') == b'page'
+    clock.now += 2
+    assert backend.get('/venues') is None
+
+
+def test_invalidate_removes_only_tagged_pages(backend):
+    backend.set('/venues', b'venues', 60, ['venues'])
+    backend.set('/venues/1', b'venue', 60, ['venue:1', 'shows'])
+    backend.set('/artists', b'artists', 60, ['artists'])
+    backend.invalidate(['venue:1'])
+    assert backend.get('/venues/1') is None
+    assert backend.get('/venues') == b'venues'
+    assert backend.get('/artists') == b'artists'
+
+
+def test_lru_evicts_the_least_recently_used(clock):
+    backend = LRUBackend(max_entries=2)
+    backend.set('a', 1, 60, ['x'])
+    backend.set('b', 2, 60, ['x'])
+    backend.get('a')
+    backend.set('c', 3, 60, ['x'])
+    assert (backend.get('a'), backend.get('b'), backend.get('c')) == (1, None, 3)
+    backend.invalidate(['x'])
+    assert backend.tags == {} and not backend.entries
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(f'sqlite:///{tmp_path}/fyyur.db', PAGE_CACHE_BACKEND='lru')
+    migrate(app)
+    with app.app_context():
+        db.session.add(Venue(name='The Hall', city='Austin', state='TX', address='1 Main St'))
+        db.session.commit()
+    yield app
+    # The page cache is shared by every app in the process.
+    page_cache.backend = NullBackend()
+
+
+def rename_behind_the_cache(app, name):
+    with app.app_context():
+        db.session.execute(update(Venue).values(name=name))
+        db.session.commit()
+
+
+def page(client, path='/venues'):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_pages_are_served_from_the_cache(app):
+    client = app.test_client()
+    assert 'The Hall' in page(client)
+    rename_behind_the_cache(app, 'Renamed Hall')
+    # The directory was cached before the rename, the venue page was not.
+    assert 'The Hall' in page(client)
+    assert 'Renamed Hall' in page(client, '/venues/1')
+
+
+def test_creating_a_venue_invalidates_the_directory(app):
+    client = app.test_client()
+    page(client)
+    client.post('/venues/create', data=dict(VENUE_FORM, name='New Hall'))
+    assert 'New Hall' in page(app.test_client())
+
+
+def test_editing_a_venue_invalidates_its_pages(app):
+    client = app.test_client()
+    page(client)
+    page(client, '/venues/1')
+    assert client.post('/venues/1/edit', data=dict(VENUE_FORM, name='Edited Hall')).status_code == 302
+    assert 'Edited Hall' in page(client)
+    assert 'Edited Hall' in page(client, '/venues/1')
+
+
+def test_deleting_a_venue_invalidates_its_pages(app):
+    client = app.test_client()
+    page(client)
+    assert client.delete('/venues/1').status_code == 302
+    assert 'The Hall' not in page(client)
+    assert client.get('/venues/1').status_code == 404
+
+
+def test_pages_with_flashed_messages_are_not_cached(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_flashes'] = [('message', 'Welcome back')]
+    assert 'Welcome back' in page(client)
+    assert 'Welcome back' not in page(app.test_client())
+
+
+@pytest.mark.parametrize('method,path', [
+    ('POST', '/venues/99/edit'),
+    ('DELETE', '/venues/99'),
+    ('POST', '/artists/99/edit'),
+])
+def test_writes_to_missing_rows_are_404(app, method, path):
+    assert app.test_client().open(path, method=method, data=VENUE_FORM).status_code == 404
+
+
+def test_cacheable_responses_do_not_vary_on_cookies(app):
+    client = app.test_client()
+    response = client.get('/venues')
+    assert 'Cookie' not in response.vary
+    assert response.cache_control.public
+    revalidated = client.get('/venues', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert 'Cookie' not in revalidated.vary
+
+
+@pytest.mark.parametrize('path', ['/shows', '/venues/1', '/artists/1'])
+def test_time_dependent_pages_change_etag_when_a_show_starts(app, path):
+    with app.app_context():
+        db.session.add(Artist(name='The Band', city='Austin', state='TX'))
+        db.session.add(Show(venue_id=1, artist_id=1, start_time=datetime.datetime.now() + datetime.timedelta(hours=1)))
+        db.session.commit()
+    client = app.test_client()
+    response = client.get(path)
+    assert 'Last-Modified' not in response.headers
+
+    # The clock passing the start time, which leaves every updated_at as is.
+    with app.app_context():
+        db.session.execute(update(Show).values(
+            start_time=datetime.datetime.now() - datetime.timedelta(minutes=1), updated_at=Show.updated_at))
+        db.session.commit()
+    assert client.get(path, headers={'If-None-Match': response.headers['ETag']}).status_code == 200
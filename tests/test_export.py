@@ -0,0 +1,69 @@
+import csv
+import gzip
+import io
+import json
+
+import exporter
+from app import db, Venue, all_shows
+
+
+def export(client, path, **query):
+    response = client.get(path, query_string=query)
+    assert response.status_code == 200
+    return response
+
+
+def test_csv_export_has_every_venue(client, app):
+    response = export(client, '/export/venues.csv')
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=venues.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    with app.app_context():
+        venue = db.session.get(Venue, 1)
+        assert len(rows) == db.session.query(Venue).count()
+        assert rows[0]['name'] == venue.name
+        assert set(rows[0]['genres'].split(';')) == {genre.name for genre in venue.genres}
+
+
+def test_jsonl_export_of_shows_in_order(client, app):
+    lines = export(client, '/export/shows.jsonl').get_data(as_text=True).splitlines()
+    shows = [json.loads(line) for line in lines]
+    with app.app_context():
+        assert len(shows) == db.session.query(all_shows()).count()
+    assert set(shows[0]) == {'id', 'start_time', 'end_time', 'venue_id', 'venue_name', 'city', 'state',
+                             'artist_id', 'artist_name'}
+    assert [show['start_time'] for show in shows] == sorted(show['start_time'] for show in shows)
+
+
+def test_filtered_export(client):
+    shows = [json.loads(line) for line in export(client, '/export/shows.jsonl').get_data(as_text=True).splitlines()]
+    city = shows[0]['city']
+    since, until = shows[10]['start_time'], shows[20]['start_time']
+
+    in_city = export(client, '/export/shows.jsonl', city=city).get_data(as_text=True).splitlines()
+    assert len(in_city) == sum(show['city'] == city for show in shows)
+    assert all(json.loads(line)['city'] == city for line in in_city)
+
+    between = export(client, '/export/shows.jsonl', since=since, until=until).get_data(as_text=True).splitlines()
+    assert len(between) == sum(since <= show['start_time'] < until for show in shows)
+
+
+def test_gzipped_export(client):
+    plain = export(client, '/export/artists.csv').get_data()
+    response = export(client, '/export/artists.csv', gzip=1)
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=artists.csv.gz'
+    assert gzip.decompress(response.get_data()) == plain
+
+
+def test_bad_export_requests(client):
+    assert client.get('/export/venues.xml').status_code == 404
+    assert client.get('/export/genres.csv').status_code == 404
+    assert client.get('/export/shows.csv?since=last+week').status_code == 400
+
+
+def test_serialize_chunks(monkeypatch):
+    monkeypatch.setattr(exporter, 'BATCH_SIZE', 2)
+    rows = iter([['id', 'name'], (1, 'a'), (2, 'b'), (3, 'c')])
+    chunks = list(exporter.serialize(rows, 'csv'))
+    assert chunks == ['id,name\r\n1,a\r\n2,b\r\n', '3,c\r\n']
@@ -0,0 +1,110 @@
+import math
+
+import pytest
+
+from app import db, Venue
+from geo import (EARTH_RADIUS_KM, GEOHASH_PRECISION, cell_size, covering_prefixes, encode_geohash,
+                 haversine_km, near_arguments, venues_near)
+
+
+def destination(latitude, longitude, km, bearing):
+    # The point km away from (latitude, longitude) in the direction bearing
+    # (degrees clockwise from north).
+    phi, lam, theta = math.radians(latitude), math.radians(longitude), math.radians(bearing)
+    delta = km / EARTH_RADIUS_KM
+    other_phi = math.asin(math.sin(phi) * math.cos(delta) + math.cos(phi) * math.sin(delta) * math.cos(theta))
+    other_lam = lam + math.atan2(math.sin(theta) * math.sin(delta) * math.cos(phi),
+                                 math.cos(delta) - math.sin(phi) * math.sin(other_phi))
+    return math.degrees(other_phi), (math.degrees(other_lam) + 540) % 360 - 180
+
+
+def test_encode_geohash():
+    assert encode_geohash(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+    assert encode_geohash(0, 0, 1) == 's'
+    assert encode_geohash(-0.000001, -0.000001, 1) == '7'
+    assert len(encode_geohash(40.7128, -74.0060)) == GEOHASH_PRECISION
+
+
+# Points on the edges and corners of cells, where the circle spills into the
+# neighbouring ones: the equator and prime meridian, the edge of a precision
+# 5 cell, the antimeridian and near a pole.
+EDGE_HEIGHT, EDGE_WIDTH = cell_size(5)
+
+
+@pytest.mark.parametrize('latitude, longitude', [
+    (0.0, 0.0),
+    (40.0 + 3 * EDGE_HEIGHT, -74.0 + 7 * EDGE_WIDTH),
+    (12.5, 179.999),
+    (-33.9, -179.9995),
+    (89.99, 20.0),
+])
+@pytest.mark.parametrize('radius_km', [0.05, 2.0, 25.0, 500.0])
+def test_covering_prefixes_cover_the_circle(latitude, longitude, radius_km):
+    prefixes = covering_prefixes(latitude, longitude, radius_km)
+    assert 1 <= len(prefixes) <= 9
+    for bearing in range(0, 360, 5):
+        for fraction in (0.25, 0.5, 0.999):
+            point = destination(latitude, longitude, radius_km * fraction, bearing)
+            assert haversine_km(latitude, longitude, *point) <= radius_km
+            geohash = encode_geohash(*point)
+            assert any(geohash.startswith(prefix) for prefix in prefixes), (point, prefixes)
+
+
+def test_near_arguments(app):
+    with app.app_context():
+        config = app.config
+        assert near_arguments({'lat': '40.7', 'lng': '-74'}) == \
+            (40.7, -74.0, config['VENUES_NEAR_DEFAULT_RADIUS_KM'], config['VENUES_NEAR_LIMIT'])
+        assert near_arguments({'lat': '-90', 'lng': '180', 'radius': '0.5', 'limit': '5'}) == (-90.0, 180.0, 0.5, 5)
+        assert near_arguments({'lat': '0', 'lng': '0', 'limit': '0'})[3] == 1
+        assert near_arguments({'lat': '0', 'lng': '0', 'limit': '100000'})[3] == config['MAX_PAGE_SIZE']
+
+
+@pytest.mark.parametrize('args', [
+    {'lat': '40.7'},
+    {'lng': '-74'},
+    {'lat': 'north', 'lng': '-74'},
+    {'lat': '40.7', 'lng': '-74', 'radius': 'far'},
+    {'lat': '40.7', 'lng': '-74', 'limit': 'all'},
+    {'lat': '90.1', 'lng': '0'},
+    {'lat': '0', 'lng': '-180.5'},
+    {'lat': 'nan', 'lng': '0'},
+    {'lat': '0', 'lng': 'inf'},
+    {'lat': '0', 'lng': '0', 'radius': '0'},
+    {'lat': '0', 'lng': '0', 'radius': '-3'},
+    {'lat': '0', 'lng': '0', 'radius': '501'},
+    {'lat': '0', 'lng': '0', 'radius': 'nan'},
+])
+def test_near_arguments_rejects(app, args):
+    with app.app_context():
+        with pytest.raises(ValueError):
+            near_arguments(args)
+    assert app.test_client().get('/venues/near', query_string=args).status_code == 400
+
+
+def test_venues_near_across_cell_edges(empty_app):
+    # Venues a few hundred metres apart in four different top level cells,
+    # one 10 km out (beyond the first search) and one out of range.
+    places = {
+        'north east': (0.002, 0.002),
+        'south west': (-0.001, -0.001),
+        'north west': (0.003, -0.001),
+        'south east': (-0.002, 0.003),
+        'ten km east': destination(0, 0, 10, 90),
+        'far away': (1.0, 1.0),
+    }
+    with empty_app.app_context():
+        db.session.add_all(
+            Venue(name=name, city='Null Island', state='NI', address='0 Main St',
+                  latitude=latitude, longitude=longitude, geohash=encode_geohash(latitude, longitude))
+            for name, (latitude, longitude) in places.items()
+        )
+        db.session.commit()
+        assert len({geohash[0] for geohash, in db.session.query(Venue.geohash).limit(4)}) == 4
+
+        assert [venue['name'] for venue in venues_near(0.0, 0.0, 25, 10)] == \
+            ['south west', 'north east', 'north west', 'south east', 'ten km east']
+        assert [venue['name'] for venue in venues_near(0.0, 0.0, 25, 2)] == ['south west', 'north east']
+        assert [venue['name'] for venue in venues_near(0.0, 0.0, 0.1, 10)] == []
+        nearest = venues_near(0.0, 0.0, 25, 5)[-1]
+        assert nearest['name'] == 'ten km east' and nearest['distance_km'] == pytest.approx(10, abs=0.001)
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import importer
+from app import db, Venue, ImportCheckpoint
+
+VENUE = {'city': 'Austin', 'state': 'TX', 'address': '1 Main St', 'phone': '512-555-0100',
+         'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/hall'}
+
+
+def write_jsonl(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines))
+    return path
+
+
+def venue(name):
+    return json.dumps(dict(VENUE, name=name))
+
+
+def test_malformed_lines_are_rejected_not_fatal(empty_app, tmp_path):
+    source = write_jsonl(tmp_path / 'venues.jsonl', [
+        venue('First Hall'), '{"name": ', '[1, 2]', venue('Second Hall'),
+    ])
+    errors_path = tmp_path / 'errors.jsonl'
+    with empty_app.app_context():
+        totals = importer.import_file('venues', str(source), 'jsonl', 2, 'venues', str(errors_path))
+        names = sorted(name for name, in db.session.query(Venue.name))
+        checkpoint = db.session.get(ImportCheckpoint, 'venues').line
+
+    assert totals == {'read': 4, 'imported': 2, 'rejected': 2}
+    assert names == ['First Hall', 'Second Hall']
+    assert checkpoint == 4
+    errors = [json.loads(line) for line in errors_path.read_text().splitlines()]
+    assert [error['line'] for error in errors] == [2, 3]
+    assert all(error['errors']['json'] for error in errors)
+
+
+def test_a_failed_chunk_resumes_after_the_last_commit(empty_app, tmp_path, monkeypatch):
+    source = write_jsonl(tmp_path / 'venues.jsonl', [venue(f'Hall {number}') for number in range(1, 6)])
+    errors_path = str(tmp_path / 'errors.jsonl')
+    write_chunk = importer.write_chunk
+    calls = []
+
+    def failing_write_chunk(kind, rows):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise RuntimeError('connection lost')
+        write_chunk(kind, rows)
+
+    monkeypatch.setattr(importer, 'write_chunk', failing_write_chunk)
+    with empty_app.app_context():
+        with pytest.raises(RuntimeError):
+            importer.import_file('venues', str(source), 'jsonl', 2, 'venues', errors_path)
+        assert db.session.get(ImportCheckpoint, 'venues').line == 2
+        db.session.close()
+
+        monkeypatch.setattr(importer, 'write_chunk', write_chunk)
+        totals = importer.import_file('venues', str(source), 'jsonl', 2, 'venues', errors_path)
+        names = [name for name, in db.session.query(Venue.name).order_by(Venue.id)]
+
+    assert totals['imported'] == 3
+    assert names == [f'Hall {number}' for number in range(1, 6)]
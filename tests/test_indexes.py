@@ -0,0 +1,57 @@
+import re
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+
+# Each page and an index its queries are expected to use (the artist
+# directory pages through the primary key).
+PAGES = [
+    ('/venues', 'ix_venues_state_city'),
+    ('/artists', None),
+    ('/shows', 'ix_shows_start_time'),
+    ('/shows/past', 'ix_shows_archive_start_time'),
+    ('/venues/1', 'ix_shows_venue_id_start_time'),
+    ('/artists/1', 'ix_shows_artist_id_start_time'),
+    ('/venues/1/past-shows', 'ix_shows_archive_venue_id_start_time'),
+    ('/artists/1/past-shows', 'ix_shows_archive_artist_id_start_time'),
+]
+# A plan step reading one of these tables without an index.
+FULL_SCAN = re.compile(r'^SCAN (shows|shows_archive|venue_genres|artist_genres)\b(?!.*\bINDEX\b)')
+
+
+def statements(app, path):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        response = app.test_client().get(path)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    assert response.status_code == 200
+    return [(statement, parameters) for statement, parameters in captured
+            if statement.lstrip().upper().startswith('SELECT')]
+
+
+def query_plan(app, statement, parameters):
+    with app.app_context():
+        rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+        db.session.close()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize('path,index', PAGES)
+def test_pages_read_through_indexes(app, path, index):
+    selects = statements(app, path)
+    assert selects
+
+    steps = [step for statement, parameters in selects for step in query_plan(app, statement, parameters)]
+    assert not [step for step in steps if FULL_SCAN.match(step)]
+    if index:
+        assert any(f'INDEX {index}' in step for step in steps)
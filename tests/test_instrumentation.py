@@ -0,0 +1,22 @@
+import pytest
+from flask import g
+from sqlalchemy import exc, text
+
+from app import db
+
+
+def test_failed_queries_do_not_leak_start_times(app):
+    with app.test_request_context():
+        app.preprocess_request()
+        connection = db.session.connection()
+        for _ in range(3):
+            with pytest.raises(exc.OperationalError):
+                db.session.execute(text('SELECT * FROM no_such_table'))
+            db.session.rollback()
+            connection = db.session.connection()
+            assert connection.info['query_start_time'] == []
+
+        db.session.execute(text('SELECT 1'))
+        assert connection.info['query_start_time'] == []
+        assert g.sql_stats['count'] == 1
+        db.session.close()
@@ -0,0 +1,49 @@
+import json
+import logging
+
+from app import request_logging
+from conftest import make_app
+from logs import JSONFormatter, SamplingFilter
+
+
+def record(level=logging.INFO, **extra):
+    record = logging.LogRecord('app', level, __file__, 1, 'Hello %s', ('world',), None)
+    vars(record).update(extra)
+    return record
+
+
+def test_json_formatter():
+    entry = json.loads(JSONFormatter().format(record(status=200, path='/venues')))
+    assert entry['level'] == 'INFO' and entry['logger'] == 'app'
+    assert entry['message'] == 'Hello world'
+    assert entry['status'] == 200 and entry['path'] == '/venues'
+    assert 'args' not in entry and 'msg' not in entry
+
+
+def test_sampling_keeps_warnings(monkeypatch):
+    monkeypatch.setattr('random.random', lambda: 0.5)
+    assert SamplingFilter(0.25).filter(record(logging.WARNING))
+    assert not SamplingFilter(0.25).filter(record(logging.INFO))
+    assert SamplingFilter(0.75).filter(record(logging.INFO))
+    assert SamplingFilter(1).filter(record(logging.DEBUG))
+
+
+def test_requests_are_logged_as_json(tmp_path, monkeypatch):
+    log_file = tmp_path / 'fyyur.log'
+    app = make_app(f'sqlite:///{tmp_path}/fyyur.db', LOG_REQUESTS=True, LOG_FILE=str(log_file))
+    # Migrations run earlier in the session go through alembic's fileConfig,
+    # which disables the loggers that already exist.
+    monkeypatch.setattr(app.logger, 'disabled', False)
+    client = app.test_client()
+    response = client.get('/', headers={'X-Request-ID': 'abc123'})
+    assert response.headers['X-Request-ID'] == 'abc123'
+    generated = client.get('/missing').headers['X-Request-ID']
+    # Flushes the queue.
+    request_logging.stop()
+
+    entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+    home, missing = [entry for entry in entries if entry.get('event') == 'request']
+    assert home['request_id'] == 'abc123' and home['route'] == '/' and home['status'] == 200
+    assert home['method'] == 'GET' and home['latency_ms'] >= 0
+    assert 'queries' in home and 'db_ms' in home
+    assert missing['request_id'] == generated and missing['route'] is None and missing['status'] == 404
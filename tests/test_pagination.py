@@ -0,0 +1,43 @@
+import re
+
+import pytest
+
+from app import encode_cursor
+
+
+def page_of(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    return re.findall(r'href="/venues/(\d+)"', html), re.search(r'after=([\w-]+)', html)
+
+
+def test_cursors_walk_the_venue_directory(client):
+    seen, path = [], '/venues?limit=5'
+    while path:
+        ids, after = page_of(client, path)
+        seen.extend(ids)
+        path = f'/venues?limit=5&after={after.group(1)}' if after else None
+    first, _ = page_of(client, '/venues?limit=200')
+    assert seen == first
+
+
+@pytest.mark.parametrize('values', [
+    [[1], 2, 3, 4],
+    {'state': 'TX'},
+    'TX',
+    ['TX', 'Austin', 'Hall', 'one'],
+    ['TX', 'Austin', 'Hall', 1.5],
+    ['TX', 'Austin', 'Hall', True],
+    ['TX', 'Austin', 'Hall'],
+])
+def test_tampered_cursors_restart_at_the_first_page(client, values):
+    first, _ = page_of(client, '/venues?limit=5')
+    for direction in ('after', 'before'):
+        ids, _ = page_of(client, f'/venues?limit=5&{direction}={encode_cursor(values)}')
+        assert ids == first
+
+
+def test_tampered_show_cursor(client):
+    response = client.get('/shows?after=' + encode_cursor(['next week', 1]))
+    assert response.status_code == 200
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import exc
+
+from conftest import make_app
+from pooling import TimedQueuePool, engine_options
+
+
+def test_engine_options():
+    assert engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///fyyur.db'}) == {}
+    config = {
+        'SQLALCHEMY_DATABASE_URI': 'postgresql+psycopg://fyyur@db/fyyur', 'DB_POOL_PRE_PING': True,
+        'DB_PGBOUNCER': False, 'DB_POOL_SIZE': 5, 'DB_MAX_OVERFLOW': 10, 'DB_POOL_TIMEOUT': 10,
+        'DB_POOL_RECYCLE': 1800, 'DB_STATEMENT_TIMEOUT_MS': 5000,
+    }
+    options = engine_options(config)
+    assert options['poolclass'] is TimedQueuePool and options['pool_size'] == 5
+    assert options['connect_args'] == {'options': '-c statement_timeout=5000'}
+    pgbouncer = engine_options(dict(config, DB_PGBOUNCER=True))
+    assert pgbouncer['poolclass'].__name__ == 'NullPool'
+    assert pgbouncer['connect_args'] == {'prepare_threshold': None}
+
+
+def test_checkout_timeouts_are_counted():
+    pool = TimedQueuePool(lambda: sqlite3.connect(':memory:'), pool_size=1, max_overflow=0, timeout=0.05)
+    connection = pool.connect()
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    connection.close()
+    pool.connect().close()
+    assert pool.waits['count'] == 3
+    assert pool.waits['timeouts'] == 1
+    assert pool.waits['max_ms'] >= 50
+
+
+def test_connection_errors_are_not_timeouts():
+    def refuse():
+        raise sqlite3.OperationalError('connection refused')
+
+    pool = TimedQueuePool(refuse, pool_size=1, max_overflow=0, timeout=0.05)
+    with pytest.raises(sqlite3.OperationalError):
+        pool.connect()
+    assert pool.waits['count'] == 1
+    assert pool.waits['timeouts'] == 0
+
+
+def test_pool_metrics_are_off_by_default(tmp_path):
+    app = make_app(f'sqlite:///{tmp_path}/fyyur.db')
+    assert app.test_client().get('/metrics/db-pool').status_code == 404
+
+
+def test_pool_metrics_need_the_token(tmp_path):
+    app = make_app(f'sqlite:///{tmp_path}/fyyur.db', DB_POOL_METRICS_URL='/metrics/db-pool',
+                   DB_POOL_METRICS_TOKEN='s3cret')
+    client = app.test_client()
+    assert client.get('/metrics/db-pool').status_code == 401
+    assert client.get('/metrics/db-pool', headers={'Authorization': 'Bearer guess'}).status_code == 401
+    response = client.get('/metrics/db-pool', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert 'pool' in response.get_json()
@@ -0,0 +1,39 @@
+import re
+
+from benchmark import queries_of
+
+# Catalog sizes (in shows) to compare; the seeder adds a venue per 50 shows
+# and an artist per 20.
+SIZES = (1000, 5000)
+
+
+def listing(seeded, path, shows):
+    response = seeded(shows).test_client().get(path)
+    assert response.status_code == 200
+    return queries_of(response.headers), response.get_data(as_text=True)
+
+
+def test_venue_directory_query_count_is_constant(seeded):
+    counts, listed = [], []
+    for shows in SIZES:
+        queries, html = listing(seeded, '/venues?limit=200', shows)
+        counts.append(queries)
+        listed.append(len(set(re.findall(r'href="/venues/(\d+)"', html))))
+
+    assert listed[0] < listed[1]
+    assert counts[0] == counts[1]
+    assert counts[0] <= 3
+
+
+def test_show_listing_query_count_is_constant(seeded):
+    # Neither more shows in the catalog nor more on the page add queries.
+    counts, listed = [], []
+    for shows in SIZES:
+        for limit in (10, 200):
+            queries, html = listing(seeded, f'/shows?limit={limit}', shows)
+            counts.append(queries)
+            listed.append(html.count('tile-show'))
+
+    assert listed[0] == 10 and listed[-1] > 10
+    assert len(set(counts)) == 1
+    assert counts[0] <= 5
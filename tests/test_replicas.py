@@ -0,0 +1,61 @@
+from app import db, Venue
+from conftest import make_app, migrate
+
+VENUE_FORM = {
+    'name': 'Edited Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+    'phone': '512-555-0100', 'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/hall',
+}
+
+
+def catalog(path, name):
+    # A migrated database holding one venue, named after the database so a
+    # page shows which one it was read from.
+    app = make_app(f'sqlite:///{path}')
+    migrate(app)
+    with app.app_context():
+        db.session.add(Venue(name=name, city='Austin', state='TX', address='1 Main St', phone='512-555-0100'))
+        db.session.commit()
+    return f'sqlite:///{path}'
+
+
+def replicated_app(tmp_path, replica_uri=None, **config):
+    primary = catalog(tmp_path / 'primary.db', 'Primary Hall')
+    replica = replica_uri or catalog(tmp_path / 'replica.db', 'Replica Hall')
+    return make_app(primary, REPLICA_DATABASE_URIS=[replica], **config)
+
+
+def venue_name(client):
+    html = client.get('/venues/1').get_data(as_text=True)
+    return [name for name in ('Primary Hall', 'Replica Hall', 'Edited Hall') if name in html]
+
+
+def test_reads_go_to_the_replica(tmp_path):
+    app = replicated_app(tmp_path)
+    assert venue_name(app.test_client()) == ['Replica Hall']
+
+
+def test_writes_go_to_the_primary_and_later_reads_stick_to_it(tmp_path):
+    app = replicated_app(tmp_path)
+    client = app.test_client()
+
+    response = client.post('/venues/1/edit', data=VENUE_FORM)
+    assert response.status_code == 302
+    # The redirected page reads the primary and shows the change.
+    assert venue_name(client) == ['Edited Hall']
+    # Other visitors still read the (not yet replicated) replica.
+    assert venue_name(app.test_client()) == ['Replica Hall']
+    with app.app_context():
+        assert db.session.get(Venue, 1).name == 'Edited Hall'
+
+
+def test_reads_leave_the_primary_after_the_sticky_window(tmp_path):
+    app = replicated_app(tmp_path, REPLICA_STICKY_SECONDS=0)
+    client = app.test_client()
+
+    assert client.post('/venues/1/edit', data=VENUE_FORM).status_code == 302
+    assert venue_name(client) == ['Replica Hall']
+
+
+def test_reads_fall_back_to_the_primary_when_the_replica_is_down(tmp_path):
+    app = replicated_app(tmp_path, replica_uri=f'sqlite:///{tmp_path}/missing/replica.db')
+    assert venue_name(app.test_client()) == ['Primary Hall']
@@ -0,0 +1,28 @@
+import pytest
+
+from app import db
+
+
+@pytest.mark.parametrize('kind', ['venues', 'artists'])
+def test_search(client, kind):
+    response = client.post(f'/{kind}/search', data={'search_term': 'a'})
+    assert response.status_code == 200
+    assert b'Number of search results' in response.data
+
+
+@pytest.mark.parametrize('kind', ['venues', 'artists'])
+def test_failed_search_is_a_server_error(app, client, kind, monkeypatch):
+    def search_catalog(*args):
+        raise RuntimeError('database went away')
+
+    monkeypatch.setattr(f'views.{kind}.search_catalog', search_catalog)
+    monkeypatch.setattr(app.logger, 'disabled', True)
+    assert client.post(f'/{kind}/search', data={'search_term': 'a'}).status_code == 500
+
+
+def test_artist_listing_closes_the_session(client, monkeypatch):
+    closed = []
+    close = db.session.close
+    monkeypatch.setattr(db.session, 'close', lambda: closed.append(True) or close())
+    assert client.get('/artists').status_code == 200
+    assert closed
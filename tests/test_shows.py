@@ -0,0 +1,51 @@
+import datetime
+
+import pytest
+
+from app import db, Venue, Artist, Show
+
+
+@pytest.fixture
+def client(empty_app):
+    with empty_app.app_context():
+        db.session.add(Venue(name='The Hall', city='Austin', state='TX', address='1 Main St'))
+        db.session.add(Artist(name='The Band', city='Austin', state='TX'))
+        db.session.commit()
+    return empty_app.test_client()
+
+
+def show_form(venue_id=1, artist_id=1, days=7):
+    start_time = datetime.datetime.now().replace(minute=0, second=0, microsecond=0) + datetime.timedelta(days=days)
+    return {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time.isoformat(' ')}
+
+
+def shows_in(app):
+    with app.app_context():
+        return db.session.query(Show).count()
+
+
+def test_create_show(empty_app, client):
+    response = client.post('/shows/create', data=show_form())
+    assert response.status_code == 200
+    assert b'Show was successfully listed!' in response.data
+    assert shows_in(empty_app) == 1
+
+
+@pytest.mark.parametrize('form,status', [
+    (show_form(venue_id=99), 404),
+    (show_form(artist_id=99), 404),
+    (show_form(venue_id='one'), 400),
+    (dict(show_form(), start_time='tomorrow'), 400),
+])
+def test_create_show_refuses_unknown_or_malformed_ids(empty_app, client, form, status):
+    response = client.post('/shows/create', data=form)
+    assert response.status_code == status
+    assert b'successfully listed' not in response.data
+    assert shows_in(empty_app) == 0
+
+
+def test_create_show_refuses_double_bookings(empty_app, client):
+    assert client.post('/shows/create', data=show_form()).status_code == 200
+    response = client.post('/shows/create', data=show_form())
+    assert response.status_code == 409
+    assert shows_in(empty_app) == 1
@@ -0,0 +1,370 @@
+import json
+import datetime
+from functools import lru_cache
+
+from flask import Blueprint, Response, current_app, request, abort
+from sqlalchemy import select, func
+
+from app import (
+    db, autocomplete, Venue, Artist, Show, Genre, venue_genres, artist_genres, keyset_page, with_genre,
+    all_shows, show_history,
+)
+from bookings import availability
+from geo import near_arguments, venues_near
+from partitions import retention_cutoff
+
+
+@lru_cache(maxsize=None)
+def json_encoder():
+    # orjson when installed (several times faster, and datetimes natively), the
+    # standard library otherwise. Imported with the first response rather
+    # than at worker start.
+    try:
+        from orjson import dumps
+    except ImportError:
+        def dumps(payload):
+            return json.dumps(payload, default=lambda value: value.isoformat())
+    return dumps
+
+
+def dumps(payload):
+    return json_encoder()(payload)
+
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Read-only JSON API. Every response is built from column queries (rows, not
+# ORM objects): ?fields= narrows the SELECT list, ?ids= fetches a batch in
+# one query, ?include=shows adds the shows of all the returned venues or
+# artists with one query per direction, and listings page with the same
+# ?after=/?before= cursors as the HTML pages.
+
+
+def venue_resource():
+    return {
+        'model': Venue,
+        'genre_owner': venue_genres.c.venue_id,
+        'shows': ('venue_id', Artist, 'artist_id', 'artist'),
+    }
+
+
+def artist_resource():
+    return {
+        'model': Artist,
+        'genre_owner': artist_genres.c.artist_id,
+        'shows': ('artist_id', Venue, 'venue_id', 'venue'),
+    }
+
+
+# Columns that are bookkeeping rather than catalog data.
+HIDDEN_COLUMNS = {'show_counts_as_of', 'geohash'}
+
+
+def catalog_fields(model):
+    fields = {column.key: getattr(model, column.key)
+              for column in model.__table__.columns if column.key not in HIDDEN_COLUMNS}
+    fields['genres'] = None
+    return fields
+
+
+def show_fields(shows):
+    # `shows` is the shows table, or all_shows() to serve archived shows as well.
+    return {
+        'id': shows.c.id,
+        'start_time': shows.c.start_time,
+        'end_time': shows.c.end_time,
+        'updated_at': shows.c.updated_at,
+        'venue_id': shows.c.venue_id,
+        'venue_name': Venue.name.label('venue_name'),
+        'venue_image_link': Venue.image_link.label('venue_image_link'),
+        'artist_id': shows.c.artist_id,
+        'artist_name': Artist.name.label('artist_name'),
+        'artist_image_link': Artist.image_link.label('artist_image_link'),
+    }
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def requested_fields(available, required):
+    # ?fields=name,city; the key columns are always selected.
+    names = request.args.get('fields')
+    if not names:
+        return list(available)
+    names = [name.strip() for name in names.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        abort(400, f'Unknown fields: {", ".join(unknown)}')
+    return list(dict.fromkeys(required + names))
+
+
+def requested_ids():
+    # ?ids=1,2,3, at most MAX_PAGE_SIZE of them.
+    try:
+        ids = [int(id) for id in request.args['ids'].split(',') if id.strip()]
+    except ValueError:
+        abort(400, 'ids must be a comma-separated list of integers')
+    if len(ids) > current_app.config['MAX_PAGE_SIZE']:
+        abort(400, f'At most {current_app.config["MAX_PAGE_SIZE"]} ids per request')
+    return ids
+
+
+def requested_includes(allowed):
+    names = {name.strip() for name in request.args.get('include', '').split(',') if name.strip()}
+    if names - allowed:
+        abort(400, f'Unknown include: {", ".join(sorted(names - allowed))}')
+    return names
+
+
+def genres_of(genre_owner, ids):
+    rows = db.session.execute(
+        select(genre_owner, Genre.name)
+        .join(Genre, Genre.id == genre_owner.table.c.genre_id)
+        .where(genre_owner.in_(ids))
+        .order_by(Genre.name)
+    )
+    genres = {id: [] for id in ids}
+    for owner_id, name in rows:
+        genres[owner_id].append(name)
+    return genres
+
+
+def shows_of(ids, owner_key, other, other_key, prefix):
+    # Past and upcoming shows of every owner in `ids`, each list limited to
+    # DETAIL_SHOWS_LIMIT per owner by a window function, like the detail pages.
+    # Past shows include the archived ones.
+    now = datetime.datetime.now()
+    limit = current_app.config['DETAIL_SHOWS_LIMIT']
+    shows = {id: {'past_shows': [], 'upcoming_shows': []} for id in ids}
+    upcoming = Show.__table__
+    history = show_history(owner_key, ids)
+    for key, source, criteria, order in (
+        ('upcoming_shows', upcoming, (upcoming.c[owner_key].in_(ids), upcoming.c.start_time > now),
+         (upcoming.c.start_time, upcoming.c.id)),
+        ('past_shows', history, (), (history.c.start_time.desc(), history.c.id.desc())),
+    ):
+        owner_column = source.c[owner_key]
+        ranked = select(
+            owner_column.label('owner_id'),
+            source.c.id.label('id'),
+            other.id.label(f'{prefix}_id'),
+            other.name.label(f'{prefix}_name'),
+            other.image_link.label(f'{prefix}_image_link'),
+            source.c.start_time,
+            source.c.end_time,
+            func.row_number().over(partition_by=owner_column, order_by=order).label('rank'),
+        ).join(other, other.id == source.c[other_key]) \
+            .where(*criteria) \
+            .subquery()
+        columns = [column for column in ranked.c if column.key not in ('owner_id', 'rank')]
+        rows = db.session.execute(
+            select(ranked.c.owner_id, *columns)
+            .where(ranked.c.rank <= limit)
+            .order_by(ranked.c.owner_id, ranked.c.rank)
+        )
+        for row in rows:
+            fields = row._asdict()
+            shows[fields.pop('owner_id')][key].append(fields)
+    return shows
+
+
+def catalog_rows(resource, fields, includes, rows):
+    # Turns the selected rows into dicts and fills in the genres and shows,
+    # each with one query for the whole batch.
+    items = [row._asdict() for row in rows]
+    ids = [item['id'] for item in items]
+    if ids and 'genres' in fields:
+        genres = genres_of(resource['genre_owner'], ids)
+        for item in items:
+            item['genres'] = genres[item['id']]
+    if ids and 'shows' in includes:
+        shows = shows_of(ids, *resource['shows'])
+        for item in items:
+            item.update(shows[item['id']])
+    return items
+
+
+def list_catalog(resource):
+    model = resource['model']
+    available = catalog_fields(model)
+    fields = requested_fields(available, ['id'])
+    includes = requested_includes({'shows'})
+    query = db.session.query(*(available[name] for name in fields if name != 'genres'))
+
+    if 'ids' in request.args:
+        rows = query.filter(model.id.in_(requested_ids())).order_by(model.id).all()
+        return json_response({'data': catalog_rows(resource, fields, includes, rows)})
+
+    query = with_genre(query, model, resource['genre_owner'], request.args.get('genre'))
+    rows, pager = keyset_page(query, [model.id])
+    return json_response({'data': catalog_rows(resource, fields, includes, rows), **pager})
+
+
+def get_catalog(resource, id):
+    model = resource['model']
+    available = catalog_fields(model)
+    fields = requested_fields(available, ['id'])
+    includes = requested_includes({'shows'})
+    row = db.session.query(*(available[name] for name in fields if name != 'genres')) \
+        .filter(model.id == id).one_or_none()
+    if row is None:
+        abort(404, f'{model.__name__} {id} not found')
+    return json_response({'data': catalog_rows(resource, fields, includes, [row])[0]})
+
+
+def requested_range():
+    # ?since= and ?until= as ISO datetimes, defaulting to the next week and
+    # spanning at most AVAILABILITY_MAX_DAYS; ?min_minutes= drops shorter gaps.
+    try:
+        since = request.args.get('since')
+        since = datetime.datetime.fromisoformat(since) if since else datetime.datetime.now().replace(microsecond=0)
+        until = request.args.get('until')
+        until = datetime.datetime.fromisoformat(until) if until else since + datetime.timedelta(days=7)
+        min_length = datetime.timedelta(minutes=int(request.args.get('min_minutes', 0)))
+    except ValueError:
+        abort(400, 'since and until must be ISO datetimes and min_minutes an integer')
+    if until <= since:
+        abort(400, 'until must be after since')
+    if until - since > datetime.timedelta(days=current_app.config['AVAILABILITY_MAX_DAYS']):
+        abort(400, f'At most {current_app.config["AVAILABILITY_MAX_DAYS"]} days per request')
+    return since, until, min_length
+
+
+def get_availability(model, owner_column, id):
+    since, until, min_length = requested_range()
+    if db.session.query(model.id).filter(model.id == id).one_or_none() is None:
+        abort(404, f'{model.__name__} {id} not found')
+    slots = availability(owner_column, id, since, until, min_length)
+    return json_response({'data': {
+        'since': since,
+        'until': until,
+        'busy': [{'start': start, 'end': end} for start, end in slots['busy']],
+        'free': [{'start': start, 'end': end} for start, end in slots['free']],
+    }})
+
+
+def complete(kind):
+    # ?q= matches the start of the name or of any later word in it; digits
+    # also match an id. Served from the in-memory index, not the database.
+    limit = min(max(request.args.get('limit', current_app.config['AUTOCOMPLETE_LIMIT'], type=int), 1),
+                current_app.config['MAX_PAGE_SIZE'])
+    return json_response({'data': autocomplete.search(kind, request.args.get('q', ''), limit)})
+
+
+def show_query(shows, fields):
+    available = show_fields(shows)
+    query = db.session.query(*(available[name] for name in fields))
+    # The joins are only made when their columns are asked for.
+    if any(name.startswith('venue_') and name != 'venue_id' for name in fields):
+        query = query.join(Venue, Venue.id == shows.c.venue_id)
+    if any(name.startswith('artist_') and name != 'artist_id' for name in fields):
+        query = query.join(Artist, Artist.id == shows.c.artist_id)
+    return query
+
+
+@bp.route('/venues')
+def venues():
+    return list_catalog(venue_resource())
+
+
+@bp.route('/venues/near')
+def venues_near_point():
+    # ?lat=&lng=, optionally ?radius= (km) and ?limit=; nearest first.
+    try:
+        latitude, longitude, radius_km, limit = near_arguments(request.args)
+    except ValueError as error:
+        abort(400, str(error))
+    return json_response({'data': venues_near(latitude, longitude, radius_km, limit)})
+
+
+@bp.route('/venues/autocomplete')
+def venue_autocomplete():
+    return complete('venues')
+
+
+@bp.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    return get_catalog(venue_resource(), venue_id)
+
+
+@bp.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+    return get_availability(Venue, Show.venue_id, venue_id)
+
+
+@bp.route('/artists')
+def artists():
+    return list_catalog(artist_resource())
+
+
+@bp.route('/artists/autocomplete')
+def artist_autocomplete():
+    return complete('artists')
+
+
+@bp.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    return get_catalog(artist_resource(), artist_id)
+
+
+@bp.route('/artists/<int:artist_id>/availability')
+def artist_availability(artist_id):
+    return get_availability(Artist, Show.artist_id, artist_id)
+
+
+def listed_shows():
+    # The shows a listing reads and the earliest start time: by default the
+    # last API_RECENT_SHOWS_DAYS and everything upcoming, from the shows table
+    # alone. ?since= moves the start, and reads the archive as well when it
+    # lies before the retention cutoff; ?archived=1 lists every show ever.
+    try:
+        since = request.args.get('since')
+        since = datetime.datetime.fromisoformat(since) if since else None
+    except ValueError:
+        abort(400, 'since must be an ISO datetime')
+    if request.args.get('archived') == '1':
+        return all_shows(), since
+    if since is None:
+        since = datetime.datetime.now() - datetime.timedelta(days=current_app.config['API_RECENT_SHOWS_DAYS'])
+    return (all_shows() if since < retention_cutoff() else Show.__table__), since
+
+
+@bp.route('/shows')
+def shows():
+    # Ordered by start time; ?venue_id= / ?artist_id= narrow the listing, and
+    # ?ids= fetches any shows, archived ones included.
+    if 'ids' in request.args:
+        shows = all_shows()
+        fields = requested_fields(show_fields(shows), ['id', 'start_time'])
+        rows = show_query(shows, fields).filter(shows.c.id.in_(requested_ids())) \
+            .order_by(shows.c.start_time, shows.c.id).all()
+        return json_response({'data': [row._asdict() for row in rows]})
+
+    shows, since = listed_shows()
+    fields = requested_fields(show_fields(shows), ['id', 'start_time'])
+    query = show_query(shows, fields)
+    if since is not None:
+        query = query.filter(shows.c.start_time >= since)
+    for name in ('venue_id', 'artist_id'):
+        value = request.args.get(name, type=int)
+        if value is not None:
+            query = query.filter(shows.c[name] == value)
+    rows, pager = keyset_page(query, [shows.c.start_time, shows.c.id])
+    return json_response({'data': [row._asdict() for row in rows], **pager})
+
+
+@bp.route('/shows/<int:show_id>')
+def show(show_id):
+    shows = all_shows()
+    fields = requested_fields(show_fields(shows), ['id'])
+    row = show_query(shows, fields).filter(shows.c.id == show_id).one_or_none()
+    if row is None:
+        abort(404, f'Show {show_id} not found')
+    return json_response({'data': row._asdict()})
+
+
+@bp.errorhandler(400)
+@bp.errorhandler(404)
+def api_error(error):
+    return json_response({'error': error.description}, error.code)
@@ -0,0 +1,201 @@
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+
+from app import (
+    db, page_cache, autocomplete, Venue, Artist, Show, artist_genres, utcnow, genres_named,
+    with_genre, keyset_page, search_catalog, upcoming_shows, past_shows, artists_validator, artist_validator,
+)
+from cache import conditional
+
+bp = Blueprint('artists', __name__)
+
+
+@bp.route('/artists')
+@conditional(artists_validator)
+@page_cache.cached('artists')
+def artists():
+    error = False
+    body = []
+    pager = {}
+    try:
+        query = with_genre(db.session.query(Artist.id, Artist.name), Artist, artist_genres.c.artist_id,
+                           request.args.get('genre'))
+        artists, pager = keyset_page(query, (Artist.id,))
+        for artist in artists:
+            body.append({
+                "id": artist.id,
+                "name": artist.name,
+            })
+    except:
+        db.session.rollback()
+        error = True
+        current_app.logger.exception('Listing artists failed')
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        return render_template('pages/artists.html', artists=body, pager=pager)
+
+
+@bp.route('/artists/search', methods=['POST'])
+def search_artists():
+    error = False
+    body = {}
+    try:
+        page = max(request.form.get('page', 1, type=int), 1)
+        body = search_catalog(Artist, artist_genres.c.artist_id, 'artist_search',
+                              request.form.get('search_term'), page)
+    except:
+        db.session.rollback()
+        error = True
+        current_app.logger.exception('Searching artists failed')
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        return render_template('pages/search_artists.html', results=body, search_term=request.form.get('search_term', ''))
+
+
+@bp.route('/artists/<int:artist_id>')
+@conditional(artist_validator, last_modified=False)
+@page_cache.cached('artist:{artist_id}', 'venues')
+def show_artist(artist_id):
+    artist = db.get_or_404(Artist, artist_id)
+    error = False
+    body = {}
+    try:
+        body['id'] = artist.id
+        body['name'] = artist.name
+        body['genres'] = [genre.name for genre in artist.genres]
+        body['city'] = artist.city
+        body['state'] = artist.state
+        body['phone'] = artist.phone
+        body['seeking_venue'] = artist.seeking_venue
+        body['image_link'] = artist.image_link
+
+        body.update(upcoming_shows(Show.artist_id, artist_id, Venue, Show.venue_id, 'venue'))
+        # The counters include every show ever booked; past shows are only
+        # listed on demand, see artist_past_shows().
+        body['past_shows_count'] = artist.upcoming_shows_count + artist.past_shows_count - body['upcoming_shows_count']
+
+    except:
+        db.session.rollback()
+        error = True
+        current_app.logger.exception('Loading artist %s failed', artist_id)
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        return render_template('pages/show_artist.html', artist=body)
+
+
+@bp.route('/artists/<int:artist_id>/past-shows')
+@page_cache.cached('artist:{artist_id}', 'venues', 'shows')
+def artist_past_shows(artist_id):
+    # Newest first, a page at a time; ?partial=1 renders only the tiles, for
+    # the "Past shows" section of the artist page to append.
+    error = False
+    body = []
+    pager = {}
+    try:
+        body, pager = past_shows('artist_id', artist_id, Venue, 'venue_id', 'venue')
+    except:
+        db.session.rollback()
+        error = True
+        current_app.logger.exception('Loading past shows of artist %s failed', artist_id)
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        return render_template('pages/past_shows.html', shows=body, pager=pager, prefix='venue',
+                               partial=request.args.get('partial', type=int))
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    artist = db.get_or_404(Artist, artist_id)
+    from forms import ArtistForm
+    form = ArtistForm(obj=artist)
+    form.genres.data = [genre.name for genre in artist.genres]
+
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    artist = db.get_or_404(Artist, artist_id)
+    error = False
+
+    try:
+        req = request.form
+        artist.name = req['name']
+        artist.city = req['city']
+        artist.state = req['state']
+        artist.phone = req['phone']
+        artist.facebook_link = req['facebook_link']
+        artist.genres = genres_named(req.getlist('genres'))
+        artist.updated_at = utcnow()
+
+        db.session.commit()
+        autocomplete.update('artists', artist_id, req['name'], req['city'], req['state'])
+    except:
+        db.session.rollback()
+        current_app.logger.exception('Updating artist %s failed', artist_id)
+        error = True
+    finally:
+        db.session.close()
+
+    if error:
+        abort(500)
+    else:
+        page_cache.invalidate('artists', f'artist:{artist_id}')
+        return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    from forms import ArtistForm
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    error = False
+    body = {}
+    try:
+        req = request.form
+        name = req['name']
+        city = req['city']
+        state = req['state']
+        phone = req['phone']
+        genres = req.getlist('genres')
+        facebook_link = req['facebook_link']
+
+        artist = Artist(name=name, city=city, state=state, phone=phone, facebook_link=facebook_link)
+        artist.genres = genres_named(genres)
+        db.session.add(artist)
+        db.session.commit()
+        autocomplete.update('artists', artist.id, name, city, state)
+    except:
+        db.session.rollback()
+        error = False
+        current_app.logger.exception('Creating an artist failed')
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        page_cache.invalidate('artists')
+        flash('Artist ' + request.form['name'] + ' was successfully listed!')
+        return render_template('pages/home.html')
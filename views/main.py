@@ -0,0 +1,45 @@
+
+from flask import Blueprint, Response, render_template, request, abort, stream_with_context
+
+from exporter import export, parse_date, FORMATS as EXPORT_FORMATS
+
+bp = Blueprint('main', __name__)
+
+
+@bp.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+@bp.route('/export/<any(venues, artists, shows):kind>.<format>')
+def export_catalog(kind, format):
+    # Streams the whole table in chunks straight from a server-side cursor;
+    # ?since=&until= (ISO dates) and ?city= narrow it, ?gzip=1 compresses it.
+    if format not in EXPORT_FORMATS:
+        abort(404)
+    try:
+        since = parse_date(request.args.get('since'))
+        until = parse_date(request.args.get('until'))
+    except ValueError:
+        abort(400)
+    gzip = request.args.get('gzip', type=int) == 1
+    chunks = export(kind, format, gzip, since=since, until=until, city=request.args.get('city'))
+    filename = f'{kind}.{format}' + ('.gz' if gzip else '')
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/gzip' if gzip else EXPORT_FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
+
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
@@ -0,0 +1,154 @@
+import datetime
+
+from flask import Blueprint, current_app, render_template, request, flash, abort
+from sqlalchemy.exc import IntegrityError
+
+from app import db, page_cache, Venue, Artist, Show, keyset_page, show_history, shows_validator
+from bookings import BookingError, BookingConflict, show_end, reject_conflicts, conflict_owner
+from cache import conditional
+from counters import count_shows
+from partitions import ensure_partitions
+
+bp = Blueprint('shows', __name__)
+
+
+@bp.route('/shows')
+@conditional(shows_validator, last_modified=False)
+@page_cache.cached('shows', 'venues', 'artists')
+def shows():
+    error = False
+    body = []
+    pager = {}
+    try:
+        query = db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link'),
+        ).join(Venue, Venue.id == Show.venue_id) \
+            .join(Artist, Artist.id == Show.artist_id) \
+            .filter(Show.start_time > datetime.datetime.now())
+        shows, pager = keyset_page(query, (Show.start_time, Show.id))
+        body = [show._asdict() for show in shows]
+    except:
+        db.session.rollback()
+        error = True
+        current_app.logger.exception('Listing shows failed')
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        return render_template('pages/shows.html', shows=body, pager=pager)
+
+
+@bp.route('/shows/past')
+@page_cache.cached('shows', 'venues', 'artists')
+def past_shows():
+    # Newest first, including the archive.
+    error = False
+    body = []
+    pager = {}
+    try:
+        history = show_history()
+        query = db.session.query(
+            history.c.id,
+            history.c.start_time,
+            history.c.venue_id,
+            Venue.name.label('venue_name'),
+            history.c.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link'),
+        ).join(Venue, Venue.id == history.c.venue_id) \
+            .join(Artist, Artist.id == history.c.artist_id)
+        shows, pager = keyset_page(query, (history.c.start_time, history.c.id), descending=True)
+        body = [show._asdict() for show in shows]
+    except:
+        db.session.rollback()
+        error = True
+        current_app.logger.exception('Listing past shows failed')
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        return render_template('pages/shows.html', shows=body, pager=pager, past=True)
+
+
+@bp.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    from forms import ShowForm
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+def refuse_show(message, status):
+    from forms import ShowForm
+    flash(message)
+    return render_template('forms/new_show.html', form=ShowForm(request.form)), status
+
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    req = request.form
+    try:
+        venue_id = int(req['venue_id'])
+        artist_id = int(req['artist_id'])
+        start_time = datetime.datetime.fromisoformat(req['start_time'])
+        end_time = req.get('end_time')
+        end_time = datetime.datetime.fromisoformat(end_time) if end_time else None
+    except (KeyError, ValueError):
+        return refuse_show('Enter the venue and artist ids and the times as YYYY-MM-DD HH:MM.', 400)
+    if db.session.get(Venue, venue_id) is None:
+        return refuse_show(f'There is no venue with id {venue_id}.', 404)
+    if db.session.get(Artist, artist_id) is None:
+        return refuse_show(f'There is no artist with id {artist_id}.', 404)
+
+    error = False
+    refused = None
+    status = 400
+    try:
+        end_time = show_end(start_time, end_time)
+        ensure_partitions([start_time])
+        # PostgreSQL's exclusion constraints only see the month partition of
+        # the show, so overlaps across months are checked here on every
+        # database; the constraints still catch concurrent double bookings.
+        _, conflicts = reject_conflicts([(None, venue_id, artist_id, start_time, end_time)])
+        if conflicts:
+            raise BookingConflict(conflicts[0][1])
+        show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time, end_time=end_time)
+        db.session.add(show)
+        count_shows([(venue_id, artist_id, start_time)])
+        db.session.commit()
+    except BookingError as booking_error:
+        db.session.rollback()
+        refused = str(booking_error)
+        if isinstance(booking_error, BookingConflict):
+            status = 409
+    except IntegrityError as integrity_error:
+        db.session.rollback()
+        owner = conflict_owner(integrity_error)
+        if owner is None:
+            error = True
+            current_app.logger.exception('Creating a show failed')
+        else:
+            refused = str(BookingConflict(owner))
+            status = 409
+    except:
+        db.session.rollback()
+        error = True
+        current_app.logger.exception('Creating a show failed')
+    finally:
+        db.session.close()
+    if refused:
+        return refuse_show(refused, status)
+    if error:
+        abort(500)
+    else:
+        page_cache.invalidate('shows', f'venue:{venue_id}', f'artist:{artist_id}')
+        flash('Show was successfully listed!')
+        return render_template('pages/home.html')
@@ -0,0 +1,246 @@
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+
+from app import (
+    db, page_cache, autocomplete, Venue, Artist, Show, venue_genres, utcnow, genres_named,
+    venue_areas, search_catalog, upcoming_shows, past_shows, venues_validator, venue_validator,
+)
+from cache import conditional
+from geo import place_of, near_arguments, venues_near
+
+bp = Blueprint('venues', __name__)
+
+
+@bp.route('/venues')
+# Venues can be deleted, which no updated_at records.
+@conditional(venues_validator, last_modified=False)
+@page_cache.cached('venues', 'shows')
+def venues():
+    error = False
+    body = []
+    pager = {}
+    try:
+        body, pager = venue_areas()
+    except:
+        db.session.rollback()
+        error = True
+        current_app.logger.exception('Listing venues failed')
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        return render_template('pages/venues.html', areas=body, pager=pager)
+
+
+@bp.route('/venues/search', methods=['POST'])
+def search_venues():
+    error = False
+    body = {}
+    try:
+        page = max(request.form.get('page', 1, type=int), 1)
+        body = search_catalog(Venue, venue_genres.c.venue_id, 'venue_search',
+                              request.form.get('search_term'), page)
+    except:
+        db.session.rollback()
+        error = True
+        current_app.logger.exception('Searching venues failed')
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        return render_template('pages/search_venues.html', results=body, search_term=request.form.get('search_term', ''))
+
+
+@bp.route('/venues/near')
+def venues_near_me():
+    # Without lat/lng the page offers to ask the browser for them.
+    body = []
+    if 'lat' in request.args or 'lng' in request.args:
+        try:
+            latitude, longitude, radius_km, limit = near_arguments(request.args)
+        except ValueError as error:
+            abort(400, str(error))
+        try:
+            body = venues_near(latitude, longitude, radius_km, limit)
+        except:
+            db.session.rollback()
+            current_app.logger.exception('Finding venues near %s, %s failed', latitude, longitude)
+            abort(500)
+        finally:
+            db.session.close()
+    return render_template('pages/venues_near.html', venues=body)
+
+
+@bp.route('/venues/<int:venue_id>')
+@conditional(venue_validator, last_modified=False)
+@page_cache.cached('venue:{venue_id}', 'artists')
+def show_venue(venue_id):
+    venue = db.get_or_404(Venue, venue_id)
+    error = False
+    body = {}
+    try:
+        body['id'] = venue.id
+        body['name'] = venue.name
+        body['genres'] = [genre.name for genre in venue.genres]
+        body['address'] = venue.address
+        body['city'] = venue.city
+        body['state'] = venue.state
+        body['phone'] = venue.phone
+        body['website'] = venue.website
+        body['facebook_link'] = venue.facebook_link
+        body['seeking_talent'] = venue.seeking_talent
+        body['image_link'] = venue.image_link
+
+        body.update(upcoming_shows(Show.venue_id, venue_id, Artist, Show.artist_id, 'artist'))
+        # The counters include every show ever booked; past shows are only
+        # listed on demand, see venue_past_shows().
+        body['past_shows_count'] = venue.upcoming_shows_count + venue.past_shows_count - body['upcoming_shows_count']
+
+    except:
+        db.session.rollback()
+        error = True
+        current_app.logger.exception('Loading venue %s failed', venue_id)
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        return render_template('pages/show_venue.html', venue=body)
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    from forms import VenueForm
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    error = False
+    body = {}
+    try:
+        req = request.form
+        name = req['name']
+        city = req['city']
+        state = req['state']
+        address = req['address']
+        phone = req['phone']
+        genres = req.getlist('genres')
+        facebook_link = req['facebook_link']
+
+        venue = Venue(name=name, city=city, state=state, address=address, phone=phone, facebook_link=facebook_link,
+                      **place_of(city, state))
+        venue.genres = genres_named(genres)
+        db.session.add(venue)
+        db.session.commit()
+        autocomplete.update('venues', venue.id, name, city, state)
+    except:
+        db.session.rollback()
+        error = False
+        current_app.logger.exception('Creating a venue failed')
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        page_cache.invalidate('venues')
+        flash('Venue ' + request.form['name'] + ' was successfully listed!')
+        return render_template('pages/home.html')
+
+
+@bp.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    venue = db.get_or_404(Venue, venue_id)
+    error = False
+    try:
+        db.session.delete(venue)
+        db.session.commit()
+        autocomplete.remove('venues', venue_id)
+    except:
+        db.session.rollback()
+        current_app.logger.exception('Deleting venue %s failed', venue_id)
+        error = True
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        page_cache.invalidate('venues', f'venue:{venue_id}')
+        return redirect(url_for('venues.venues'))
+
+
+@bp.route('/venues/<int:venue_id>/past-shows')
+@page_cache.cached('venue:{venue_id}', 'artists', 'shows')
+def venue_past_shows(venue_id):
+    # Newest first, a page at a time; ?partial=1 renders only the tiles, for
+    # the "Past shows" section of the venue page to append.
+    error = False
+    body = []
+    pager = {}
+    try:
+        body, pager = past_shows('venue_id', venue_id, Artist, 'artist_id', 'artist')
+    except:
+        db.session.rollback()
+        error = True
+        current_app.logger.exception('Loading past shows of venue %s failed', venue_id)
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    else:
+        return render_template('pages/past_shows.html', shows=body, pager=pager, prefix='artist',
+                               partial=request.args.get('partial', type=int))
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    venue = db.get_or_404(Venue, venue_id)
+
+    from forms import VenueForm
+    form = VenueForm(obj=venue)
+    form.genres.data = [genre.name for genre in venue.genres]
+
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    venue = db.get_or_404(Venue, venue_id)
+    error = False
+
+    try:
+        req = request.form
+        if (venue.city, venue.state) != (req['city'], req['state']):
+            for key, value in place_of(req['city'], req['state']).items():
+                setattr(venue, key, value)
+
+        venue.name = req['name']
+        venue.city = req['city']
+        venue.state = req['state']
+        venue.phone = req['phone']
+        venue.address = req['address']
+        venue.facebook_link = req['facebook_link']
+        venue.genres = genres_named(req.getlist('genres'))
+        venue.updated_at = utcnow()
+
+        db.session.commit()
+        autocomplete.update('venues', venue_id, req['name'], req['city'], req['state'])
+    except:
+        db.session.rollback()
+        current_app.logger.exception('Updating venue %s failed', venue_id)
+        error = True
+    finally:
+        db.session.close()
+
+    if error:
+        abort(500)
+    else:
+        page_cache.invalidate('venues', f'venue:{venue_id}')
+        return redirect(url_for('venues.show_venue', venue_id=venue_id))